@@ -0,0 +1,125 @@
+'''
+Micro-benchmarks of the steps of a request's auth with jwtauth, offline:
+parsing the Authorization header, finding the signing key of a token in key
+sets of growing size, and verifying a token with and without the token cache.
+
+  python benchmark.py header
+  python benchmark.py keys --keys 2 100 10000
+  python benchmark.py decode
+'''
+
+import argparse
+import time
+
+from jose import jwt
+
+from jwtauth import KeySet, TokenAuth, TokenCache, memory_key_source, parse_auth_header
+from jwtauth.testing import generate_key, make_token
+
+DOMAIN = 'benchmark.example.com'
+AUDIENCE = 'benchmark'
+
+## Helpers
+
+def measure_call(fn, repeat=1000):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        'best_us': timings[0] * 1000000,
+        'median_us': timings[len(timings) // 2] * 1000000
+    }
+
+def report(name, setting, result):
+    print('{:<20} {:>10} {:>12.2f} {:>12.2f}'.format(name, setting, result['best_us'], result['median_us']))
+
+'''
+fake_jwks(count)
+    `count` keys with the shape of Auth0's, only looked up, never used
+'''
+def fake_jwks(count):
+    return {'keys': [
+        {'kty': 'RSA', 'kid': 'key-%d' % n, 'use': 'sig', 'n': 'n%d' % n, 'e': 'AQAB', 'x5c': ['cert']}
+        for n in range(count)
+    ]}
+
+'''
+scan_keys(jwks, kid)
+    the key lookup as it was in the apps: a scan of jwks['keys'] copying the match
+'''
+def scan_keys(jwks, kid):
+    rsa_key = {}
+    for key in jwks['keys']:
+        if key['kid'] == kid:
+            rsa_key = {'kty': key['kty'], 'kid': key['kid'], 'use': key['use'], 'n': key['n'], 'e': key['e']}
+    return rsa_key
+
+## Benchmarks
+
+'''
+bench_header(args)
+    parsing a bearer Authorization header
+'''
+def bench_header(args):
+    token = 'x' * 800
+    for name, header in (('bearer', 'Bearer ' + token), ('lowercase', 'bearer ' + token)):
+        report('header-' + name, len(header), measure_call(lambda: parse_auth_header(header), args.repeat))
+
+'''
+bench_keys(args)
+    finding the key of a token's kid, the last one of the set: scanning the
+    key set as fetched, against the KeySet index
+'''
+def bench_keys(args):
+    for count in args.keys:
+        jwks = fake_jwks(count)
+        keys = KeySet.from_jwks(jwks)
+        kid = 'key-%d' % (count - 1)
+        assert scan_keys(jwks, kid) == keys.get(kid)
+
+        report('keys-scan', count, measure_call(lambda: scan_keys(jwks, kid), args.repeat))
+        report('keys-index', count, measure_call(lambda: keys.get(kid), args.repeat))
+        report('keys-index-build', count, measure_call(lambda: KeySet.from_jwks(jwks), max(args.repeat // 100, 5)))
+
+'''
+bench_decode(args)
+    verifying a token: the header read alone, the RS256 verification with the
+    key from the key store, and the principal from the token cache
+'''
+def bench_decode(args):
+    private_key, jwk = generate_key('benchmark')
+    auth = TokenAuth(DOMAIN, AUDIENCE, key_source=memory_key_source({'keys': [jwk]}), token_cache=TokenCache(max_size=0))
+    token = make_token(private_key, 'benchmark', auth.issuer, AUDIENCE, ['get:drinks'])
+
+    report('decode-header', len(token), measure_call(lambda: jwt.get_unverified_header(token), args.repeat))
+    report('decode-verify', len(token), measure_call(lambda: auth.verify_token(token), max(args.repeat // 10, 10)))
+    auth.token_cache = TokenCache()
+    auth.verify_token(token)
+    report('decode-cached', len(token), measure_call(lambda: auth.verify_token(token), args.repeat))
+    auth.key_store.stop()
+
+BENCHMARKS = {
+    'decode': bench_decode,
+    'header': bench_header,
+    'keys': bench_keys,
+}
+
+## Launch
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='jwtauth micro-benchmarks')
+    parser.add_argument('benchmarks', nargs='*', help=', '.join(sorted(BENCHMARKS)))
+    parser.add_argument('--keys', nargs='+', type=int, default=[2, 100, 10000], help='keys in the key set')
+    parser.add_argument('--repeat', type=int, default=10000)
+    args = parser.parse_args()
+
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error('unknown benchmarks: ' + ', '.join(sorted(unknown)))
+
+    print('{:<20} {:>10} {:>12} {:>12}'.format('benchmark', 'setting', 'best (us)', 'median (us)'))
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        BENCHMARKS[name](args)
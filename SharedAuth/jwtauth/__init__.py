@@ -0,0 +1,9 @@
+'''
+jwtauth
+    bearer token auth for the Flask APIs of Auth0 tenants, shared by
+    BasicFlaskAuth and the coffee shop backend
+'''
+from .errors import AuthError
+from .keys import KeySet, KeyStore, env_key_source, file_key_source, memory_key_source, url_key_source
+from .tokens import Principal, TokenCache, permission_patterns
+from .auth import ALGORITHMS, TokenAuth, parse_auth_header
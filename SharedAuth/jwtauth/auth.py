@@ -0,0 +1,207 @@
+from flask import g, request
+from functools import wraps
+from jose import jwt
+
+from .errors import AuthError
+from .keys import KeyStore, url_key_source
+from .tokens import Principal, TokenCache
+
+ALGORITHMS = ['RS256']
+
+'''
+TokenAuth
+    the bearer token auth of an Auth0 API: the `domain` of the tenant issues
+    the tokens and signs them with the keys of its /.well-known/jwks.json
+    (or of `key_source`), `audience` is the identifier of the API
+    verified tokens are kept in `token_cache`, their permissions expanded
+    with those `roles` grants the roles of the `roles_claim` claim
+'''
+class TokenAuth:
+    def __init__(self, domain, audience, algorithms=ALGORITHMS, key_source=None, key_store=None, token_cache=None, roles=None, roles_claim=None):
+        self.domain = domain
+        self.audience = audience
+        self.algorithms = algorithms
+        self.issuer = 'https://' + domain + '/'
+        self.jwks_url = self.issuer + '.well-known/jwks.json'
+        self.key_store = key_store if key_store is not None else KeyStore(key_source or url_key_source(self.jwks_url))
+        self.token_cache = token_cache if token_cache is not None else TokenCache()
+        self.roles = roles or {}
+        self.roles_claim = roles_claim
+
+    ## Auth Header
+
+    '''
+    The get_token_auth_header() method
+        it should attempt to get the header from the request
+            it should raise an AuthError if no header is present
+        it should attempt to split bearer and the token
+            it should raise an AuthError if the header is malformed
+        return the token part of the header
+    '''
+    def get_token_auth_header(self):
+        return parse_auth_header(request.headers.get('Authorization', None))
+
+    '''
+    The check_permissions(permission, payload) method
+        @INPUTS
+            permission: string permission (i.e. 'post:drink')
+            payload: decoded jwt payload, or its Principal
+
+        it should raise an AuthError if permissions are not included in the payload
+            !!NOTE check your RBAC settings in Auth0
+        it should raise an AuthError if the requested permission is not granted by the payload permissions or roles
+        return true otherwise
+    '''
+    def check_permissions(self, permission, payload):
+        principal = payload if isinstance(payload, Principal) else self.principal(payload)
+
+        if not principal.has_permission_claims:
+            raise AuthError({
+                'code': 'invalid_claims',
+                'description': 'Permissions not included in JWT.'
+            }, 400)
+
+        if not principal.has(permission):
+            raise AuthError({
+                'code': 'unauthorized',
+                'description': 'Permission not found.'
+            }, 401)
+        return True
+
+    def principal(self, payload):
+        return Principal.from_payload(payload, self.roles, self.roles_claim)
+
+    '''
+    The verify_token(token) method
+        @INPUTS
+            token: a json web token (string)
+
+        it should be an Auth0 token with key id (kid)
+        it should verify the token using the key with that id in the key store
+        it should decode the payload from the token
+        it should validate the claims
+        return the Principal of the decoded payload
+        the principals of verified tokens are kept in the token cache until they expire
+    '''
+    def verify_token(self, token):
+        principal = self.token_cache.get(token)
+        if principal is not None:
+            return principal
+
+        principal = self.principal(self.decode(token))
+        self.token_cache.set(token, principal)
+        return principal
+
+    '''
+    The verify_decode_jwt(token) method
+        return the decoded payload of a token verified by verify_token
+    '''
+    def verify_decode_jwt(self, token):
+        return self.verify_token(token).payload
+
+    def decode(self, token):
+        try:
+            unverified_header = jwt.get_unverified_header(token)
+        except jwt.JWTError:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to parse authentication token.'
+            }, 400)
+        if 'kid' not in unverified_header:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Authorization malformed.'
+            }, 401)
+
+        rsa_key = self.key_store.get(unverified_header['kid'])
+        if not rsa_key:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to find the appropriate key.'
+            }, 400)
+
+        try:
+            return jwt.decode(
+                token,
+                rsa_key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer
+            )
+
+        except jwt.ExpiredSignatureError:
+            raise AuthError({
+                'code': 'token_expired',
+                'description': 'Token expired.'
+            }, 401)
+
+        except jwt.JWTClaimsError:
+            raise AuthError({
+                'code': 'invalid_claims',
+                'description': 'Incorrect claims. Please, check the audience and issuer.'
+            }, 401)
+        except Exception:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to parse authentication token.'
+            }, 400)
+
+    '''
+    The @requires_auth(*permissions) decorator method
+        @INPUTS
+            permissions: string permissions (i.e. 'post:drink'), all of them required
+
+        it should use the get_token_auth_header method to get the token
+        it should use the verify_token method to verify the jwt
+        it should use the check_permissions method validate claims and check the requested permissions
+        return the decorator which makes the Principal of the token g.principal for the decorated method
+    '''
+    def requires_auth(self, *permissions):
+        def requires_auth_decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                token = self.get_token_auth_header()
+
+                principal = self.verify_token(token)
+
+                for permission in permissions:
+                    self.check_permissions(permission, principal)
+                g.principal = principal
+
+                return f(*args, **kwargs)
+
+            return wrapper
+        return requires_auth_decorator
+
+'''
+The parse_auth_header(header) method
+    returns the token of an Authorization header value, 'Bearer <token>',
+    outside of a request so that it can be measured and tested alone
+'''
+def parse_auth_header(auth):
+    if not auth:
+        raise AuthError({
+            'code': 'authorization_header_missing',
+            'description': 'No Authorization Header'
+        }, 401)
+
+    auth_parts = auth.split()
+    if len(auth_parts) == 0:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization Header Is Not Valid'
+        }, 401)
+
+    if auth_parts[0].lower() != 'bearer':
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization Header Must Start With Bearer'
+        }, 401)
+
+    if len(auth_parts) == 1 or len(auth_parts) > 2 or auth_parts[1] == '':
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization Header Does Not Contain Token'
+        }, 401)
+
+    return auth_parts[1]
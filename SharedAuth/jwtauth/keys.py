@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+from urllib.request import urlopen
+
+from .errors import AuthError
+
+JWKS_TIMEOUT = 5
+JWKS_TTL = 10 * 60
+JWKS_REFRESH_AHEAD = 60
+JWKS_MIN_REFRESH_INTERVAL = 30
+
+## Key Sources
+
+'''
+The key sources
+    each one returns a function that returns the JSON web key set of the
+    identity provider, {'keys': [...]}
+    url_key_source fetches it from a URL: Auth0 /.well-known/jwks.json or a local stub server
+    file_key_source reads it from a local file, for offline development
+    memory_key_source returns a key set held in memory, for tests
+'''
+def url_key_source(url, timeout=JWKS_TIMEOUT):
+    def fetch():
+        with urlopen(url, timeout=timeout) as response:
+            return json.loads(response.read())
+    return fetch
+
+def file_key_source(path):
+    def fetch():
+        with open(path) as jwks_file:
+            return json.load(jwks_file)
+    return fetch
+
+def memory_key_source(jwks):
+    def fetch():
+        return jwks
+    return fetch
+
+'''
+The env_key_source(url) method
+    returns the key source of JWKS_FILE when it is set, of JWKS_URL when it
+    is set, and of `url` otherwise
+'''
+def env_key_source(url):
+    if os.environ.get('JWKS_FILE'):
+        return file_key_source(os.environ['JWKS_FILE'])
+    return url_key_source(os.environ.get('JWKS_URL', url))
+
+## Key Sets
+
+'''
+KeySet
+    the RSA keys of a JSON web key set by key id (kid), so that finding the
+    key of a token is one dict lookup however many keys the provider has
+'''
+class KeySet:
+    def __init__(self, keys=None):
+        self.keys = keys or {}
+
+    @classmethod
+    def from_jwks(cls, jwks):
+        return cls({
+            key['kid']: {
+                'kty': key['kty'],
+                'kid': key['kid'],
+                'use': key.get('use', 'sig'),
+                'n': key['n'],
+                'e': key['e']
+            }
+            for key in jwks.get('keys', []) if 'kid' in key and key.get('kty') == 'RSA'
+        })
+
+    def get(self, kid):
+        return self.keys.get(kid)
+
+    def __contains__(self, kid):
+        return kid in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+## Key Store
+
+'''
+KeyStore
+    the key set of the identity provider, fetched from a key source and kept
+    for `ttl` seconds
+    a background thread refreshes it `refresh_ahead` seconds before it
+    expires, so that requests do not wait on the identity provider once the
+    first keys are in
+    a key id it does not know (the provider rotated its keys) refreshes it
+    right away, at most once every `min_refresh_interval` seconds
+    while the provider cannot be reached the last keys stay in use
+'''
+class KeyStore:
+    def __init__(self, source, ttl=JWKS_TTL, refresh_ahead=JWKS_REFRESH_AHEAD, min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL):
+        self.source = source
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl / 2)
+        self.min_refresh_interval = min_refresh_interval
+        self.keys = None
+        self.expires_at = 0
+        # monotonic time of the last fetch, successful or not
+        self.fetched_at = None
+        self.fetch_lock = threading.Lock()
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def get(self, kid):
+        '''
+        returns the key with the id, or None when the provider has no such key
+        '''
+        keys = self.keys
+        fetched_at = self.fetched_at
+        now = time.monotonic()
+
+        if keys is None:
+            self.refresh(fetched_at)
+        elif (now >= self.expires_at or kid not in keys) and now - fetched_at >= self.min_refresh_interval:
+            self.refresh(fetched_at)
+
+        keys = self.keys
+        if keys is None:
+            raise AuthError({
+                'code': 'jwks_unavailable',
+                'description': 'Unable to fetch the signing keys.'
+            }, 503)
+
+        self.start()
+        return keys.get(kid)
+
+    def refresh(self, fetched_at):
+        '''
+        fetches the keys, unless another thread did since `fetched_at`
+        the keys do not change when the source fails
+        '''
+        with self.fetch_lock:
+            if self.fetched_at != fetched_at:
+                return
+
+            self.fetched_at = time.monotonic()
+            try:
+                keys = KeySet.from_jwks(self.source())
+            except Exception:
+                return
+
+            self.keys = keys
+            self.expires_at = self.fetched_at + self.ttl
+
+    def start(self):
+        if self.thread is None:
+            with self.fetch_lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name='jwks-refresh', daemon=True)
+                    self.thread.start()
+
+    def run(self):
+        delay = self.expires_at - self.refresh_ahead - time.monotonic()
+        while not self.stopped.wait(max(delay, 0)):
+            if self.expires_at - self.refresh_ahead <= time.monotonic():
+                self.refresh(self.fetched_at)
+            # after a failure the expiry did not move, the next try waits a bit
+            delay = max(self.expires_at - self.refresh_ahead - time.monotonic(), self.min_refresh_interval)
+
+    def stop(self):
+        self.stopped.set()
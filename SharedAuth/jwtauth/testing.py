@@ -0,0 +1,86 @@
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from Crypto.PublicKey import RSA
+from jose import jwt
+
+'''
+Offline keys and tokens
+    RSA keys generated locally, tokens signed with them and a stub server
+    for their key set, so that the auth can be tested and benchmarked
+    without Auth0
+'''
+
+def b64_int(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+'''
+The generate_key(kid) method
+    returns the PEM private key and the public JWK of a new RSA key
+'''
+def generate_key(kid, bits=2048):
+    key = RSA.generate(bits)
+    jwk = {
+        'kty': 'RSA',
+        'kid': kid,
+        'use': 'sig',
+        'alg': 'RS256',
+        'n': b64_int(key.n),
+        'e': b64_int(key.e)
+    }
+    return key.export_key().decode(), jwk
+
+'''
+The make_token(private_key, kid, issuer, audience) method
+    returns an RS256 token for the API signed with the key, claims override
+    or add to the default ones
+'''
+def make_token(private_key, kid, issuer, audience, permissions=(), expires_in=3600, **claims):
+    now = int(time.time())
+    token_claims = {
+        'iss': issuer,
+        'aud': audience,
+        'sub': 'auth0|offline',
+        'iat': now,
+        'exp': now + expires_in,
+        'permissions': list(permissions)
+    }
+    token_claims.update(claims)
+    return jwt.encode(token_claims, private_key, algorithm='RS256', headers={'kid': kid})
+
+'''
+JWKSServer
+    serves a key set on a local port while the context is active, every
+    response `latency` seconds late
+'''
+class JWKSServer:
+    def __init__(self, jwks, latency=0):
+        body = json.dumps(jwks).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(latency)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%d/.well-known/jwks.json' % self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,115 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+from .keys import JWKS_TTL
+
+TOKEN_CACHE_SIZE = 10000
+
+## Principals
+
+'''
+The permission_patterns(permission) method
+    returns the permission and the wildcards that grant it: 'get:drinks'
+    is granted by 'get:drinks', 'get:*', '*:drinks' and '*'
+'''
+@lru_cache(maxsize=1024)
+def permission_patterns(permission):
+    verb, _, resource = permission.partition(':')
+    if not resource:
+        return frozenset((permission, '*'))
+    return frozenset((permission, verb + ':*', '*:' + resource, '*'))
+
+'''
+Principal
+    the user of a verified token, made once from its payload: the subject,
+    the roles (from the `roles_claim` claim), and the permissions of the
+    token together with those `roles` grants its roles as a frozenset, so
+    that checking one permission is a few set lookups however many the
+    token has
+    expires_at is the exp claim, None without one
+'''
+class Principal(namedtuple('Principal', ['subject', 'roles', 'permissions', 'expires_at', 'payload'])):
+    __slots__ = ()
+
+    @classmethod
+    def from_payload(cls, payload, roles=None, roles_claim=None):
+        role_names = frozenset(role.lower() for role in payload.get(roles_claim, ())) if roles_claim else frozenset()
+        permissions = set(payload.get('permissions', ()))
+        for role in role_names:
+            permissions.update((roles or {}).get(role, ()))
+        return cls(payload.get('sub'), role_names, frozenset(permissions), payload.get('exp'), payload)
+
+    @property
+    def has_permission_claims(self):
+        return 'permissions' in self.payload or bool(self.roles)
+
+    def has(self, permission):
+        return not self.permissions.isdisjoint(permission_patterns(permission))
+
+    def has_all(self, permissions):
+        return all(self.has(permission) for permission in permissions)
+
+    def has_any(self, permissions):
+        return any(self.has(permission) for permission in permissions)
+
+## Verified Tokens
+
+'''
+TokenCache
+    the principals of verified tokens, by the SHA-256 of the token, so that
+    a client sending its token again skips the RSA signature check, the
+    claim validation and the permission expansion
+    an entry expires with its token (exp), or `max_age` seconds after it was
+    verified if that comes first, and past `max_size` tokens the least
+    recently used one is evicted
+    hits and misses count the lookups
+'''
+class TokenCache:
+    def __init__(self, max_size=TOKEN_CACHE_SIZE, max_age=JWKS_TTL):
+        self.max_size = max_size
+        self.max_age = max_age
+        # token hash -> (expiry, principal), least recently used first
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self.key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, token, principal):
+        if principal.expires_at is None:
+            return
+
+        expiry = min(principal.expires_at, time.time() + self.max_age)
+        key = self.key(token)
+        with self.lock:
+            self.entries[key] = (expiry, principal)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,9 @@
+from setuptools import setup
+
+setup(
+    name='jwtauth',
+    version='0.1.0',
+    description='Bearer token auth for the Flask APIs of Auth0 tenants',
+    packages=['jwtauth'],
+    install_requires=['Flask', 'pycryptodome', 'python-jose-cryptodome'],
+)
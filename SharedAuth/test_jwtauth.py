@@ -0,0 +1,291 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from flask import Flask, g, jsonify
+
+from jwtauth import (
+    AuthError, KeySet, KeyStore, Principal, TokenAuth, TokenCache, file_key_source, memory_key_source,
+    parse_auth_header, url_key_source
+)
+from jwtauth.testing import JWKSServer, generate_key, make_token
+
+DOMAIN = 'tenant.example.com'
+AUDIENCE = 'api'
+
+
+def principal(expires_in=3600, **payload):
+    payload.setdefault('exp', int(time.time()) + expires_in)
+    return Principal.from_payload(payload)
+
+
+class ParseAuthHeaderTestCase(unittest.TestCase):
+    """This class represents the Authorization header test case"""
+
+    def assertInvalid(self, code, header):
+        with self.assertRaises(AuthError) as context:
+            parse_auth_header(header)
+        self.assertEqual(context.exception.error['code'], code)
+        self.assertEqual(context.exception.status_code, 401)
+
+    def test_bearer_token(self):
+        self.assertEqual(parse_auth_header('Bearer abc.def.ghi'), 'abc.def.ghi')
+        self.assertEqual(parse_auth_header('bearer  abc.def.ghi '), 'abc.def.ghi')
+
+    def test_invalid_headers(self):
+        self.assertInvalid('authorization_header_missing', None)
+        self.assertInvalid('invalid_header', ' ')
+        self.assertInvalid('invalid_header', 'Basic abc')
+        self.assertInvalid('invalid_header', 'Bearer')
+        self.assertInvalid('invalid_header', 'Bearer abc def')
+
+
+class KeySetTestCase(unittest.TestCase):
+    """This class represents the key set test case"""
+
+    def test_from_jwks(self):
+        keys = KeySet.from_jwks({'keys': [
+            {'kty': 'RSA', 'kid': 'a', 'n': 'n', 'e': 'AQAB', 'x5c': ['...']},
+            {'kty': 'EC', 'kid': 'b', 'crv': 'P-256', 'x': 'x', 'y': 'y'},
+            {'kty': 'RSA', 'n': 'n', 'e': 'AQAB'}
+        ]})
+
+        self.assertEqual(len(keys), 1)
+        self.assertIn('a', keys)
+        self.assertEqual(keys.get('a'), {'kty': 'RSA', 'kid': 'a', 'use': 'sig', 'n': 'n', 'e': 'AQAB'})
+        self.assertIsNone(keys.get('b'))
+
+
+class KeyStoreTestCase(unittest.TestCase):
+    """This class represents the key store test case"""
+
+    def setUp(self):
+        self.fetches = 0
+        self.jwks = {'keys': [{'kty': 'RSA', 'kid': 'a', 'n': 'n', 'e': 'AQAB'}]}
+
+    def source(self):
+        self.fetches += 1
+        if self.jwks is None:
+            raise IOError('unreachable')
+        return self.jwks
+
+    def test_keys_fetched_once(self):
+        store = KeyStore(self.source)
+        self.addCleanup(store.stop)
+
+        self.assertEqual(store.get('a')['kid'], 'a')
+        self.assertEqual(store.get('a')['kid'], 'a')
+        self.assertEqual(self.fetches, 1)
+
+    def test_unknown_kid_refreshes_at_most_once_per_interval(self):
+        store = KeyStore(self.source, min_refresh_interval=0)
+        self.addCleanup(store.stop)
+        store.get('a')
+        self.jwks = {'keys': self.jwks['keys'] + [{'kty': 'RSA', 'kid': 'b', 'n': 'n', 'e': 'AQAB'}]}
+
+        self.assertEqual(store.get('b')['kid'], 'b')
+        self.assertEqual(self.fetches, 2)
+
+        self.assertIsNone(store.get('c'))
+        self.assertEqual(self.fetches, 3)
+
+        # just refreshed, an unknown kid waits for the interval
+        store.min_refresh_interval = 60
+        self.assertIsNone(store.get('c'))
+        self.assertEqual(self.fetches, 3)
+
+    def test_stale_keys_kept_when_source_fails(self):
+        store = KeyStore(self.source, min_refresh_interval=0)
+        self.addCleanup(store.stop)
+        store.get('a')
+        self.jwks = None
+
+        self.assertEqual(store.get('unknown'), None)
+        self.assertEqual(store.get('a')['kid'], 'a')
+
+    def test_unavailable_without_keys(self):
+        self.jwks = None
+        store = KeyStore(self.source)
+
+        with self.assertRaises(AuthError) as context:
+            store.get('a')
+        self.assertEqual(context.exception.status_code, 503)
+
+    def test_key_sources(self):
+        self.assertEqual(memory_key_source(self.jwks)(), self.jwks)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as jwks_file:
+            json.dump(self.jwks, jwks_file)
+        self.addCleanup(os.remove, jwks_file.name)
+        self.assertEqual(file_key_source(jwks_file.name)(), self.jwks)
+
+        with JWKSServer(self.jwks) as server:
+            self.assertEqual(url_key_source(server.url)(), self.jwks)
+
+
+class TokenCacheTestCase(unittest.TestCase):
+    """This class represents the verified-token cache test case"""
+
+    def test_get_after_set(self):
+        cache = TokenCache()
+        entry = principal()
+        self.assertIsNone(cache.get('token'))
+        cache.set('token', entry)
+
+        self.assertIs(cache.get('token'), entry)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_entry_expires_with_token(self):
+        cache = TokenCache()
+        cache.set('token', principal(expires_in=-1))
+
+        self.assertIsNone(cache.get('token'))
+        self.assertEqual(len(cache), 0)
+
+    def test_entry_expires_after_max_age(self):
+        cache = TokenCache(max_age=0)
+        cache.set('token', principal())
+
+        self.assertIsNone(cache.get('token'))
+
+    def test_token_without_exp_is_not_cached(self):
+        cache = TokenCache()
+        cache.set('token', Principal.from_payload({'sub': 'auth0|offline'}))
+
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_evicted(self):
+        cache = TokenCache(max_size=2)
+        cache.set('first', principal())
+        cache.set('second', principal())
+        cache.get('first')
+        cache.set('third', principal())
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNotNone(cache.get('first'))
+        self.assertIsNone(cache.get('second'))
+        self.assertIsNotNone(cache.get('third'))
+
+
+class PrincipalTestCase(unittest.TestCase):
+    """This class represents the principal test case"""
+
+    def test_permissions(self):
+        user = principal(sub='auth0|offline', permissions=['get:drinks-detail', 'post:drinks'])
+
+        self.assertEqual(user.subject, 'auth0|offline')
+        self.assertEqual(user.permissions, frozenset(['get:drinks-detail', 'post:drinks']))
+        self.assertTrue(user.has('post:drinks'))
+        self.assertFalse(user.has('delete:drinks'))
+        self.assertTrue(user.has_all(['get:drinks-detail', 'post:drinks']))
+        self.assertFalse(user.has_all(['post:drinks', 'delete:drinks']))
+        self.assertTrue(user.has_any(['post:drinks', 'delete:drinks']))
+
+    def test_wildcards(self):
+        user = principal(permissions=['get:*', '*:drinks'])
+
+        self.assertTrue(user.has('get:drinks-detail'))
+        self.assertTrue(user.has('delete:drinks'))
+        self.assertFalse(user.has('delete:drinks-detail'))
+        self.assertTrue(principal(permissions=['*']).has('patch:drinks'))
+
+    def test_roles(self):
+        roles = {'editor': ['post:drinks', 'patch:drinks']}
+        user = Principal.from_payload({'https://example.com/roles': ['Editor', 'Viewer']}, roles, 'https://example.com/roles')
+
+        self.assertEqual(user.roles, frozenset(['editor', 'viewer']))
+        self.assertEqual(user.permissions, frozenset(['post:drinks', 'patch:drinks']))
+        self.assertTrue(user.has_permission_claims)
+        self.assertFalse(principal().has_permission_claims)
+
+    def test_immutable(self):
+        user = principal(permissions=['post:drinks'])
+
+        with self.assertRaises(AttributeError):
+            user.permissions = frozenset(['*'])
+        with self.assertRaises(AttributeError):
+            user.permissions.add('*')
+
+
+class TokenAuthTestCase(unittest.TestCase):
+    """This class represents the token verification test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Generate the signing key once, RSA keys are slow to make."""
+        cls.private_key, cls.jwk = generate_key('test')
+
+    def setUp(self):
+        self.auth = TokenAuth(DOMAIN, AUDIENCE, key_source=memory_key_source({'keys': [self.jwk]}))
+
+    def tearDown(self):
+        self.auth.key_store.stop()
+
+    def token(self, permissions=(), **claims):
+        return make_token(self.private_key, 'test', self.auth.issuer, AUDIENCE, permissions, **claims)
+
+    def assertAuthError(self, code, token):
+        with self.assertRaises(AuthError) as context:
+            self.auth.verify_decode_jwt(token)
+        self.assertEqual(context.exception.error['code'], code)
+
+    def test_verify_decode_jwt(self):
+        payload = self.auth.verify_decode_jwt(self.token(['post:drinks']))
+
+        self.assertEqual(payload['permissions'], ['post:drinks'])
+        self.assertEqual(payload['iss'], 'https://' + DOMAIN + '/')
+
+    def test_repeated_token_verified_once(self):
+        token = self.token()
+        user = self.auth.verify_token(token)
+        # the key set is gone, only the cache can answer
+        self.auth.key_store.stop()
+        self.auth.key_store = KeyStore(memory_key_source({'keys': []}))
+
+        self.assertIs(self.auth.verify_token(token), user)
+        self.assertEqual((self.auth.token_cache.hits, self.auth.token_cache.misses), (1, 1))
+
+    def test_invalid_tokens(self):
+        self.assertAuthError('token_expired', self.token(expires_in=-60))
+        self.assertAuthError('invalid_claims', self.token(aud='another_api'))
+        self.assertAuthError('invalid_claims', self.token(iss='https://another.example.com/'))
+        self.assertAuthError('invalid_header', 'not-a-token')
+        self.assertEqual(len(self.auth.token_cache), 0)
+
+    def test_unknown_key(self):
+        private_key, _ = generate_key('unknown', bits=1024)
+        self.assertAuthError('invalid_header', make_token(private_key, 'unknown', self.auth.issuer, AUDIENCE))
+
+    def test_requires_auth(self):
+        app = Flask(__name__)
+
+        @app.route('/drinks', methods=['POST'])
+        @self.auth.requires_auth('post:drinks')
+        def create_drink():
+            return jsonify({'success': True, 'subject': g.principal.subject})
+
+        @app.route('/me')
+        @self.auth.requires_auth()
+        def me():
+            return jsonify({'permissions': sorted(g.principal.permissions)})
+
+        @app.errorhandler(AuthError)
+        def auth_error(error):
+            return jsonify(error.error), error.status_code
+
+        client = app.test_client()
+        headers = lambda token: {'Authorization': 'Bearer ' + token}
+
+        self.assertEqual(client.post('/drinks').status_code, 401)
+        self.assertEqual(client.post('/drinks', headers=headers(self.token(['get:drinks']))).status_code, 401)
+        res = client.post('/drinks', headers=headers(self.token(['post:drinks'])))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['subject'], 'auth0|offline')
+        res = client.get('/me', headers=headers(self.token(['get:drinks'])))
+        self.assertEqual(res.get_json()['permissions'], ['get:drinks'])
+
+
+if __name__ == "__main__":
+    unittest.main()
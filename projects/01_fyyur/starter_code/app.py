@@ -2,18 +2,26 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import json
+import base64
+import time
 import traceback
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify
+import babel.dates
+from flask import Flask, render_template, stream_template, request, Response, flash, redirect, url_for, jsonify, abort
+from markupsafe import Markup
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
 from flask_migrate import Migrate
-from sqlalchemy.sql.elements import Null
-from sqlalchemy import func
-from datetime import datetime
+from sqlalchemy import event, func, tuple_, literal, literal_column
+from sqlalchemy.orm import selectinload
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from functools import lru_cache
 
 from temp.data_genre import data as data_genre
 from temp.data_artist import data as data_artist
@@ -22,6 +30,11 @@ from temp.data_album import data as data_album
 from temp.data_song import data as data_song
 from temp.data_show import data as data_show
 from forms import *
+from search import SearchIndex
+from genres import GenreRegistry
+from cache import TTLCache
+from scheduling import ShowSchedule
+from importer import BulkImporter, RecordError, read_records, to_datetime
 from temp import *
 
 #----------------------------------------------------------------------------#
@@ -35,6 +48,18 @@ db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 all_orphan = "all, delete-orphan"
 
+# listing pages are paginated by cursor, `?per_page=` is capped at MAX_PER_PAGE
+PER_PAGE = 50
+MAX_PER_PAGE = 200
+# seconds the home page listings are served from memory, writes of this
+# process clear them right away, other processes within the TTL
+HOME_CACHE_TTL = 60
+# rows fetched per round-trip and bytes sent per chunk by streamed pages
+STREAM_BATCH = 500
+STREAM_BUFFER = 16 * 1024
+# how long a show books its venue and artist when no end time is given
+SHOW_DURATION = timedelta(hours=3)
+
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
@@ -63,6 +88,10 @@ class Genre(db.Model):
 
 class Venue(db.Model):
   __tablename__ = 'venues'
+  __table_args__ = (
+    # most recently listed first on the home page
+    db.Index('ix_venues_created_at_id', 'created_at', 'id'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   name = db.Column(db.String)
@@ -75,6 +104,7 @@ class Venue(db.Model):
   website = db.Column(db.String)
   seeking_talent = db.Column(db.Boolean, default=False)
   seeking_description = db.Column(db.String)
+  created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, server_default=func.now())
 
   # each venu has many shows
   shows = db.relationship('Show', lazy=True, cascade=all_orphan, backref='venue')
@@ -85,9 +115,17 @@ class Venue(db.Model):
 
 class Show(db.Model):
   __tablename__ = 'shows'
+  __table_args__ = (
+    # keyset pagination of /shows
+    db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+    # shows of a venue/artist by time, for scheduling
+    db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   start_time = db.Column(db.DateTime, nullable=False)
+  end_time = db.Column(db.DateTime, nullable=False, default=lambda context: context.get_current_parameters()['start_time'] + SHOW_DURATION)
 
   # middle table as a many-to-many relation between venus and artists
   venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
@@ -97,6 +135,10 @@ class Show(db.Model):
 
 class Artist(db.Model):
   __tablename__ = 'artists'
+  __table_args__ = (
+    # most recently listed first on the home page
+    db.Index('ix_artists_created_at_id', 'created_at', 'id'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   name = db.Column(db.String)
@@ -110,6 +152,7 @@ class Artist(db.Model):
   seeking_description = db.Column(db.String)
   available_from = db.Column(db.DateTime, nullable=False)
   available_to = db.Column(db.DateTime, nullable=False)
+  created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, server_default=func.now())
 
   # each artist has many shows
   shows = db.relationship('Show', lazy=True, cascade=all_orphan, backref='artist')
@@ -143,18 +186,86 @@ class Song(db.Model):
   album_id = db.Column(db.Integer, db.ForeignKey('albums.id'), nullable=False)
 
 #----------------------------------------------------------------------------#
-# Filters.
+# Search.
+#----------------------------------------------------------------------------#
+
+# keyset pagination of /venues and /artists, on the NULL-free columns they
+# sort by (sort_key)
+db.Index('ix_venues_city_state_name_id',
+  func.coalesce(Venue.city, literal_column("''")),
+  func.coalesce(Venue.state, literal_column("''")),
+  func.coalesce(Venue.name, literal_column("''")),
+  Venue.id)
+db.Index('ix_artists_name_id', func.coalesce(Artist.name, literal_column("''")), Artist.id)
+
+venue_search = SearchIndex(db, 'venue_search', Venue)
+artist_search = SearchIndex(db, 'artist_search', Artist)
+search_indexes = [venue_search, artist_search]
+
+# the index tables are created and dropped along with the models
+@event.listens_for(db.metadata, 'after_create')
+def create_search_indexes(target, connection, **kw):
+  for index in search_indexes:
+    index.create(connection)
+
+@event.listens_for(db.metadata, 'before_drop')
+def drop_search_indexes(target, connection, **kw):
+  for index in search_indexes:
+    index.drop(connection)
+
+# and follow every venue/artist write made through the session
+@event.listens_for(db.session, 'after_flush')
+def sync_search_indexes(session, flush_context):
+  for index in search_indexes:
+    index.sync(session)
+
+#----------------------------------------------------------------------------#
+# Genres.
+#----------------------------------------------------------------------------#
+
+genre_registry = GenreRegistry(db, Genre)
+genre_registry.watch(db.session)
+
 #----------------------------------------------------------------------------#
+# Scheduling.
+#----------------------------------------------------------------------------#
+
+# no venue/artist plays two shows at once
+show_schedule = ShowSchedule(db, Show)
+show_schedule.install()
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  new_format = format
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
 
-  if format == 'full':
-      new_format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      new_format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, new_format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+# a listing page repeats the same few formats and start times over and over,
+# so both the compiled pattern and the formatted output are cached
+@lru_cache(maxsize=64)
+def get_datetime_pattern(format, locale):
+  locale = babel.Locale.parse(locale)
+  pattern = DATETIME_FORMATS.get(format, format)
+  if pattern in ('full', 'long', 'medium', 'short'):
+    # a locale named format, as babel.dates.format_datetime composes it: the
+    # date and time patterns in the locale date-time pattern
+    pattern = str(babel.dates.get_datetime_format(pattern, locale)) \
+      .replace('{0}', babel.dates.get_time_format(pattern, locale).pattern) \
+      .replace('{1}', babel.dates.get_date_format(pattern, locale).pattern)
+  return babel.dates.parse_pattern(pattern), locale
+
+@lru_cache(maxsize=4096)
+def format_datetime_cached(value, format, locale):
+  # controllers pass datetimes, strings are still parsed for older callers
+  date = value if isinstance(value, datetime) else dateutil.parser.parse(value)
+  pattern, locale = get_datetime_pattern(format, locale)
+  return pattern.apply(date, locale)
+
+def format_datetime(value, format='medium', locale=None):
+  return format_datetime_cached(value, format, locale or babel.dates.LC_TIME)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
@@ -164,25 +275,189 @@ def log_form_errors(errors):
       for err in errorMessages:
         print(err)
 
+home_cache = TTLCache(ttl=HOME_CACHE_TTL)
+
+# a new schema starts with new rows
+@event.listens_for(db.metadata, 'after_create')
+def reset_caches(target, connection, **kw):
+  genre_registry.invalidate()
+  home_cache.clear()
+
 def get_home_data():
-  data = {}
+  # plain (id, name) rows, they outlive the session that loaded them
+  def load():
+    return {
+      'venues': db.session.query(Venue.id, Venue.name)
+        .order_by(Venue.created_at.desc(), Venue.id.desc()).limit(10).all(),
+      'artists': db.session.query(Artist.id, Artist.name)
+        .order_by(Artist.created_at.desc(), Artist.id.desc()).limit(10).all()
+    }
+
+  return home_cache.get('data', load)
+
+def render_home():
+  # the listings fragment is rendered once per cache entry, the page around
+  # it is not cached since it carries the flashed messages
+  recent = home_cache.get('html', lambda: Markup(render_template('pages/recent.html', data=get_home_data())))
+  return render_template('pages/home.html', recent=recent)
+
+def sort_key(column):
+  # NULL neither compares nor sorts alongside values, nullable text columns
+  # are ordered as '' instead; the literal is inlined so that an index on the
+  # same expression serves the ORDER BY
+  if column.nullable and isinstance(column.type, db.String):
+    return func.coalesce(column, literal_column("''"))
+  return column
+
+def encode_cursor(values):
+  values = ['' if value is None else value.isoformat() if isinstance(value, datetime) else value for value in values]
+  return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, columns):
+  values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+  if not isinstance(values, list) or len(values) != len(columns):
+    raise ValueError('cursor does not match the page ordering')
+
+  decoded = []
+  for column, value in zip(columns, values):
+    if isinstance(column.type, db.DateTime):
+      value = datetime.fromisoformat(value)
+    elif isinstance(column.type, db.Integer):
+      # bool is an int too
+      if type(value) is not int:
+        raise TypeError('cursor value is not an integer')
+    elif not isinstance(value, str):
+      raise TypeError('cursor value is not a string')
+    decoded.append(value)
+  return decoded
+
+def paginate_keyset(query, columns, key):
+  '''
+  keyset pagination of `query` ordered by `columns`, the last column must be unique,
+  nullable text columns sort as '' (see sort_key).
+  the page position comes from the `after`/`before` cursors of the request,
+  `key(row)` returns the values of `columns` for a row of the page.
+  returns the rows of the page and the cursors of its neighbours.
+  '''
+  after = request.args.get('after')
+  before = request.args.get('before')
+  per_page = min(max(request.args.get('per_page', PER_PAGE, type=int), 1), MAX_PER_PAGE)
+
+  keys = [sort_key(column) for column in columns]
+  cursor = before or after
+  if cursor:
+    try:
+      values = decode_cursor(cursor, columns)
+    except (ValueError, TypeError, UnicodeDecodeError):
+      abort(400)
+
+    position = [literal(value, column.type) for column, value in zip(columns, values)]
+    # the bound on the first key is implied by the row comparison, SQLite
+    # only seeks an expression index with it
+    if before:
+      query = query.filter(keys[0] <= position[0], tuple_(*keys) < tuple_(*position))
+    else:
+      query = query.filter(keys[0] >= position[0], tuple_(*keys) > tuple_(*position))
 
-  recent_10_venues = Venue.query.limit(10).all()
-  recent_10_artists = Artist.query.limit(10).all()
+  if before:
+    query = query.order_by(*[key.desc() for key in keys])
+  else:
+    query = query.order_by(*keys)
+
+  rows = query.limit(per_page + 1).all()
+  has_more = len(rows) > per_page
+  rows = rows[:per_page]
+  if before:
+    rows.reverse()
+
+  page = {
+    'per_page': per_page,
+    'next': None,
+    'prev': None
+  }
+  if rows:
+    if has_more or before:
+      page['next'] = encode_cursor(key(rows[-1]))
+    if after or (before and has_more):
+      page['prev'] = encode_cursor(key(rows[0]))
+
+  return rows, page
+
+def get_venue_areas():
+  # one round-trip instead of a COUNT query per venue: the upcoming shows of
+  # each venue of the page are counted from the (venue_id, start_time) index,
+  # and without a GROUP BY the page is read in the order of the venues index
+  upcoming_shows_count = db.session.query(func.count(Show.id)) \
+    .filter(Show.venue_id == Venue.id, Show.start_time > datetime.today()) \
+    .correlate(Venue).as_scalar()
+  query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, upcoming_shows_count)
+
+  rows, page = paginate_keyset(query, [Venue.city, Venue.state, Venue.name, Venue.id],
+    key=lambda row: (row[2], row[3], row[1], row[0]))
+
+  areas = []
+  for (city, state), venues in groupby(rows, key=lambda row: (row[2], row[3])):
+    areas.append({
+      'city': city,
+      'state': state,
+      'venues': [{
+        'id': venue_id,
+        'name': name,
+        'num_shows': upcoming_shows_count
+      } for venue_id, name, _, _, upcoming_shows_count in venues]
+    })
+
+  return areas, page
+
+def get_search_results(index, search_term):
+  page = max(request.values.get('page', 1, type=int), 1)
+  count, data = index.search(search_term, page=page, per_page=PER_PAGE)
+
+  return {
+    'count': count,
+    'data': data,
+    'page': page,
+    'has_prev': page > 1,
+    'has_next': page * PER_PAGE < count
+  }
 
-  data['venues'] = recent_10_venues
-  data['artists'] = recent_10_artists
+def buffer_chunks(chunks, size=STREAM_BUFFER):
+  '''
+  joins the small pieces of a streamed template into chunks of about `size` characters
+  '''
+  buffer = []
+  length = 0
+  for chunk in chunks:
+    buffer.append(chunk)
+    length += len(chunk)
+    if length >= size:
+      yield ''.join(buffer)
+      buffer = []
+      length = 0
+  if buffer:
+    yield ''.join(buffer)
+
+def split_shows(rows):
+  '''
+  splits show rows of a detail page into past and upcoming shows in one pass,
+  the rows are read-only query tuples so nothing is written back to the session
+  '''
+  shows = {
+    'past': [],
+    'upcoming': []
+  }
+
+  now = datetime.today()
+  for show in rows:
+    if show.start_time < now:
+      shows['past'].append(show)
+    else:
+      shows['upcoming'].append(show)
 
-  return data
+  return shows
 
 def get_genres():
-  genres = Genre.query.all()
-  genre_names = []
-  if genres:
-    for genre in genres:
-      genre_names.append(genre.name)
-  
-  return list(enumerate(genre_names))
+  return genre_registry.choices()
 
 def get_genres_ids(genres):
   ids = []
@@ -233,7 +508,7 @@ def set_artist_form_data(form, artist):
 @app.route('/')
 def index():
 
-  return render_template('pages/home.html', data=get_home_data())
+  return render_home()
 
 #  Venues
 #  ----------------------------------------------------------------
@@ -244,83 +519,36 @@ def index():
 @app.route('/venues')
 def venues():
 
-    venues = Venue.query.order_by('city', 'state', 'name').all()
-
-    data = []
-    location = {}
+    areas, page = get_venue_areas()
 
-    previous_location = ''
-    for venue in venues:
-        current_location = venue.city + venue.state
-
-        if current_location != previous_location:
-            previous_location = current_location
-            location = {
-                'city': venue.city,
-                'state': venue.state,
-                'venues': []
-            }
-
-            data.append(location)
-
-        upcoming_shows_count = Show.query.with_parent(venue).filter(Show.start_time > datetime.today()).count()
-
-        location['venues'].append({
-            'id': venue.id,
-            'name': venue.name,
-            'num_shows': upcoming_shows_count
-        })
-
-    return render_template('pages/venues.html', areas=data)
+    return render_template('pages/venues.html', areas=areas, page=page)
 
 # Search...
 #  ----------------------------------------------------------------
-@app.route('/venues/search', methods=['POST'])
+@app.route('/venues/search', methods=['GET', 'POST'])
 def search_venues():
-    search_term = request.form.get('search_term', '')
+    search_term = request.values.get('search_term', '')
 
-    venues = Venue.query.filter(func.lower(Venue.name).contains(func.lower(search_term))).all()
-
-    response = {
-        'count': len(venues),
-        'data': venues
-    }
-
-    return render_template('pages/search_venues.html', results=response, search_term=search_term)
+    return render_template('pages/search_venues.html', results=get_search_results(venue_search, search_term), search_term=search_term)
 
 # details...
 #  ----------------------------------------------------------------
 @app.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
 
-  venue = Venue.query.get(venue_id)
+  venue = Venue.query.options(selectinload(Venue.genres)).get(venue_id)
 
-  if venue:
-    shows = Show.query.with_parent(venue).all()
-
-    venue.past_shows = []
-    venue.upcoming_shows = []
-    venue.past_shows_count = 0
-    venue.upcoming_shows_count = 0
-
-    for show in shows:
-      if show.start_time < datetime.today():
-          show.artist_id = show.artist.id
-          show.artist_name = show.artist.name
-          show.artist_image_link = show.artist.image_link
-          show.start_time = show.start_time.strftime('%Y-%m-%dT%I:%M:%S.%sZ')
-          venue.past_shows.append(show)
-      else:
-          show.artist_id = show.artist.id
-          show.artist_name = show.artist.name
-          show.artist_image_link = show.artist.image_link
-          show.start_time = show.start_time.strftime('%Y-%m-%dT%I:%M:%S.%sZ')
-          venue.upcoming_shows.append(show)
-
-    venue.past_shows_count  = len(venue.past_shows)
-    venue.upcoming_shows_count = len(venue.upcoming_shows)
-
-  return render_template('pages/show_venue.html', venue=venue)
+  if not venue:
+    abort(404)
+
+  rows = db.session.query(
+      Show.start_time, Show.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link')
+    ).join(Artist, Artist.id == Show.artist_id) \
+    .filter(Show.venue_id == venue.id) \
+    .order_by(Show.start_time) \
+    .all()
+
+  return render_template('pages/show_venue.html', venue=venue, shows=split_shows(rows))
 
 #  Create...
 #  ----------------------------------------------------------------
@@ -352,13 +580,11 @@ def create_venue_submission():
                   website=form.website.data,
                   facebook_link=form.facebook_link.data
         )
-        genres = form.genres.data
-        for genre_id in genres:
-          genre = Genre.query.get(genre_id)
-          venue.genres.append(genre)
+        venue.genres = genre_registry.get(form.genres.data)
 
         db.session.add(venue)
         db.session.commit()
+        home_cache.clear()
 
     except Exception as e:
       error = e
@@ -372,7 +598,7 @@ def create_venue_submission():
     else:
       flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
 
-    return render_template('pages/home.html', data=get_home_data())
+    return render_home()
 
   else:
     log_form_errors(form.errors.items())
@@ -411,12 +637,10 @@ def edit_venue_submission(venue_id):
         venue.website=form.website.data
         venue.facebook_link=form.facebook_link.data
 
-        genres = form.genres.data
-        for genre_id in genres:
-          genre = Genre.query.get(genre_id)
-          venue.genres.append(genre)
+        venue.genres = genre_registry.get(form.genres.data)
 
         db.session.commit()
+        home_cache.clear()
 
     except Exception as e:
       error = e
@@ -447,6 +671,7 @@ def delete_venue(venue_id):
         venue = Venue.query.get(venue_id)
         db.session.delete(venue)
         db.session.commit()
+        home_cache.clear()
     except Exception as e:
         error = e
         db.session.rollback()
@@ -467,61 +692,38 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 @app.route('/artists')
 def artists():
-  artists = Artist.query.all()
+  # only the listed columns, loading Artist would also subquery-load every genre
+  query = db.session.query(Artist.id, Artist.name)
+  artists, page = paginate_keyset(query, [Artist.name, Artist.id], key=lambda artist: (artist.name, artist.id))
 
-  return render_template('pages/artists.html', artists=artists)
+  return render_template('pages/artists.html', artists=artists, page=page)
 
 # Search...
 #  ----------------------------------------------------------------
-@app.route('/artists/search', methods=['POST'])
+@app.route('/artists/search', methods=['GET', 'POST'])
 def search_artists():
-  search_term = request.form.get('search_term', '')
-
-  artist = Artist.query.filter(func.lower(Venue.name).contains(func.lower(search_term))).all()
-
-  response = {
-      'count': len(artist),
-      'data': artist
-  }
+  search_term = request.values.get('search_term', '')
 
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_artists.html', results=get_search_results(artist_search, search_term), search_term=search_term)
 
 # Details...
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
 
-  artist = Artist.query.get(artist_id)
-
-  if artist:
-    shows = Show.query.with_parent(artist).all()
-
-    artist.available_from = artist.available_from.strftime('%Y-%m-%dT%I:%M:%S.%sZ')
-    artist.available_to = artist.available_to.strftime('%Y-%m-%dT%I:%M:%S.%sZ')
-
-    artist.past_shows = []
-    artist.upcoming_shows = []
-    artist.past_shows_count = 0
-    artist.upcoming_shows_count = 0
+  artist = Artist.query.options(selectinload(Artist.albums).selectinload(Album.songs)).get(artist_id)
 
-    for show in shows:
-      if show.start_time < datetime.today():
-          show.artist_id = show.artist.id
-          show.artist_name = show.artist.name
-          show.venue_image_link = show.venue.image_link
-          show.start_time = show.start_time.strftime('%Y-%m-%dT%I:%M:%S.%sZ')
-          artist.past_shows.append(show)
-      else:
-          show.artist_id = show.artist.id
-          show.artist_name = show.artist.name
-          show.venue_image_link = show.venue.image_link
-          show.start_time = show.start_time.strftime('%Y-%m-%dT%I:%M:%S.%sZ')
-          artist.upcoming_shows.append(show)
+  if not artist:
+    abort(404)
 
-    artist.past_shows_count  = len(artist.past_shows)
-    artist.upcoming_shows_count = len(artist.upcoming_shows)
+  rows = db.session.query(
+      Show.start_time, Show.venue_id, Venue.name.label('venue_name'), Venue.image_link.label('venue_image_link')
+    ).join(Venue, Venue.id == Show.venue_id) \
+    .filter(Show.artist_id == artist.id) \
+    .order_by(Show.start_time) \
+    .all()
 
-  return render_template('pages/show_artist.html', artist=artist)
+  return render_template('pages/show_artist.html', artist=artist, shows=split_shows(rows))
 
 #  Create...
 #  ----------------------------------------------------------------
@@ -554,13 +756,11 @@ def create_artist_submission():
                   available_from=form.available_from.data,
                   available_to=form.available_to.data
         )
-        genres = form.genres.data
-        for genre_id in genres:
-          genre = Genre.query.get(genre_id)
-          artist.genres.append(genre)
+        artist.genres = genre_registry.get(form.genres.data)
 
         db.session.add(artist)
         db.session.commit()
+        home_cache.clear()
 
     except Exception as e:
       error = e
@@ -574,7 +774,7 @@ def create_artist_submission():
     else:
       flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
 
-    return render_template('pages/home.html', data=get_home_data())
+    return render_home()
 
   else:
     log_form_errors(form.errors.items())
@@ -614,12 +814,10 @@ def edit_artist_submission(artist_id):
         artist.available_from=form.available_from.data
         artist.available_to=form.available_to.data
 
-        genres = form.genres.data
-        for genre_id in genres:
-          genre = Genre.query.get(genre_id)
-          artist.genres.append(genre)
+        artist.genres = genre_registry.get(form.genres.data)
 
         db.session.commit()
+        home_cache.clear()
 
     except Exception as e:
       error = e
@@ -650,6 +848,7 @@ def delete_artist(artist_id):
       artist = Artist.query.get(artist_id)
       db.session.delete(artist)
       db.session.commit()
+      home_cache.clear()
   except Exception as e:
       error = e
       db.session.rollback()
@@ -717,17 +916,28 @@ def create_album_submission(artist_id):
 
 #  List all...
 #  ----------------------------------------------------------------
+def get_shows_query():
+  # venue and artist come from the same query, no lazy load per show tile
+  return db.session.query(
+      Show.id, Show.start_time, Show.venue_id, Show.artist_id,
+      Venue.name.label('venue_name'), Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link')
+    ).join(Venue, Venue.id == Show.venue_id) \
+    .join(Artist, Artist.id == Show.artist_id)
+
 @app.route('/shows')
 def shows():
-  shows = Show.query.order_by(Show.start_time).all()
+  shows, page = paginate_keyset(get_shows_query(), [Show.start_time, Show.id], key=lambda show: (show.start_time, show.id))
+
+  return render_template('pages/shows.html', shows=shows, page=page)
 
-  for show in shows:
-      show.venue_name = show.venue.name
-      show.artist_name = show.artist.name
-      show.artist_image_link = show.artist.image_link
-      show.start_time = show.start_time.strftime('%Y-%m-%dT%I:%M:%S.%sZ')
+# Every show in one page, streamed: rows are read in batches from a server-side
+# cursor while the tiles rendered so far are already sent, so memory stays
+# bounded whatever the number of shows
+@app.route('/shows/all')
+def all_shows():
+  shows = get_shows_query().order_by(Show.start_time, Show.id).yield_per(STREAM_BATCH)
 
-  return render_template('pages/shows.html', shows=shows)
+  return Response(buffer_chunks(stream_template('pages/shows.html', shows=shows, page=None)))
 
 #  Create...
 #  ----------------------------------------------------------------
@@ -746,6 +956,8 @@ def create_show_submission():
   if form.validate_on_submit():
     artist = Artist.query.get(form.artist_id.data)
     venue = Venue.query.get(form.venue_id.data)
+    start_time = form.start_time.data
+    end_time = start_time + SHOW_DURATION
 
     if not artist:
         flash('Artist not found')
@@ -760,35 +972,137 @@ def create_show_submission():
         flash('Venue not found!')
         error = True
 
-    try:
-        show = Show(
-          start_time=form.start_time.data,
-          artist_id=form.artist_id.data,
-          venue_id=form.venue_id.data
-        )
-
-        db.session.add(show)
-        db.session.commit()
+    if not error:
+        conflicts = show_schedule.conflicts(venue.id, artist.id, start_time, end_time)
+        if conflicts['venue']:
+            error = True
+            flash('Venue is already booked at this time!')
+        if conflicts['artist']:
+            error = True
+            flash('Artist already plays another show at this time!')
 
-    except Exception as e:
-      error = e
-      db.session.rollback()
-      traceback.print_exc()
-    finally:
-      db.session.close()
+    if not error:
+      try:
+          show = Show(
+            start_time=start_time,
+            end_time=end_time,
+            artist_id=artist.id,
+            venue_id=venue.id
+          )
+
+          db.session.add(show)
+          db.session.commit()
+
+      except Exception as e:
+        # a concurrent booking ends up here, on the exclusion constraints (PostgreSQL) or triggers (SQLite)
+        error = e
+        db.session.rollback()
+        traceback.print_exc()
+      finally:
+        db.session.close()
 
     if not error:
       flash('Show was successfully listed!')
     else:
       flash('An error occurred. Show could not be listed.')
 
-    return render_template('pages/home.html', data=get_home_data())
+    return render_home()
 
   else:
     log_form_errors(form.errors.items())
 
   return render_template('forms/new_show.html', form=form)
 
+#  Schedule...
+#  ----------------------------------------------------------------
+def to_naive_utc(value):
+  # the show and availability times are stored naive, in UTC; ISO strings
+  # ending in 'Z' (the seed format) or with an offset are converted
+  value = to_datetime(value)
+  if value.tzinfo is not None:
+    value = value.astimezone(timezone.utc).replace(tzinfo=None)
+  return value
+
+def read_proposals(records):
+  proposals = []
+  for record in records:
+    start_time = to_naive_utc(record['start_time'])
+    proposals.append({
+      'venue_id': int(record['venue_id']),
+      'artist_id': int(record['artist_id']),
+      'start_time': start_time,
+      'end_time': to_naive_utc(record['end_time']) if record.get('end_time') else start_time + SHOW_DURATION
+    })
+  return proposals
+
+# Validates many proposed shows at once, and lists them all when `save` is set
+# and none of them has a problem:
+# {"shows": [{"venue_id": 1, "artist_id": 2, "start_time": "...", "end_time": "..."}], "save": false}
+@app.route('/shows/schedule', methods=['POST'])
+def schedule_shows():
+  body = request.get_json(silent=True) or {}
+  if not isinstance(body, dict):
+    abort(400)
+  try:
+    proposals = read_proposals(body.get('shows') or [])
+  except (KeyError, TypeError, ValueError, OverflowError):
+    abort(400)
+
+  artists = {
+    artist.id: artist for artist in db.session.query(Artist.id, Artist.available_from, Artist.available_to)
+      .filter(Artist.id.in_({proposal['artist_id'] for proposal in proposals}))
+  }
+  venue_ids = {
+    venue_id for venue_id, in db.session.query(Venue.id)
+      .filter(Venue.id.in_({proposal['venue_id'] for proposal in proposals}))
+  }
+
+  results = []
+  for index, proposal in enumerate(proposals):
+    errors = []
+    artist = artists.get(proposal['artist_id'])
+    if proposal['end_time'] <= proposal['start_time']:
+      errors.append('show ends before it starts')
+    if proposal['venue_id'] not in venue_ids:
+      errors.append('venue not found')
+    if artist is None:
+      errors.append('artist not found')
+    elif proposal['start_time'] < artist.available_from or proposal['start_time'] > artist.available_to:
+      errors.append('artist not available')
+    results.append({'index': index, 'errors': errors, 'conflicts': []})
+
+  # only proposals that could be listed book a slot for the ones after them
+  valid = [index for index, result in enumerate(results) if not result['errors']]
+  for index, conflicts in zip(valid, show_schedule.check_many([proposals[index] for index in valid])):
+    for conflict in conflicts:
+      if 'proposal' in conflict:
+        conflict['proposal'] = valid[conflict['proposal']]
+    results[index]['conflicts'] = conflicts
+
+  for result in results:
+    result['ok'] = not result['errors'] and not result['conflicts']
+  success = all(result['ok'] for result in results)
+
+  saved = 0
+  if success and body.get('save'):
+    try:
+      shows = [Show(**proposal) for proposal in proposals]
+      db.session.add_all(shows)
+      db.session.commit()
+      saved = len(shows)
+    except Exception as e:
+      db.session.rollback()
+      traceback.print_exc()
+      return server_error(e)
+    finally:
+      db.session.close()
+
+  return jsonify({
+    'success': success,
+    'shows': results,
+    'saved': saved
+  })
+
 #  Errors
 #  ----------------------------------------------------------------
 #  ----------------------------------------------------------------
@@ -837,174 +1151,76 @@ if __name__ == '__main__':
 # Feeders.
 #----------------------------------------------------------------------------#
 
-def feed_genres():
-  try:
-    data = data_genre.data
-
-    for val in data:
-      genre = Genre(
-                name = val.get('name', '')
-              )
-
-      db.session.add(genre)
-
-    db.session.commit()
-  except Exception:
-    db.session.rollback()
-    traceback.print_exc()
-  finally:
-    db.session.close()
-
-#----------------------------------------------------------------------------#
-
-def feed_artists():
-  try:
-    data = data_artist.data
-
-    for val in data:
-      artist = Artist(
-                name = val.get('name', ''),
-                city = val.get('city', ''),
-                state = val.get('state', ''),
-                phone = val.get('phone', ''),
-                image_link = val.get('image_link', ''),
-                facebook_link = val.get('facebook_link', ''),
-                website = val.get('website', ''),
-                seeking_venue = val.get('seeking_venue', False),
-                seeking_description = val.get('seeking_description', ''),
-                available_from = val.get('available_from', ''),
-                available_to = val.get('available_to', '')
-              )
-
-      genres = val.get('genres')
-      for genre_name in genres:
-        genre = Genre.query.filter(func.lower(Genre.name).contains(func.lower(genre_name))).one()
-        artist.genres.append(genre)
-
-      db.session.add(artist)
-
-    db.session.commit()
-  except Exception:
-    db.session.rollback()
-    traceback.print_exc()
-  finally:
-    db.session.close()
-
-#----------------------------------------------------------------------------#
-
-def feed_venus():
+# in dependency order, the rows reference the ids of the ones loaded before
+FEEDERS = [
+  ('genres', Genre, data_genre.data),
+  ('artists', Artist, data_artist.data),
+  ('venues', Venue, data_venue.data),
+  ('albums', Album, data_album.data),
+  ('songs', Song, data_song.data),
+  ('shows', Show, data_show.data),
+]
+
+def feed(importer, model, records, keep_ids=False):
   try:
-    data = data_venue.data
-
-    for val in data:
-      venue = Venue(
-                name =  val.get('name', ''),
-                city =  val.get('city', ''),
-                state = val.get('state', ''),
-                address = val.get('address', ''),
-                phone = val.get('phone', ''),
-                image_link = val.get('image_link', ''),
-                facebook_link = val.get('facebook_link', ''),
-                website = val.get('website', ''),
-                seeking_talent = val.get('seeking_talent', False),
-                seeking_description = val.get('seeking_description', '')
-              )
-
-      genres = val.get('genres')
-      for genre_name in genres:
-        genre = Genre.query.filter(func.lower(Genre.name).contains(func.lower(genre_name))).one()
-        venue.genres.append(genre)
-
-      db.session.add(venue)
-
-    db.session.commit()
-  except Exception:
-    db.session.rollback()
-    traceback.print_exc()
-  finally:
-    db.session.close()
-
-#----------------------------------------------------------------------------#
+    count = importer.load(model, records, keep_ids=keep_ids)
 
-def feed_albums():
-  try:
-    data = data_album.data
-
-    for val in data:
-      album = Album(
-                title = val.get('title', Null),
-                artist_id = val.get('artist_id', Null)
-              )
-
-      db.session.add(album)
-
-    db.session.commit()
-  except Exception:
-    db.session.rollback()
-    traceback.print_exc()
-  finally:
-    db.session.close()
-
-#----------------------------------------------------------------------------#
-
-def feed_songs():
-  try:
-    data = data_song.data
-
-    for val in data:
-      song = Song(
-              name = val.get('name', Null),
-              album_id = val.get('album_id', Null)
-            )
-
-      db.session.add(song)
-
-    db.session.commit()
-  except Exception:
-    db.session.rollback()
-    traceback.print_exc()
-  finally:
-    db.session.close()
-
-#----------------------------------------------------------------------------#
-
-def feed_shows():
-  try:
-    data = data_show.data
-
-    for val in data:
-      show = Show(
-              start_time = val.get('start_time', Null),
-              artist_id = val.get('artist_id', Null),
-              venue_id = val.get('venue_id', Null)
-            )
-
-      db.session.add(show)
+    # bulk rows bypass the session, so the search indexes are refilled
+    if model in (Genre, Venue, Artist):
+      for index in search_indexes:
+        index.rebuild()
+      db.session.commit()
+      # venue/artist imports may add genres too
+      genre_registry.invalidate()
+      home_cache.clear()
 
-    db.session.commit()
+    return count
   except Exception:
     db.session.rollback()
     traceback.print_exc()
+    raise
   finally:
     db.session.close()
 
-
 # Feed DB with test data
 @app.route('/feed_db')
 def insert_test_data():
-  if Genre.query.count() <= 0:
-    feed_genres()
-  if Artist.query.count() <= 0:
-    feed_artists()
-  if Venue.query.count() <= 0:
-    feed_venus()
-  if Album.query.count() <= 0:
-    feed_albums()
-  if Song.query.count() <= 0:
-    feed_songs()
-  if Show.query.count() <= 0:
-    feed_shows()
+  importer = BulkImporter(db)
+  for _, model, records in FEEDERS:
+    if model.query.count() <= 0:
+      feed(importer, model, records)
 
   return 'Done Inserting  Data!', 200
 
+# Feed DB from a NDJSON (default) or CSV (Content-Type: text/csv) request body of any size
+# genres are named as for the feeders and must exist; a bad record fails the whole
+# import with 400 and its line, a row the database refuses with 422
+@app.route('/feed_db/<kind>', methods=['POST'])
+def import_data(kind):
+  models = {name: model for name, model, _ in FEEDERS}
+  if kind not in models:
+    abort(404)
+
+  format = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+  lines = (line.decode('utf-8') for line in request.stream)
+
+  start = time.perf_counter()
+  try:
+    count = feed(BulkImporter(db), models[kind], read_records(lines, format), keep_ids=request.args.get('keep_ids') == '1')
+  except RecordError as e:
+    # nothing of the import is kept, the line tells what to fix
+    return jsonify({'success': False, 'error': str(e), 'line': e.line}), 400
+  except IntegrityError as e:
+    return jsonify({'success': False, 'error': str(e.orig)}), 422
+  except Exception as e:
+    return server_error(e)
+  elapsed = time.perf_counter() - start
+
+  return jsonify({
+    'success': True,
+    'kind': kind,
+    'rows': count,
+    'rows_per_second': int(count / elapsed) if elapsed else count
+  })
+
 #  ----------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,258 @@
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#
+# Seeds a throwaway database and measures controllers by wall time and by
+# the number of SQL statements they issue. Defaults to an in-memory SQLite
+# database, point DATABASE_URL at a PostgreSQL database to benchmark there.
+#
+#   python benchmark.py venues --sizes 100 1000 10000
+#   python benchmark.py search --sizes 100000
+#   python benchmark.py datetime --sizes 1000 10000
+#   python benchmark.py import --sizes 1000000
+#   python benchmark.py home --sizes 100000
+#   python benchmark.py stream --sizes 100000
+#   python benchmark.py schedule --sizes 100000
+#----------------------------------------------------------------------------#
+
+import os
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import argparse
+import json
+import time
+import tracemalloc
+import babel.dates
+import dateutil.parser
+from datetime import datetime, timedelta
+from flask import render_template
+from sqlalchemy import event, func
+
+from app import app, db, Venue, Artist, Show, venue_search, home_cache, get_shows_query, show_schedule, SHOW_DURATION, format_datetime, format_datetime_cached, DATETIME_FORMATS
+from importer import BulkImporter, read_records
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+class QueryCounter(object):
+  '''
+  counts the statements sent to the database while the context is active
+  '''
+  def __init__(self):
+    self.count = 0
+
+  def _count(self, *args, **kwargs):
+    self.count += 1
+
+  def __enter__(self):
+    event.listen(db.engine, 'before_cursor_execute', self._count)
+    return self
+
+  def __exit__(self, *exc):
+    event.remove(db.engine, 'before_cursor_execute', self._count)
+
+def reset_db():
+  db.session.remove()
+  db.drop_all()
+  db.create_all()
+
+def seed_venues(count, shows_per_venue=2):
+  now = datetime.today()
+  cities = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'), ('Seattle', 'WA')]
+
+  db.session.bulk_insert_mappings(Artist, [{
+    'id': 1,
+    'name': 'Benchmark Artist',
+    'available_from': now - timedelta(days=365),
+    'available_to': now + timedelta(days=365)
+  }])
+  db.session.bulk_insert_mappings(Venue, [{
+    'id': i,
+    'name': 'Venue %d' % i,
+    'city': cities[i % len(cities)][0],
+    'state': cities[i % len(cities)][1]
+  } for i in range(1, count + 1)])
+  db.session.bulk_insert_mappings(Show, [{
+    'venue_id': i,
+    'artist_id': 1,
+    # 4 hours apart, the one artist never plays two shows at once
+    'start_time': now + (n % 2 and 1 or -1) * (timedelta(days=30) + timedelta(hours=4) * (i * shows_per_venue + n))
+  } for i in range(1, count + 1) for n in range(shows_per_venue)])
+  db.session.commit()
+
+def measure_call(fn, repeat=5):
+  timings = []
+  with QueryCounter() as counter:
+    for _ in range(repeat):
+      start = time.perf_counter()
+      fn()
+      timings.append(time.perf_counter() - start)
+
+  return {
+    'best_ms': min(timings) * 1000,
+    'queries': counter.count // repeat
+  }
+
+def measure(client, url, repeat=5):
+  def get():
+    response = client.get(url)
+    assert response.status_code == 200, response.status_code
+
+  return measure_call(get, repeat)
+
+def report(name, size, result):
+  print('{:<12} {:>10} {:>12.2f} {:>10}'.format(name, size, result['best_ms'], result['queries']))
+
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#----------------------------------------------------------------------------#
+
+def bench_venues(sizes):
+  # /venues must issue the same number of queries whatever the venue count
+  client = app.test_client()
+  for size in sizes:
+    reset_db()
+    seed_venues(size)
+    report('venues', size, measure(client, '/venues'))
+
+def bench_search(sizes, term='4242'):
+  # the old unindexed LIKE scan against the full-text index, on the same rows
+  for size in sizes:
+    reset_db()
+    seed_venues(size, shows_per_venue=0)
+    # bulk inserts bypass the session, so the index is filled explicitly
+    venue_search.rebuild()
+    db.session.commit()
+
+    like_scan = lambda: Venue.query.filter(func.lower(Venue.name).contains(func.lower(term))).all()
+    report('search-like', size, measure_call(like_scan))
+    report('search-index', size, measure_call(lambda: venue_search.search(term)))
+
+def bench_datetime(sizes, distinct=500):
+  # one `datetime('full')` per show tile, the show times repeat across tiles
+  base = datetime(2035, 4, 1, 20, 0)
+  for size in sizes:
+    values = [base + timedelta(hours=n % distinct) for n in range(size)]
+    strings = [value.isoformat() for value in values]
+
+    def old_filter():
+      for value in strings:
+        babel.dates.format_datetime(dateutil.parser.parse(value), DATETIME_FORMATS['full'])
+
+    def cold_filter():
+      format_datetime_cached.cache_clear()
+      for value in values:
+        format_datetime(value, 'full')
+
+    def warm_filter():
+      for value in values:
+        format_datetime(value, 'full')
+
+    report('dt-reparse', size, measure_call(old_filter))
+    report('dt-cold', size, measure_call(cold_filter))
+    report('dt-warm', size, measure_call(warm_filter))
+
+def bench_import(sizes, venues=100):
+  # shows streamed as NDJSON lines through the bulk importer
+  base = datetime(2035, 4, 1, 20, 0)
+  for size in sizes:
+    reset_db()
+    seed_venues(venues, shows_per_venue=0)
+
+    lines = (json.dumps({
+      'venue_id': n % venues + 1,
+      'artist_id': 1,
+      'start_time': (base + timedelta(hours=4 * n)).isoformat()
+    }) for n in range(size))
+
+    start = time.perf_counter()
+    count = BulkImporter(db).load(Show, read_records(lines))
+    elapsed = time.perf_counter() - start
+
+    assert Show.query.count() == count == size
+    print('{:<12} {:>10} {:>12.2f} {:>10} {:>12.0f} rows/s'.format('import', size, elapsed * 1000, '-', count / elapsed))
+
+def bench_home(sizes):
+  # the home page with its listings rebuilt on every view, then from the cache
+  client = app.test_client()
+  for size in sizes:
+    reset_db()
+    seed_venues(size, shows_per_venue=0)
+
+    def uncached():
+      home_cache.clear()
+      assert client.get('/').status_code == 200
+
+    report('home-build', size, measure_call(uncached))
+    report('home-cached', size, measure(client, '/'))
+
+def bench_stream(sizes):
+  # every show rendered in memory against /shows/all streamed, by time to
+  # the first chunk, total time and peak python memory
+  def run(name, size, render):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with app.test_request_context('/shows/all'):
+      first = None
+      for chunk in render():
+        first = first or time.perf_counter() - start
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('{:<12} {:>10} {:>12.2f} {:>10} {:>12.2f} ms first {:>8.1f} MiB peak'.format(
+      name, size, total * 1000, '-', first * 1000, peak / 2 ** 20))
+
+  for size in sizes:
+    reset_db()
+    seed_venues(size // 2)
+
+    full = lambda: [render_template('pages/shows.html', shows=get_shows_query().order_by(Show.start_time, Show.id).all(), page=None)]
+    streamed = lambda: app.full_dispatch_request().response
+
+    run('shows-full', size, full)
+    run('shows-stream', size, streamed)
+
+def bench_schedule(sizes):
+  # the conflict check of one more show for the artist booked `size` times,
+  # by the indexed overlap query, against scanning the artist's shows
+  for size in sizes:
+    reset_db()
+    seed_venues(size // 2)
+    start = datetime.today() + timedelta(days=60)
+
+    def scan():
+      for show in Show.query.filter_by(artist_id=1):
+        if show.start_time < start + SHOW_DURATION and show.end_time > start:
+          return True
+
+    report('sched-scan', size, measure_call(scan))
+    report('sched-query', size, measure_call(lambda: show_schedule.conflicts(1, 1, start, start + SHOW_DURATION)))
+
+BENCHMARKS = {
+  'venues': bench_venues,
+  'search': bench_search,
+  'datetime': bench_datetime,
+  'import': bench_import,
+  'home': bench_home,
+  'stream': bench_stream,
+  'schedule': bench_schedule,
+}
+
+#----------------------------------------------------------------------------#
+# Launch.
+#----------------------------------------------------------------------------#
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Fyyur benchmarks')
+  parser.add_argument('benchmarks', nargs='*', help=', '.join(sorted(BENCHMARKS)))
+  parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 10000])
+  args = parser.parse_args()
+
+  unknown = set(args.benchmarks) - set(BENCHMARKS)
+  if unknown:
+    parser.error('unknown benchmarks: ' + ', '.join(sorted(unknown)))
+
+  print('{:<12} {:>10} {:>12} {:>10}'.format('benchmark', 'rows', 'best (ms)', 'queries'))
+  with app.app_context():
+    for name in args.benchmarks or sorted(BENCHMARKS):
+      BENCHMARKS[name](args.sizes)
@@ -0,0 +1,42 @@
+#----------------------------------------------------------------------------#
+# Cache.
+#
+# Small in-process cache for values that are expensive to build and cheap
+# to keep, such as the home page listings. Entries expire after a TTL, so
+# other processes catch up with writes they did not see, and writers of
+# this process clear them explicitly.
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+
+class TTLCache(object):
+  '''
+  maps keys to values built on demand by `get`, each value lives `ttl` seconds
+  '''
+  def __init__(self, ttl):
+    self.ttl = ttl
+    self.entries = {}
+    self.generation = 0
+    self.lock = threading.Lock()
+
+  def get(self, key, build):
+    now = time.monotonic()
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is not None and entry[0] > now:
+        return entry[1]
+      generation = self.generation
+
+    value = build()
+
+    with self.lock:
+      # a value built across a clear() may predate the write that cleared it
+      if generation == self.generation:
+        self.entries[key] = (now + self.ttl, value)
+    return value
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+      self.generation += 1
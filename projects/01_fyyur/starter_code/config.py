@@ -10,4 +10,4 @@ DEBUG = True
 
 
 # IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgres://postgres@localhost:5432/fyyur'
\ No newline at end of file
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgres://postgres@localhost:5432/fyyur')
\ No newline at end of file
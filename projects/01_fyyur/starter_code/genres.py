@@ -0,0 +1,103 @@
+#----------------------------------------------------------------------------#
+# Genres.
+#
+# Genres are read on every venue/artist form and written almost never, so
+# the process keeps one copy of them. Every committed genre write bumps the
+# registry version and the next reader reloads the whole list, one query.
+#----------------------------------------------------------------------------#
+
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+class GenreRegistry(object):
+  '''
+  in-process registry of the genre rows, sorted by name.
+  the cached genres are detached instances: they are merged into a session
+  without loading, so attaching genres to a venue/artist costs no query.
+  '''
+  def __init__(self, db, model):
+    self.db = db
+    self.model = model
+    self.version = 0
+    self.loaded_version = None
+    self.genres = []
+    self.by_id = {}
+    self.lock = threading.Lock()
+
+  def invalidate(self):
+    '''
+    to be called after genre writes made outside the session, such as bulk inserts
+    '''
+    with self.lock:
+      self.version += 1
+
+  def load(self):
+    with self.lock:
+      if self.loaded_version == self.version:
+        return self.genres
+      version = self.version
+
+    genres = []
+    for genre_id, name in self.db.session.query(self.model.id, self.model.name).order_by(self.model.name):
+      genre = self.model(id=genre_id, name=name)
+      make_transient_to_detached(genre)
+      genres.append(genre)
+
+    with self.lock:
+      # a write committed while loading leaves the version ahead, so the
+      # next reader loads again
+      if version == self.version:
+        self.genres = genres
+        self.by_id = {genre.id: genre for genre in genres}
+        self.loaded_version = version
+    return genres
+
+  # Reads...
+
+  def choices(self):
+    return [(genre.id, genre.name) for genre in self.load()]
+
+  def get(self, ids):
+    '''
+    returns the genres of `ids` bound to the current session. ids missing from
+    the registry (added by another process) are fetched with one IN query.
+    '''
+    self.load()
+    session = self.db.session
+    genres = []
+    missing = []
+    for genre_id in ids:
+      genre = self.by_id.get(genre_id)
+      if genre is None:
+        missing.append(genre_id)
+      else:
+        genres.append(session.merge(genre, load=False))
+
+    if missing:
+      genres.extend(self.model.query.filter(self.model.id.in_(missing)).all())
+    return genres
+
+  # Invalidation...
+
+  def watch(self, session):
+    '''
+    invalidates the registry when a transaction of `session` that wrote genres commits
+    '''
+    @event.listens_for(session, 'after_flush')
+    def flag_genre_writes(session, flush_context):
+      # attaching a genre to a venue/artist only dirties its backref collection
+      dirty = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+      for obj in list(session.new) + dirty + list(session.deleted):
+        if isinstance(obj, self.model):
+          session.info['genres_changed'] = True
+          return
+
+    @event.listens_for(session, 'after_commit')
+    def invalidate_genres(session):
+      if session.info.pop('genres_changed', False):
+        self.invalidate()
+
+    @event.listens_for(session, 'after_rollback')
+    def forget_genre_writes(session):
+      session.info.pop('genres_changed', None)
@@ -0,0 +1,255 @@
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+# Loads records of any model from an iterable (a parsed NDJSON/CSV stream,
+# or the lists in temp/) in batches: one executemany per batch, or COPY on
+# PostgreSQL, and genres resolved from a name -> id map loaded once.
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+from datetime import datetime
+import dateutil.parser
+from sqlalchemy import func, select, text, Boolean, DateTime, Integer
+
+BATCH_SIZE = 10000
+
+#----------------------------------------------------------------------------#
+# Readers.
+#----------------------------------------------------------------------------#
+
+class RecordError(ValueError):
+  '''
+  a record that cannot be imported, with the line it ends on when read from
+  a stream (or its position in the records otherwise)
+  '''
+  def __init__(self, message, line=None):
+    super(RecordError, self).__init__(message if line is None else 'line {}: {}'.format(line, message))
+    self.line = line
+
+class RecordReader(object):
+  '''
+  iterates over the records of a text stream (any iterable of lines), either
+  newline-delimited json or csv with a header row, without reading it whole.
+  `line` is the line the last record read ends on.
+  '''
+  def __init__(self, lines, format='ndjson'):
+    self.lines = lines
+    self.format = format
+    self.line = 0
+
+  def __iter__(self):
+    if self.format == 'csv':
+      reader = csv.DictReader(self.lines)
+      for record in reader:
+        self.line = reader.line_num
+        yield record
+      return
+
+    for self.line, line in enumerate(self.lines, 1):
+      line = line.strip()
+      if not line:
+        continue
+      try:
+        record = json.loads(line)
+      except ValueError as e:
+        raise RecordError('invalid json, {}'.format(e), self.line)
+      if not isinstance(record, dict):
+        raise RecordError('a record is a json object', self.line)
+      yield record
+
+def read_records(lines, format='ndjson'):
+  return RecordReader(lines, format)
+
+#----------------------------------------------------------------------------#
+# Converters.
+#----------------------------------------------------------------------------#
+
+def to_datetime(value):
+  if isinstance(value, datetime):
+    return value
+  try:
+    return datetime.fromisoformat(value)
+  except ValueError:
+    return dateutil.parser.parse(value)
+
+def to_boolean(value):
+  if isinstance(value, str):
+    return value.strip().lower() in ('1', 'true', 't', 'yes', 'y')
+  return bool(value)
+
+def get_converter(column):
+  if isinstance(column.type, DateTime):
+    convert = to_datetime
+  elif isinstance(column.type, Boolean):
+    convert = to_boolean
+  elif isinstance(column.type, Integer):
+    convert = int
+  else:
+    return lambda value: value
+
+  # csv has no null, an empty field means no value for typed columns
+  return lambda value: None if value is None or value == '' else convert(value)
+
+class RowContext(object):
+  '''
+  stands for the execution context handed to context-sensitive defaults
+  '''
+  def __init__(self, row):
+    self.row = row
+
+  def get_current_parameters(self):
+    return self.row
+
+def get_default(column):
+  '''
+  returns a function building the default of a column missing from a record
+  out of the columns of the row set before it
+  '''
+  default = column.default
+  if default is not None and default.is_scalar:
+    return lambda row: default.arg
+  if default is not None and default.is_callable:
+    # sqlalchemy wraps every python default to take the execution context
+    return lambda row: default.arg(RowContext(row))
+  return lambda row: None
+
+def split_genres(value):
+  if isinstance(value, str):
+    return [name.strip() for name in value.split(',') if name.strip()]
+  return value or []
+
+#----------------------------------------------------------------------------#
+# Importer.
+#----------------------------------------------------------------------------#
+
+class BulkImporter(object):
+  '''
+  bulk loader working on the session connection and transaction.
+  ids are assigned in stream order after the current max id, the way the
+  feeders always numbered rows, unless keep_ids is set and records carry one.
+  '''
+  def __init__(self, db, batch_size=BATCH_SIZE):
+    self.db = db
+    self.batch_size = batch_size
+    self.genre_ids = None
+
+  def load(self, model, records, keep_ids=False):
+    connection = self.db.session.connection()
+    table = model.__table__
+    columns = [column for column in table.c if column.name != 'id']
+    converters = [(column.name, get_converter(column), get_default(column)) for column in columns]
+    genres = self.get_genre_link(model)
+
+    next_id = (connection.execute(select([func.max(table.c.id)])).scalar() or 0) + 1
+    count = 0
+    rows = []
+    links = []
+
+    # each record is converted as it is read, so that a bad one is reported
+    # with the line the reader is on
+    for position, record in enumerate(records, 1):
+      try:
+        row = {}
+        for name, convert, default in converters:
+          row[name] = convert(record[name]) if name in record else default(row)
+
+        if keep_ids and record.get('id') not in (None, ''):
+          row['id'] = int(record['id'])
+        else:
+          row['id'] = next_id
+
+        if genres is not None:
+          for genre_id in self.get_genre_ids(connection, split_genres(record.get('genres'))):
+            links.append({genres[0]: row['id'], genres[1]: genre_id})
+      except (KeyError, TypeError, ValueError, OverflowError) as e:
+        raise RecordError(str(e), getattr(records, 'line', position))
+
+      next_id = max(next_id, row['id'] + 1)
+      rows.append(row)
+      if len(rows) >= self.batch_size:
+        count += self.insert_batch(connection, model, rows, links)
+        rows, links = [], []
+
+    if rows:
+      count += self.insert_batch(connection, model, rows, links)
+    self.reset_sequence(connection, table)
+    self.db.session.commit()
+    return count
+
+  # Genres...
+
+  def get_genre_link(self, model):
+    '''
+    the entity and genre column names of the model genres association table, if any
+    '''
+    genres = getattr(model, 'genres', None)
+    if genres is None:
+      return None
+
+    secondary = genres.property.secondary
+    genre_table = genres.property.mapper.local_table
+    entity_column = next(c for c in secondary.c if c.references(model.__table__.c.id))
+    genre_column = next(c for c in secondary.c if c.references(genre_table.c.id))
+    self.genre_table = genre_table
+    return entity_column.name, genre_column.name
+
+  def get_genre_ids(self, connection, names):
+    '''
+    resolves genre names the way the feeders always did, case-insensitively
+    and as a part of one genre name ('hop' is 'Hip-Hop'), against the genres
+    loaded once. unknown and ambiguous names raise ValueError, genres are
+    not created by imports.
+    '''
+    if self.genre_ids is None:
+      rows = connection.execute(select([self.genre_table.c.id, self.genre_table.c.name]))
+      self.genre_ids = {name.lower(): genre_id for genre_id, name in rows}
+
+    ids = []
+    for name in names:
+      name = name.lower()
+      genre_id = self.genre_ids.get(name)
+      if genre_id is None:
+        matches = {genre_id for genre, genre_id in self.genre_ids.items() if name in genre}
+        if len(matches) != 1:
+          raise ValueError('{} genre: {}'.format('unknown' if not matches else 'ambiguous', name))
+        genre_id = self.genre_ids[name] = matches.pop()
+      if genre_id not in ids:
+        ids.append(genre_id)
+    return ids
+
+  # Writes...
+
+  def insert_batch(self, connection, model, rows, links):
+    self.insert(connection, model.__table__, rows)
+    if links:
+      self.insert(connection, model.genres.property.secondary, links)
+    return len(rows)
+
+  def insert(self, connection, table, rows):
+    if connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2':
+      self.copy(connection, table, rows)
+    else:
+      connection.execute(table.insert(), rows)
+
+  def copy(self, connection, table, rows):
+    names = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+      writer.writerow(['\\N' if row[name] is None else row[name] for name in names])
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(
+      "COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N')".format(table.name, ', '.join(names)),
+      buffer
+    )
+
+  def reset_sequence(self, connection, table):
+    # ids were assigned here, move the serial past them
+    if connection.dialect.name == 'postgresql':
+      connection.execute(text(
+        "SELECT setval(pg_get_serial_sequence('{0}', 'id'), coalesce(max(id), 0) + 1, false) FROM {0}".format(table.name)
+      ))
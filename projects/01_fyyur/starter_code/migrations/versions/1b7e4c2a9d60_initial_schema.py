@@ -0,0 +1,109 @@
+"""initial schema
+
+Revision ID: 1b7e4c2a9d60
+Revises:
+Create Date: 2026-10-17 11:00:00.000000
+
+The tables of the models before the home page listings, the revisions after
+this one bring them up to the current models. A database created with
+`db.create_all()` before there were migrations already has them: only the
+missing tables are created, the existing ones are left to the next revisions.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b7e4c2a9d60'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# in dependency order, the tables reference the ones before them
+TABLES = [
+    ('genres', lambda: [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    ]),
+    ('venues', lambda: [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('city', sa.String(), nullable=True),
+        sa.Column('state', sa.String(), nullable=True),
+        sa.Column('address', sa.String(), nullable=True),
+        sa.Column('phone', sa.String(), nullable=True),
+        sa.Column('image_link', sa.String(), nullable=True),
+        sa.Column('facebook_link', sa.String(), nullable=True),
+        sa.Column('website', sa.String(), nullable=True),
+        sa.Column('seeking_talent', sa.Boolean(), nullable=True),
+        sa.Column('seeking_description', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    ]),
+    ('artists', lambda: [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('city', sa.String(), nullable=True),
+        sa.Column('state', sa.String(), nullable=True),
+        sa.Column('phone', sa.String(), nullable=True),
+        sa.Column('image_link', sa.String(), nullable=True),
+        sa.Column('facebook_link', sa.String(), nullable=True),
+        sa.Column('website', sa.String(), nullable=True),
+        sa.Column('seeking_venue', sa.Boolean(), nullable=True),
+        sa.Column('seeking_description', sa.String(), nullable=True),
+        sa.Column('available_from', sa.DateTime(), nullable=False),
+        sa.Column('available_to', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    ]),
+    ('venue_genre', lambda: [
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id']),
+        sa.ForeignKeyConstraint(['venue_id'], ['venues.id']),
+        sa.PrimaryKeyConstraint('venue_id', 'genre_id'),
+    ]),
+    ('artist_genre', lambda: [
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['artist_id'], ['artists.id']),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id']),
+        sa.PrimaryKeyConstraint('artist_id', 'genre_id'),
+    ]),
+    ('shows', lambda: [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['artist_id'], ['artists.id']),
+        sa.ForeignKeyConstraint(['venue_id'], ['venues.id']),
+        sa.PrimaryKeyConstraint('id'),
+    ]),
+    ('albums', lambda: [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['artist_id'], ['artists.id']),
+        sa.PrimaryKeyConstraint('id'),
+    ]),
+    ('songs', lambda: [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('album_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['album_id'], ['albums.id']),
+        sa.PrimaryKeyConstraint('id'),
+    ]),
+]
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+
+    for table, columns in TABLES:
+        if table not in tables:
+            op.create_table(table, *columns())
+
+
+def downgrade():
+    for table, _ in reversed(TABLES):
+        op.drop_table(table)
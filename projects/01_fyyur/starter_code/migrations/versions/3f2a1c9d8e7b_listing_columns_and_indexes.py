@@ -0,0 +1,49 @@
+"""created_at of venues and artists, and its index
+
+Revision ID: 3f2a1c9d8e7b
+Revises: 1b7e4c2a9d60
+Create Date: 2026-10-17 12:00:00.000000
+
+The home page lists the most recently created venues and artists: they get
+a created_at column, existing rows take the time of the migration, and an
+index on (created_at, id).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a1c9d8e7b'
+down_revision = '1b7e4c2a9d60'
+branch_labels = None
+depends_on = None
+
+LISTING_INDEXES = {
+    'venues': [('ix_venues_created_at_id', ['created_at', 'id'])],
+    'artists': [('ix_artists_created_at_id', ['created_at', 'id'])],
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    for table, indexes in LISTING_INDEXES.items():
+        if 'created_at' not in [column['name'] for column in inspector.get_columns(table)]:
+            # SQLite only adds NOT NULL columns with a constant default, the table is copied there
+            recreate = 'always' if bind.dialect.name == 'sqlite' else 'auto'
+            with op.batch_alter_table(table, recreate=recreate) as batch_op:
+                batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()))
+
+        existing = [index['name'] for index in inspector.get_indexes(table)]
+        for name, columns in indexes:
+            if name not in existing:
+                op.create_index(name, table, columns)
+
+
+def downgrade():
+    for table, indexes in LISTING_INDEXES.items():
+        for name, _ in indexes:
+            op.drop_index(name, table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('created_at')
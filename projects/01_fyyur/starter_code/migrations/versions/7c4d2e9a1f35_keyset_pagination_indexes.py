@@ -0,0 +1,40 @@
+"""the keyset pagination indexes of /venues, /artists and /shows
+
+Revision ID: 7c4d2e9a1f35
+Revises: 3f2a1c9d8e7b
+Create Date: 2026-10-17 13:00:00.000000
+
+The listing pages seek and order on their sort columns, with NULL names,
+cities and states as '' (see sort_key in app.py): the venues and artists
+indexes are on the same expressions. Indexes of the same name on the raw
+columns, from before the expressions, are rebuilt.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4d2e9a1f35'
+down_revision = '3f2a1c9d8e7b'
+branch_labels = None
+depends_on = None
+
+EXPRESSION_INDEXES = [
+    ('ix_venues_city_state_name_id', "CREATE INDEX ix_venues_city_state_name_id ON venues (coalesce(city, ''), coalesce(state, ''), coalesce(name, ''), id)"),
+    ('ix_artists_name_id', "CREATE INDEX ix_artists_name_id ON artists (coalesce(name, ''), id)"),
+]
+
+
+def upgrade():
+    for name, statement in EXPRESSION_INDEXES:
+        op.execute('DROP INDEX IF EXISTS %s' % name)
+        op.execute(statement)
+
+    if 'ix_shows_start_time_id' not in [index['name'] for index in sa.inspect(op.get_bind()).get_indexes('shows')]:
+        op.create_index('ix_shows_start_time_id', 'shows', ['start_time', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_shows_start_time_id', table_name='shows')
+    for name, _ in EXPRESSION_INDEXES:
+        op.execute('DROP INDEX IF EXISTS %s' % name)
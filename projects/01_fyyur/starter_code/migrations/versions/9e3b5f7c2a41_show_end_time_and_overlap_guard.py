@@ -0,0 +1,118 @@
+"""end_time of shows, and the guard against overlapping shows
+
+Revision ID: 9e3b5f7c2a41
+Revises: 7c4d2e9a1f35
+Create Date: 2026-10-17 14:00:00.000000
+
+A show books its venue and its artist from start_time to end_time, existing
+shows end 3 hours after they start (SHOW_DURATION in app.py). No venue or
+artist may play two shows at once: PostgreSQL gets the exclusion constraints
+of scheduling.py, SQLite its overlap triggers, both get the (venue_id,
+start_time) and (artist_id, start_time) indexes. Stored shows that already
+overlap stop the upgrade, they are listed in the error.
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3b5f7c2a41'
+down_revision = '7c4d2e9a1f35'
+branch_labels = None
+depends_on = None
+
+SHOW_DURATION = timedelta(hours=3)
+
+# the columns a show books, and the name used for them in the guard
+RESOURCES = (('venue_id', 'venue'), ('artist_id', 'artist'))
+
+INDEXES = [
+    ('ix_shows_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_shows_artist_id_start_time', ['artist_id', 'start_time']),
+]
+
+EXCLUSION_CONSTRAINT = '''
+    ALTER TABLE shows ADD CONSTRAINT shows_{name}_overlap
+    EXCLUDE USING gist ({column} WITH =, tsrange(start_time, end_time) WITH &&)
+'''
+
+# as in scheduling.py, frozen at this revision
+SQLITE_OVERLAP_TRIGGER = '''
+    CREATE TRIGGER shows_{name}_overlap_{event}
+    BEFORE {event} ON shows
+    WHEN (
+      SELECT end_time FROM shows
+      WHERE {column} = NEW.{column} AND id IS NOT NEW.id AND start_time < NEW.end_time
+      ORDER BY start_time DESC LIMIT 1
+    ) > NEW.start_time
+    BEGIN
+      SELECT RAISE(ABORT, 'show overlaps another show of the {name}');
+    END
+'''
+
+OVERLAPS = '''
+    SELECT a.id, b.id FROM shows a JOIN shows b
+    ON a.{column} = b.{column} AND a.id < b.id
+    AND a.start_time < b.end_time AND b.start_time < a.end_time
+    ORDER BY a.id, b.id
+'''
+
+
+def upgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    columns = [column['name'] for column in sa.inspect(bind).get_columns('shows')]
+
+    if 'end_time' not in columns:
+        op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+        if dialect == 'postgresql':
+            op.execute("UPDATE shows SET end_time = start_time + interval '3 hours'")
+        else:
+            # through the DateTime type, so the stored format is the one of the
+            # model: the overlap triggers compare the times as strings
+            shows = sa.table('shows', sa.column('id', sa.Integer), sa.column('start_time', sa.DateTime), sa.column('end_time', sa.DateTime))
+            rows = bind.execute(sa.select([shows.c.id, shows.c.start_time])).fetchall()
+            for show_id, start_time in rows:
+                bind.execute(shows.update().where(shows.c.id == show_id).values(end_time=start_time + SHOW_DURATION))
+        with op.batch_alter_table('shows') as batch_op:
+            batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+
+    existing = [index['name'] for index in sa.inspect(bind).get_indexes('shows')]
+    for name, index_columns in INDEXES:
+        if name not in existing:
+            op.create_index(name, 'shows', index_columns)
+
+    for column, name in RESOURCES:
+        overlaps = bind.execute(sa.text(OVERLAPS.format(column=column))).fetchall()
+        if overlaps:
+            raise RuntimeError('shows of the same {} overlap, move or delete one of each pair (ids): {}'.format(
+                name, ', '.join('{}/{}'.format(*pair) for pair in overlaps)))
+
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for column, name in RESOURCES:
+            op.execute('ALTER TABLE shows DROP CONSTRAINT IF EXISTS shows_{}_overlap'.format(name))
+            op.execute(EXCLUSION_CONSTRAINT.format(name=name, column=column))
+    elif dialect == 'sqlite':
+        for column, name in RESOURCES:
+            for event in ('INSERT', 'UPDATE'):
+                op.execute('DROP TRIGGER IF EXISTS shows_{}_overlap_{}'.format(name, event))
+                op.execute(SQLITE_OVERLAP_TRIGGER.format(name=name, column=column, event=event))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    for column, name in RESOURCES:
+        if dialect == 'postgresql':
+            op.execute('ALTER TABLE shows DROP CONSTRAINT IF EXISTS shows_{}_overlap'.format(name))
+        elif dialect == 'sqlite':
+            for event in ('INSERT', 'UPDATE'):
+                op.execute('DROP TRIGGER IF EXISTS shows_{}_overlap_{}'.format(name, event))
+
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='shows')
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.drop_column('end_time')
@@ -0,0 +1,268 @@
+#----------------------------------------------------------------------------#
+# Scheduling.
+#
+# A venue or an artist can only play one show at a time. PostgreSQL enforces
+# it with exclusion constraints over (venue_id, tsrange) and (artist_id,
+# tsrange), whose GiST indexes also answer the conflict lookups. SQLite
+# (local/dev) has no range types, so triggers reject overlapping inserts and
+# updates, and the lookups use the (venue_id, start_time) and (artist_id,
+# start_time) indexes. Either way the database is the guard, writes from
+# other processes or outside the session included. A new schema gets them
+# from install(), an existing database from the 9e3b5f7c2a41 migration.
+#----------------------------------------------------------------------------#
+
+import random
+from sqlalchemy import DDL, and_, event, func, or_, select
+
+# the columns a show books, and the name used for them in conflicts
+RESOURCES = (('venue_id', 'venue'), ('artist_id', 'artist'))
+
+# raises on an insert or update of a show overlapping another one of the same
+# venue/artist, stored times compare as ISO strings. the shows of a
+# venue/artist do not overlap, so their ends are in the order of their starts
+# and only the last one starting before the new show ends can overlap it: one
+# index seek instead of a scan of every earlier show.
+SQLITE_OVERLAP_TRIGGER = '''
+  CREATE TRIGGER %(table)s_{name}_overlap_{event}
+  BEFORE {event} ON %(table)s
+  WHEN (
+    SELECT end_time FROM %(table)s
+    WHERE {column} = NEW.{column} AND id IS NOT NEW.id AND start_time < NEW.end_time
+    ORDER BY start_time DESC LIMIT 1
+  ) > NEW.start_time
+  BEGIN
+    SELECT RAISE(ABORT, 'show overlaps another show of the {name}');
+  END
+'''
+
+#----------------------------------------------------------------------------#
+# Interval tree.
+#----------------------------------------------------------------------------#
+
+class Node(object):
+  __slots__ = ('start', 'end', 'key', 'priority', 'left', 'right', 'max_end')
+
+  def __init__(self, start, end, key):
+    self.start = start
+    self.end = end
+    self.key = key
+    self.priority = random.random()
+    self.left = None
+    self.right = None
+    self.max_end = end
+
+  def update(self):
+    self.max_end = self.end
+    for child in (self.left, self.right):
+      if child is not None and child.max_end > self.max_end:
+        self.max_end = child.max_end
+
+def rotate_right(node):
+  left = node.left
+  node.left, left.right = left.right, node
+  node.update()
+  left.update()
+  return left
+
+def rotate_left(node):
+  right = node.right
+  node.right, right.left = right.left, node
+  node.update()
+  right.update()
+  return right
+
+class IntervalTree(object):
+  '''
+  half-open [start, end) intervals in a treap ordered by start, every node
+  knows the latest end below it. insert, remove and finding the intervals
+  overlapping a range take O(log n) expected (plus one step per match).
+  '''
+  def __init__(self, intervals=()):
+    self.root = None
+    self.size = 0
+    for start, end, key in intervals:
+      self.insert(start, end, key)
+
+  def __len__(self):
+    return self.size
+
+  def insert(self, start, end, key):
+    self.root = self._insert(self.root, Node(start, end, key))
+    self.size += 1
+
+  def _insert(self, node, new):
+    if node is None:
+      return new
+    if (new.start, new.key) < (node.start, node.key):
+      node.left = self._insert(node.left, new)
+      if node.left.priority > node.priority:
+        return rotate_right(node)
+    else:
+      node.right = self._insert(node.right, new)
+      if node.right.priority > node.priority:
+        return rotate_left(node)
+    node.update()
+    return node
+
+  def remove(self, start, key):
+    size = self.size
+    self.root = self._remove(self.root, start, key)
+    return self.size < size
+
+  def _remove(self, node, start, key):
+    if node is None:
+      return None
+    if (start, key) < (node.start, node.key):
+      node.left = self._remove(node.left, start, key)
+    elif (start, key) > (node.start, node.key):
+      node.right = self._remove(node.right, start, key)
+    else:
+      self.size -= 1
+      return self._merge(node.left, node.right)
+    node.update()
+    return node
+
+  def _merge(self, left, right):
+    if left is None or right is None:
+      return left or right
+    if left.priority > right.priority:
+      left.right = self._merge(left.right, right)
+      left.update()
+      return left
+    right.left = self._merge(left, right.left)
+    right.update()
+    return right
+
+  def overlaps(self, start, end):
+    '''
+    returns the keys of the intervals overlapping [start, end), by start
+    '''
+    keys = []
+    self._overlaps(self.root, start, end, keys)
+    return keys
+
+  def _overlaps(self, node, start, end, keys):
+    # nothing below ends after start
+    if node is None or node.max_end <= start:
+      return
+    self._overlaps(node.left, start, end, keys)
+    if node.start < end:
+      if node.end > start:
+        keys.append(node.key)
+      self._overlaps(node.right, start, end, keys)
+
+#----------------------------------------------------------------------------#
+# Schedule.
+#----------------------------------------------------------------------------#
+
+class ShowSchedule(object):
+  '''
+  conflict checks of the shows of one model with venue_id, artist_id,
+  start_time and end_time columns.
+  '''
+  def __init__(self, db, model):
+    self.db = db
+    self.model = model
+
+  def install(self):
+    '''
+    adds the exclusion constraints to the table DDL on PostgreSQL, and the
+    overlap triggers on SQLite
+    '''
+    table = self.model.__table__
+    event.listen(table, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+    for column, name in RESOURCES:
+      event.listen(table, 'after_create', DDL(
+        'ALTER TABLE %(table)s ADD CONSTRAINT %(table)s_{name}_overlap '
+        'EXCLUDE USING gist ({column} WITH =, tsrange(start_time, end_time) WITH &&)'.format(name=name, column=column)
+      ).execute_if(dialect='postgresql'))
+      for trigger_event in ('INSERT', 'UPDATE'):
+        event.listen(table, 'after_create', DDL(
+          SQLITE_OVERLAP_TRIGGER.format(name=name, column=column, event=trigger_event)
+        ).execute_if(dialect='sqlite'))
+
+  # Checks...
+
+  def conflicts(self, venue_id, artist_id, start, end):
+    '''
+    returns the ids of the shows overlapping [start, end) at the venue and
+    with the artist, as {'venue': [...], 'artist': [...]}
+    '''
+    values = {'venue_id': int(venue_id), 'artist_id': int(artist_id)}
+    connection = self.db.session.connection()
+    table = self.model.__table__
+
+    if connection.dialect.name == 'postgresql':
+      # answered by the GiST indexes of the exclusion constraints
+      rows = connection.execute(
+        select([table.c.id, table.c.venue_id, table.c.artist_id])
+          .where(or_(table.c.venue_id == values['venue_id'], table.c.artist_id == values['artist_id']))
+          .where(func.tsrange(table.c.start_time, table.c.end_time).op('&&')(func.tsrange(start, end)))
+          .order_by(table.c.start_time)
+      )
+    else:
+      # answered by the (venue_id, start_time) and (artist_id, start_time)
+      # indexes: as the shows of a venue/artist do not overlap, none starting
+      # before the last one that starts by `start` can reach it
+      def booked(column):
+        last_start = select([func.max(table.c.start_time)]).where(table.c[column] == values[column]).where(table.c.start_time <= start)
+        return and_(table.c[column] == values[column], table.c.start_time >= func.coalesce(last_start.as_scalar(), start))
+
+      rows = connection.execute(
+        select([table.c.id, table.c.venue_id, table.c.artist_id])
+          .where(or_(*[booked(column) for column, _ in RESOURCES]))
+          .where(and_(table.c.start_time < end, table.c.end_time > start))
+          .order_by(table.c.start_time)
+      )
+    conflicts = {name: [] for _, name in RESOURCES}
+    for row in rows:
+      for column, name in RESOURCES:
+        if row[column] == values[column]:
+          conflicts[name].append(row.id)
+    return conflicts
+
+  def check_many(self, proposals):
+    '''
+    checks proposed shows (dicts with venue_id, artist_id, start_time and
+    end_time) against the stored shows and the proposals before them, with one
+    query for the stored shows in the time window of all the proposals.
+    returns a list of conflicts per proposal, each one {'on': 'venue'|'artist'}
+    with the `show` id or the `proposal` index it overlaps.
+    '''
+    if not proposals:
+      return []
+
+    table = self.model.__table__
+    ids = {column: {int(proposal[column]) for proposal in proposals} for column, _ in RESOURCES}
+    rows = self.db.session.connection().execute(
+      select([table.c.id, table.c.venue_id, table.c.artist_id, table.c.start_time, table.c.end_time])
+        .where(or_(*[table.c[column].in_(ids[column]) for column, _ in RESOURCES]))
+        .where(and_(
+          table.c.start_time < max(proposal['end_time'] for proposal in proposals),
+          table.c.end_time > min(proposal['start_time'] for proposal in proposals)
+        ))
+    )
+
+    trees = {}
+    def get_tree(column, value):
+      return trees.setdefault((column, value), IntervalTree())
+
+    for row in rows:
+      for column, _ in RESOURCES:
+        if row[column] in ids[column]:
+          get_tree(column, row[column]).insert(row.start_time, row.end_time, ('show', row.id))
+
+    results = []
+    for index, proposal in enumerate(proposals):
+      conflicts = []
+      for column, name in RESOURCES:
+        tree = get_tree(column, int(proposal[column]))
+        for kind, key in tree.overlaps(proposal['start_time'], proposal['end_time']):
+          conflicts.append({'on': name, kind: key})
+      if not conflicts:
+        # accepted proposals book their slot for the ones after them
+        for column, _ in RESOURCES:
+          get_tree(column, int(proposal[column])).insert(proposal['start_time'], proposal['end_time'], ('proposal', index))
+      results.append(conflicts)
+
+    return results
@@ -0,0 +1,199 @@
+#----------------------------------------------------------------------------#
+# Search.
+#
+# Full-text index over the name, city, state and genres of venues/artists.
+# PostgreSQL keeps a weighted tsvector per row behind a GIN index, SQLite
+# (local/dev) keeps an FTS5 table. Either way a search is an index lookup
+# ranked by relevance, every search term is matched as a word prefix.
+#----------------------------------------------------------------------------#
+
+import re
+from collections import defaultdict
+from sqlalchemy import select, text
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+REBUILD_BATCH = 1000
+
+def tokenize(term):
+  return [token.lower() for token in TOKEN.findall(term or '')]
+
+#----------------------------------------------------------------------------#
+# Dialects.
+#----------------------------------------------------------------------------#
+
+# tokens are \w+ only, so they are safe inside both query syntaxes
+QUERY_SYNTAX = {
+  'postgresql': lambda tokens: ' & '.join(token + ':*' for token in tokens),
+  'sqlite': lambda tokens: ' '.join('"' + token + '"*' for token in tokens),
+}
+
+STATEMENTS = {
+  'postgresql': {
+    'create': [
+      'CREATE TABLE IF NOT EXISTS {table} (id integer PRIMARY KEY, name varchar, document tsvector NOT NULL)',
+      'CREATE INDEX IF NOT EXISTS {table}_document_idx ON {table} USING gin (document)',
+    ],
+    'drop': 'DROP TABLE IF EXISTS {table}',
+    'clear': 'DELETE FROM {table}',
+    'upsert': '''
+      INSERT INTO {table} (id, name, document) VALUES (:id, :name,
+        setweight(to_tsvector('simple', coalesce(:name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(:city, '') || ' ' || coalesce(:state, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(:genres, '')), 'C'))
+      ON CONFLICT (id) DO UPDATE SET name = excluded.name, document = excluded.document
+    ''',
+    'delete': 'DELETE FROM {table} WHERE id = :id',
+    'search': '''
+      SELECT id, name FROM {table}, to_tsquery('simple', :query) query
+      WHERE document @@ query
+      ORDER BY ts_rank(document, query) DESC, name, id
+      LIMIT :limit OFFSET :offset
+    ''',
+    'count': "SELECT count(*) FROM {table} WHERE document @@ to_tsquery('simple', :query)",
+    'browse': 'SELECT id, name FROM {table} ORDER BY name, id LIMIT :limit OFFSET :offset',
+    'count_all': 'SELECT count(*) FROM {table}',
+  },
+  'sqlite': {
+    'create': [
+      "CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(name, city, state, genres, prefix='1 2 3')",
+    ],
+    'drop': 'DROP TABLE IF EXISTS {table}',
+    'clear': 'DELETE FROM {table}',
+    'upsert': 'INSERT OR REPLACE INTO {table} (rowid, name, city, state, genres) VALUES (:id, :name, :city, :state, :genres)',
+    'delete': 'DELETE FROM {table} WHERE rowid = :id',
+    # bm25 weights follow the column order: name, city, state, genres
+    'search': '''
+      SELECT rowid AS id, name FROM {table}
+      WHERE {table} MATCH :query
+      ORDER BY bm25({table}, 10.0, 2.0, 2.0, 1.0), name, rowid
+      LIMIT :limit OFFSET :offset
+    ''',
+    'count': 'SELECT count(*) FROM {table} WHERE {table} MATCH :query',
+    'browse': 'SELECT rowid AS id, name FROM {table} ORDER BY name, rowid LIMIT :limit OFFSET :offset',
+    'count_all': 'SELECT count(*) FROM {table}',
+  },
+}
+
+#----------------------------------------------------------------------------#
+# Index.
+#----------------------------------------------------------------------------#
+
+class SearchIndex(object):
+  '''
+  search index of one model with name, city, state and genres columns.
+  the index table lives next to the model tables: it is created and dropped
+  with them (or on first use for an existing database, filled from the model
+  tables) and kept in sync from the session on every flush.
+  '''
+  def __init__(self, db, table, model):
+    self.db = db
+    self.table = table
+    self.model = model
+    self.ready = False
+
+    genres = model.genres.property
+    self.genre_table = genres.mapper.local_table
+    self.secondary = genres.secondary
+    self.entity_column = next(c for c in self.secondary.c if c.references(model.__table__.c.id))
+    self.genre_column = next(c for c in self.secondary.c if c.references(self.genre_table.c.id))
+
+  def statement(self, connection, name):
+    return STATEMENTS[connection.dialect.name][name].format(table=self.table)
+
+  def document(self, entity, genres):
+    return {
+      'id': entity.id,
+      'name': entity.name,
+      'city': entity.city,
+      'state': entity.state,
+      'genres': ' '.join(genres)
+    }
+
+  # Schema...
+
+  def create(self, connection):
+    exists = connection.dialect.has_table(connection, self.table)
+    for statement in STATEMENTS[connection.dialect.name]['create']:
+      connection.execute(text(statement.format(table=self.table)))
+    if not exists:
+      self.rebuild(connection)
+    self.ready = True
+
+  def drop(self, connection):
+    connection.execute(text(self.statement(connection, 'drop')))
+    self.ready = False
+
+  def ensure(self, connection):
+    if not self.ready:
+      self.create(connection)
+
+  def rebuild(self, connection=None):
+    '''
+    refills the whole index from the model tables, needed after writes that
+    bypass the session such as bulk inserts
+    '''
+    connection = connection or self.db.session.connection()
+    connection.execute(text(self.statement(connection, 'clear')))
+
+    genres = defaultdict(list)
+    rows = connection.execute(
+      select([self.entity_column, self.genre_table.c.name])
+        .select_from(self.secondary.join(self.genre_table, self.genre_column == self.genre_table.c.id))
+    )
+    for entity_id, genre in rows:
+      genres[entity_id].append(genre)
+
+    table = self.model.__table__
+    rows = connection.execute(select([table.c.id, table.c.name, table.c.city, table.c.state]))
+    upsert = text(self.statement(connection, 'upsert'))
+    while True:
+      batch = rows.fetchmany(REBUILD_BATCH)
+      if not batch:
+        break
+      connection.execute(upsert, [self.document(row, genres[row.id]) for row in batch])
+
+  # Sync...
+
+  def sync(self, session):
+    '''
+    writes the pending changes of a session to the index, within its transaction
+    '''
+    changed = [obj for obj in list(session.new) + list(session.dirty) if isinstance(obj, self.model)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, self.model)]
+    if not changed and not deleted:
+      return
+
+    connection = session.connection()
+    self.ensure(connection)
+
+    if changed:
+      connection.execute(text(self.statement(connection, 'upsert')), [
+        self.document(obj, [genre.name for genre in obj.genres]) for obj in changed
+      ])
+    if deleted:
+      connection.execute(text(self.statement(connection, 'delete')), [{'id': obj.id} for obj in deleted])
+
+  # Search...
+
+  def search(self, term, page=1, per_page=50):
+    '''
+    returns the total number of matches and the (id, name) rows of one page,
+    best matches first. an empty term lists every row by name.
+    '''
+    connection = self.db.session.connection()
+    self.ensure(connection)
+
+    params = {
+      'limit': per_page,
+      'offset': (max(page, 1) - 1) * per_page
+    }
+    tokens = tokenize(term)
+    if tokens:
+      params['query'] = QUERY_SYNTAX[connection.dialect.name](tokens)
+      total = connection.execute(text(self.statement(connection, 'count')), params).scalar()
+      rows = connection.execute(text(self.statement(connection, 'search')), params).fetchall()
+    else:
+      total = connection.execute(text(self.statement(connection, 'count_all'))).scalar()
+      rows = connection.execute(text(self.statement(connection, 'browse')), params).fetchall()
+
+    return total, rows
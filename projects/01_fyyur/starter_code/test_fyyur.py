@@ -0,0 +1,592 @@
+import os
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import base64
+import json
+import random
+import re
+import unittest
+from urllib.parse import unquote
+import babel.dates
+from datetime import datetime, timedelta
+
+from app import app, db, Genre, Venue, Artist, Show, Album, Song, venue_search, artist_search, genre_registry, format_datetime, DATETIME_FORMATS, get_venue_areas
+from benchmark import QueryCounter, reset_db
+from scheduling import IntervalTree
+from sqlalchemy.exc import IntegrityError
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client
+
+        self.ctx = app.app_context()
+        self.ctx.push()
+        reset_db()
+
+        now = datetime.today()
+        self.genre = Genre(name='Jazz')
+        self.venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=[self.genre])
+        self.artist = Artist(
+            name='Guns N Petals',
+            city='San Francisco',
+            state='CA',
+            genres=[self.genre],
+            available_from=now - timedelta(days=365),
+            available_to=now + timedelta(days=365)
+        )
+        self.artist.albums.append(Album(title='First', songs=[Song(name='One'), Song(name='Two')]))
+        db.session.add_all([self.venue, self.artist])
+        db.session.commit()
+
+        self.venue_id = self.venue.id
+        self.artist_id = self.artist.id
+
+    def tearDown(self):
+        """Executed after reach test"""
+        db.session.remove()
+        self.ctx.pop()
+
+    def add_shows(self, past, upcoming):
+        # every show is with a different artist/venue, so a lazy load per show would show up in the query count
+        now = datetime.today()
+        # later calls book the hours after the earlier ones, shows of a venue/artist never overlap
+        offset = timedelta(hours=3 * Show.query.filter_by(venue_id=self.venue_id).count())
+        for n in range(past + upcoming):
+            start_time = now - timedelta(days=n + 1) if n < past else now + timedelta(days=n + 1)
+            start_time += offset
+            db.session.add(Show(
+                start_time=start_time,
+                venue_id=self.venue_id,
+                artist=Artist(name='Artist {}'.format(n), available_from=now, available_to=now)
+            ))
+            db.session.add(Show(
+                start_time=start_time,
+                venue=Venue(name='Venue {}'.format(n), city='New York', state='NY'),
+                artist_id=self.artist_id
+            ))
+        db.session.commit()
+        db.session.remove()
+
+    def count_queries(self, url):
+        with QueryCounter() as counter:
+            res = self.client().get(url)
+        self.assertEqual(res.status_code, 200)
+        return counter.count
+
+    def test_show_venue_splits_past_and_upcoming_shows(self):
+        self.add_shows(past=2, upcoming=1)
+        res = self.client().get('/venues/{}'.format(self.venue_id))
+        body = res.data.decode()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('1 Upcoming Show<', body)
+        self.assertIn('2 Past Shows<', body)
+        other_artist = Artist.query.filter_by(name='Artist 0').one()
+        self.assertIn('<a href="/artists/{}">Artist 0</a>'.format(other_artist.id), body)
+
+    def test_show_venue_query_count_does_not_grow_with_shows(self):
+        self.add_shows(past=1, upcoming=1)
+        few = self.count_queries('/venues/{}'.format(self.venue_id))
+        self.add_shows(past=20, upcoming=20)
+        many = self.count_queries('/venues/{}'.format(self.venue_id))
+
+        self.assertEqual(few, many)
+
+    def test_show_venue_leaves_shows_untouched(self):
+        self.add_shows(past=1, upcoming=1)
+        self.client().get('/venues/{}'.format(self.venue_id))
+
+        for show in Show.query.all():
+            self.assertIsInstance(show.start_time, datetime)
+
+    def test_404_if_venue_does_not_exist(self):
+        res = self.client().get('/venues/1000')
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_show_artist_splits_past_and_upcoming_shows(self):
+        self.add_shows(past=1, upcoming=3)
+        res = self.client().get('/artists/{}'.format(self.artist_id))
+        body = res.data.decode()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('3 Upcoming Shows<', body)
+        self.assertIn('1 Past Show<', body)
+        other_venue = Venue.query.filter_by(name='Venue 0').one()
+        self.assertIn('<a href="/venues/{}">Venue 0</a>'.format(other_venue.id), body)
+
+    def test_show_artist_query_count_does_not_grow_with_shows(self):
+        self.add_shows(past=1, upcoming=1)
+        few = self.count_queries('/artists/{}'.format(self.artist_id))
+        self.add_shows(past=20, upcoming=20)
+        many = self.count_queries('/artists/{}'.format(self.artist_id))
+
+        self.assertEqual(few, many)
+
+    def test_show_artist_leaves_artist_untouched(self):
+        self.client().get('/artists/{}'.format(self.artist_id))
+
+        artist = Artist.query.get(self.artist_id)
+        self.assertIsInstance(artist.available_from, datetime)
+        self.assertIsInstance(artist.available_to, datetime)
+
+    def test_404_if_artist_does_not_exist(self):
+        res = self.client().get('/artists/1000')
+
+        self.assertEqual(res.status_code, 404)
+
+    def artists_page(self, **args):
+        res = self.client().get('/artists', query_string=dict(args, per_page=2))
+        body = res.data.decode()
+        cursors = {
+            name: unquote(match.group(1))
+            for name in ('after', 'before')
+            for match in [re.search(name + r'=([^&"]+)', body)] if match
+        }
+        return res.status_code, [int(artist_id) for artist_id in re.findall(r'href="/artists/(\d+)"', body)], cursors
+
+    def test_artists_are_paginated_by_cursor(self):
+        artists = [Artist(name=name, available_from=datetime(2035, 1, 1), available_to=datetime(2036, 1, 1)) for name in (None, 'C', 'A', 'B')]
+        db.session.add_all(artists)
+        db.session.commit()
+        # a NULL name sorts first, as ''
+        nameless, c, a, b = [artist.id for artist in artists]
+
+        status, first, cursors = self.artists_page()
+        self.assertEqual((status, first), (200, [nameless, a]))
+        self.assertNotIn('before', cursors)
+        _, second, cursors = self.artists_page(after=cursors['after'])
+        self.assertEqual(second, [b, c])
+        _, third, last = self.artists_page(after=cursors['after'])
+        self.assertEqual(third, [self.artist_id])
+        self.assertNotIn('after', last)
+
+        _, back, cursors = self.artists_page(before=last['before'])
+        self.assertEqual(back, [b, c])
+        _, back, cursors = self.artists_page(before=cursors['before'])
+        self.assertEqual(back, [nameless, a])
+        self.assertNotIn('before', cursors)
+
+    def test_venues_are_paginated_by_cursor(self):
+        venues = [Venue(name=name, city=city, state=state) for name, city, state in ((None, 'Austin', 'TX'), ('A', None, None), ('B', 'Austin', 'TX'))]
+        db.session.add_all(venues)
+        db.session.commit()
+        # NULL cities, states and names sort first, as ''
+        cityless, nameless, b = venues[1].id, venues[0].id, venues[2].id
+        self.add_shows(past=1, upcoming=2)
+
+        def page(**args):
+            res = self.client().get('/venues', query_string=dict(args, per_page=2))
+            body = res.data.decode()
+            cursors = {
+                name: unquote(match.group(1))
+                for name in ('after', 'before')
+                for match in [re.search(name + r'=([^&"]+)', body)] if match
+            }
+            return [int(venue_id) for venue_id in re.findall(r'href="/venues/(\d+)"', body)], cursors
+
+        first, cursors = page()
+        self.assertEqual(first, [cityless, nameless])
+        second, cursors = page(after=cursors['after'])
+        self.assertEqual(second[:1], [b])
+        back, cursors = page(before=cursors['before'])
+        self.assertEqual(back, [cityless, nameless])
+
+        with app.test_request_context('/venues', query_string={'per_page': 200}):
+            areas, _ = get_venue_areas()
+        counts = {venue['id']: venue['num_shows'] for area in areas for venue in area['venues']}
+        self.assertEqual((counts[self.venue_id], counts[b]), (2, 0))
+
+    def test_400_if_cursor_is_tampered_with(self):
+        encode = lambda values: base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+        for cursor in ['not-a-cursor', encode(['A']), encode([1, 2]), encode(['A', '2']), encode(['A', True]), encode(['A', None]), encode({'A': 1})]:
+            self.assertEqual(self.client().get('/artists', query_string={'after': cursor}).status_code, 400)
+        self.assertEqual(self.client().get('/shows', query_string={'after': encode(['yesterday', 1])}).status_code, 400)
+        self.assertEqual(self.client().get('/artists', query_string={'after': encode(['A', 1])}).status_code, 200)
+
+    def test_search_venues_by_name_prefix_city_and_genre(self):
+        for term in ['musi', 'hop', 'francisco', 'jazz', 'CA']:
+            count, data = venue_search.search(term)
+
+            self.assertEqual(count, 1, term)
+            self.assertEqual(data[0].id, self.venue_id)
+
+    def test_search_ranks_name_matches_first(self):
+        db.session.add(Venue(name='Hopscotch', city='San Francisco', state='CA'))
+        db.session.add(Venue(name='Corner', city='Hopland', state='CA'))
+        db.session.commit()
+
+        count, data = venue_search.search('hop')
+
+        self.assertEqual(count, 3)
+        self.assertEqual(data[-1].name, 'Corner')
+
+    def test_search_follows_updates_and_deletes(self):
+        venue = Venue.query.get(self.venue_id)
+        venue.name = 'The Dueling Pianos Bar'
+        db.session.commit()
+
+        self.assertEqual(venue_search.search('musical')[0], 0)
+        self.assertEqual(venue_search.search('pianos')[0], 1)
+
+        db.session.delete(venue)
+        db.session.commit()
+
+        self.assertEqual(venue_search.search('pianos')[0], 0)
+
+    def test_search_is_paginated(self):
+        for n in range(60):
+            db.session.add(Venue(name='Venue {}'.format(n), city='Austin', state='TX'))
+        db.session.commit()
+
+        res = self.client().get('/venues/search?search_term=austin')
+        body = res.data.decode()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('"austin": 60', body)
+        self.assertIn('page=2', body)
+        self.assertEqual(len(venue_search.search('austin', page=2)[1]), 10)
+
+    def test_search_artists_matches_artists(self):
+        res = self.client().post('/artists/search', data={'search_term': 'petals'})
+        body = res.data.decode()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('"petals": 1', body)
+        self.assertIn('href="/artists/{}"'.format(self.artist_id), body)
+        self.assertEqual(artist_search.search('musical')[0], 0)
+
+    def test_datetime_filter_matches_babel(self):
+        date = datetime(2035, 4, 1, 20, 0)
+
+        for format in ['full', 'medium']:
+            expected = babel.dates.format_datetime(date, DATETIME_FORMATS[format])
+            self.assertEqual(format_datetime(date, format), expected)
+            self.assertEqual(format_datetime('2035-04-01T20:00:00', format), expected)
+        self.assertEqual(format_datetime(date, 'yyyy-MM-dd'), '2035-04-01')
+
+    def test_datetime_filter_resolves_locale_named_formats(self):
+        date = datetime(2035, 4, 1, 20, 0)
+
+        for format in ['short', 'long']:
+            self.assertEqual(format_datetime(date, format), babel.dates.format_datetime(date, format))
+        self.assertEqual(format_datetime(date, 'short', 'de_DE'), babel.dates.format_datetime(date, 'short', locale='de_DE'))
+
+    def test_shows_render_start_times(self):
+        db.session.add(Show(start_time=datetime(2035, 4, 1, 20, 0), venue_id=self.venue_id, artist_id=self.artist_id))
+        db.session.commit()
+
+        res = self.client().get('/shows')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('Sunday April, 1, 2035 at 8:00PM', res.data.decode())
+
+    def test_import_venues_from_ndjson(self):
+        body = '\n'.join(json.dumps({
+            'name': 'Venue {}'.format(n),
+            'city': 'Austin',
+            'state': 'TX',
+            'genres': ['jazz', 'olk']
+        }) for n in range(3))
+        db.session.add(Genre(name='Polka'))
+        db.session.commit()
+        res = self.client().post('/feed_db/venues', data=body)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json['rows'], 3)
+        venue = Venue.query.filter_by(name='Venue 2').one()
+        self.assertEqual(sorted(genre.name for genre in venue.genres), ['Jazz', 'Polka'])
+        self.assertFalse(venue.seeking_talent)
+        self.assertEqual(Genre.query.count(), 2)
+        self.assertEqual(venue_search.search('polka')[0], 3)
+
+    def test_import_shows_from_csv(self):
+        body = 'venue_id,artist_id,start_time\n{0},{1},2035-04-01T20:00:00\n{0},{1},2035-04-02T20:00:00\n'.format(self.venue_id, self.artist_id)
+        res = self.client().post('/feed_db/shows', data=body, content_type='text/csv')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json['rows'], 2)
+        self.assertEqual([show.start_time.day for show in Show.query.order_by(Show.start_time)], [1, 2])
+
+    def test_400_with_the_line_of_a_bad_record(self):
+        lines = ['{"name": "Venue 1", "city": "Austin", "state": "TX"}', '', '{"name": "Venue 2", "seeking_talent": ']
+        res = self.client().post('/feed_db/venues', data='\n'.join(lines))
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json['line'], 3)
+        self.assertEqual(Venue.query.count(), 1)
+
+        body = 'venue_id,artist_id,start_time\n{0},{1},2035-04-01T20:00:00\n{0},{1},someday\n'.format(self.venue_id, self.artist_id)
+        res = self.client().post('/feed_db/shows', data=body, content_type='text/csv')
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json['line'], 3)
+        self.assertEqual(Show.query.count(), 0)
+
+    def test_400_if_import_names_an_unknown_genre(self):
+        body = json.dumps({'name': 'Venue 1', 'city': 'Austin', 'state': 'TX', 'genres': ['Polka']})
+        res = self.client().post('/feed_db/venues', data=body)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('unknown genre: polka', res.json['error'])
+        self.assertEqual(Genre.query.count(), 1)
+
+    def test_422_if_import_is_refused_by_the_database(self):
+        body = 'venue_id,artist_id,start_time\n{0},{1},2035-04-01T20:00:00\n{0},{1},2035-04-01T20:30:00\n'.format(self.venue_id, self.artist_id)
+        res = self.client().post('/feed_db/shows', data=body, content_type='text/csv')
+
+        self.assertEqual(res.status_code, 422)
+        self.assertFalse(res.json['success'])
+        self.assertEqual(Show.query.count(), 0)
+
+    def test_404_if_import_kind_does_not_exist(self):
+        res = self.client().post('/feed_db/users', data='{}')
+
+        self.assertEqual(res.status_code, 404)
+
+    def venue_form(self, genre_ids):
+        return {
+            'name': 'The Dueling Pianos Bar',
+            'city': 'New York',
+            'state': 'NY',
+            'address': '335 Delancey Street',
+            'phone': '+19146363210',
+            'image_link': 'https://example.com/pianos.jpg',
+            'facebook_link': 'https://www.facebook.com/theduelingpianos',
+            'website': 'https://www.theduelingpianos.com',
+            'genres': genre_ids
+        }
+
+    def test_genre_choices_come_from_the_registry(self):
+        polka = Genre(name='Polka')
+        db.session.add(polka)
+        db.session.commit()
+
+        self.assertEqual([name for _, name in genre_registry.choices()], ['Jazz', 'Polka'])
+        with QueryCounter() as counter:
+            choices = genre_registry.choices()
+        self.assertEqual(counter.count, 0)
+        self.assertIn((polka.id, 'Polka'), choices)
+
+    def test_create_venue_attaches_genres_without_genre_queries(self):
+        polka = Genre(name='Polka')
+        db.session.add(polka)
+        db.session.commit()
+        genre_ids = [self.genre.id, polka.id]
+        genre_registry.choices()
+
+        with QueryCounter() as counter:
+            res = self.client().post('/venues/create', data=self.venue_form(genre_ids))
+            statements = counter.count
+        self.assertEqual(res.status_code, 200)
+
+        venue = Venue.query.filter_by(name='The Dueling Pianos Bar').one()
+        self.assertEqual(sorted(genre.id for genre in venue.genres), sorted(genre_ids))
+        # venue, genre links, search index and the home page, but no genre lookups
+        self.assertLessEqual(statements, 6)
+
+    def test_edit_venue_replaces_genres(self):
+        polka = Genre(name='Polka')
+        db.session.add(polka)
+        db.session.commit()
+        polka_id = polka.id
+
+        res = self.client().post('/venues/{}/edit'.format(self.venue_id), data=self.venue_form([polka_id]))
+
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual([genre.id for genre in Venue.query.get(self.venue_id).genres], [polka_id])
+
+    def test_genre_writes_invalidate_the_registry(self):
+        version = genre_registry.version
+        genre_registry.choices()
+
+        db.session.add(Genre(name='Polka'))
+        db.session.rollback()
+        self.assertEqual(genre_registry.version, version)
+
+        db.session.add(Genre(name='Polka'))
+        db.session.commit()
+        self.assertEqual(genre_registry.version, version + 1)
+        self.assertIn('Polka', [name for _, name in genre_registry.choices()])
+
+        # attaching genres to a venue is not a genre write
+        self.venue.genres = genre_registry.get([self.genre.id])
+        db.session.commit()
+        self.assertEqual(genre_registry.version, version + 1)
+
+    def test_home_lists_most_recent_first(self):
+        now = datetime.utcnow()
+        db.session.add_all([
+            Venue(name='Old Venue', city='Austin', state='TX', created_at=now - timedelta(days=1)),
+            Venue(name='New Venue', city='Austin', state='TX', created_at=now + timedelta(days=1))
+        ])
+        db.session.commit()
+
+        body = self.client().get('/').data.decode()
+
+        self.assertLess(body.index('New Venue'), body.index('The Musical Hop'))
+        self.assertLess(body.index('The Musical Hop'), body.index('Old Venue'))
+
+    def test_home_is_served_from_cache(self):
+        self.count_queries('/')
+
+        self.assertEqual(self.count_queries('/'), 0)
+
+    def test_home_cache_is_cleared_by_writes(self):
+        self.client().get('/')
+        res = self.client().post('/venues/create', data=self.venue_form([self.genre.id]))
+        self.assertIn('The Dueling Pianos Bar', res.data.decode())
+
+        res = self.client().delete('/venues/{}'.format(self.venue_id))
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('The Musical Hop', self.client().get('/').data.decode())
+
+    def test_all_shows_are_streamed_in_order(self):
+        self.add_shows(past=100, upcoming=100)
+        res = self.client().get('/shows/all')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.is_streamed)
+        body = res.get_data(as_text=True)
+        self.assertEqual(body.count('tile-show'), Show.query.count())
+        # earliest first: the oldest past show is the last one added
+        self.assertLess(body.index('Artist 99<'), body.index('Artist 0<'))
+        self.assertLess(body.index('Artist 0<'), body.index('Artist 100<'))
+        self.assertNotIn('class="pager"', body)
+
+    def test_all_shows_are_sent_in_chunks(self):
+        self.add_shows(past=100, upcoming=100)
+        with app.test_request_context('/shows/all'):
+            res = app.full_dispatch_request()
+            chunks = list(res.response)
+
+        self.assertGreater(len(chunks), 1)
+
+    def test_interval_tree_matches_a_scan(self):
+        rand = random.Random(42)
+        intervals = []
+        for key in range(500):
+            start = rand.randrange(0, 10000)
+            intervals.append((start, start + rand.randrange(1, 300), key))
+        tree = IntervalTree(intervals)
+        for start, _, key in intervals[::3]:
+            self.assertTrue(tree.remove(start, key))
+        intervals = [interval for n, interval in enumerate(intervals) if n % 3]
+
+        self.assertEqual(len(tree), len(intervals))
+        for _ in range(200):
+            start = rand.randrange(0, 10000)
+            end = start + rand.randrange(1, 500)
+            expected = {key for s, e, key in intervals if s < end and e > start}
+            self.assertEqual(set(tree.overlaps(start, end)), expected)
+
+    def show_form(self, start_time, venue_id=None, artist_id=None):
+        return {
+            'venue_id': venue_id or self.venue_id,
+            'artist_id': artist_id or self.artist_id,
+            'start_time': start_time.strftime('%Y-%m-%dT%H:%M')
+        }
+
+    def test_create_show_rejects_double_bookings(self):
+        now = datetime.today().replace(second=0, microsecond=0)
+        start_time = now + timedelta(days=10)
+        other = Artist(name='Other Artist', available_from=now, available_to=now + timedelta(days=30))
+        db.session.add(other)
+        db.session.commit()
+        other_id = other.id
+
+        res = self.client().post('/shows/create', data=self.show_form(start_time))
+        self.assertIn('Show was successfully listed!', res.data.decode())
+
+        res = self.client().post('/shows/create', data=self.show_form(start_time + timedelta(hours=1), artist_id=other_id))
+        self.assertIn('Venue is already booked at this time!', res.data.decode())
+
+        res = self.client().post('/shows/create', data=self.show_form(start_time + timedelta(hours=3), artist_id=other_id))
+        self.assertIn('Show was successfully listed!', res.data.decode())
+        # the schedule picked up the show committed in between
+        res = self.client().post('/shows/create', data=self.show_form(start_time + timedelta(hours=4), artist_id=other_id))
+        self.assertIn('Venue is already booked at this time!', res.data.decode())
+        self.assertIn('Artist already plays another show at this time!', res.data.decode())
+
+        self.assertEqual(Show.query.count(), 2)
+
+    def test_shows_written_outside_the_session_are_checked(self):
+        start_time = datetime.today().replace(second=0, microsecond=0) + timedelta(days=10)
+        # as another process would, without the session
+        db.engine.execute(Show.__table__.insert(), venue_id=self.venue_id, artist_id=self.artist_id,
+                          start_time=start_time, end_time=start_time + timedelta(hours=2))
+
+        res = self.client().post('/shows/create', data=self.show_form(start_time + timedelta(hours=1)))
+        self.assertIn('Venue is already booked at this time!', res.data.decode())
+        with self.assertRaises(IntegrityError):
+            db.engine.execute(Show.__table__.insert(), venue_id=self.venue_id, artist_id=self.artist_id,
+                              start_time=start_time + timedelta(hours=1), end_time=start_time + timedelta(hours=3))
+        self.assertEqual(Show.query.count(), 1)
+
+    def test_schedule_validates_proposals_in_one_pass(self):
+        now = datetime.today().replace(microsecond=0)
+        start_time = now + timedelta(days=10)
+        db.session.add(Show(venue_id=self.venue_id, artist_id=self.artist_id, start_time=start_time))
+        db.session.commit()
+        venue = Venue(name='Other Venue', city='Austin', state='TX')
+        db.session.add(venue)
+        db.session.commit()
+
+        proposals = [
+            # overlaps the stored show
+            {'venue_id': self.venue_id, 'artist_id': self.artist_id, 'start_time': (start_time + timedelta(hours=2)).isoformat()},
+            {'venue_id': venue.id, 'artist_id': self.artist_id, 'start_time': (start_time + timedelta(days=1)).isoformat()},
+            # overlaps the proposal before it
+            {'venue_id': venue.id, 'artist_id': self.artist_id, 'start_time': (start_time + timedelta(days=1, hours=1)).isoformat()},
+            {'venue_id': 1000, 'artist_id': self.artist_id, 'start_time': (start_time + timedelta(days=2)).isoformat()},
+        ]
+        with QueryCounter() as counter:
+            res = self.client().post('/shows/schedule', json={'shows': proposals, 'save': True})
+        shows = res.json['shows']
+
+        self.assertEqual(res.status_code, 200)
+        self.assertLessEqual(counter.count, 3)
+        self.assertFalse(res.json['success'])
+        self.assertEqual(res.json['saved'], 0)
+        self.assertEqual([show['ok'] for show in shows], [False, True, False, False])
+        self.assertEqual({conflict['on'] for conflict in shows[0]['conflicts']}, {'venue', 'artist'})
+        self.assertEqual(shows[2]['conflicts'], [{'on': 'venue', 'proposal': 1}, {'on': 'artist', 'proposal': 1}])
+        self.assertEqual(shows[3]['errors'], ['venue not found'])
+
+        res = self.client().post('/shows/schedule', json={'shows': proposals[1:2], 'save': True})
+        self.assertTrue(res.json['success'])
+        self.assertEqual(res.json['saved'], 1)
+        self.assertEqual(Show.query.count(), 2)
+
+    def test_400_if_schedule_proposals_are_malformed(self):
+        res = self.client().post('/shows/schedule', json={'shows': [{'venue_id': 1}]})
+
+        self.assertEqual(res.status_code, 400)
+        for body in [[{'venue_id': 1}], 'shows', 1]:
+            self.assertEqual(self.client().post('/shows/schedule', json=body).status_code, 400)
+
+    def test_schedule_accepts_utc_timestamps(self):
+        start_time = datetime.utcnow().replace(microsecond=0) + timedelta(days=10)
+        proposal = {'venue_id': self.venue_id, 'artist_id': self.artist_id, 'start_time': start_time.strftime('%Y-%m-%dT%H:%M:%S.000Z')}
+        res = self.client().post('/shows/schedule', json={'shows': [proposal], 'save': True})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.json['success'])
+        self.assertEqual(Show.query.one().start_time, start_time)
+
+    def test_400_if_schedule_times_do_not_parse(self):
+        proposal = {'venue_id': self.venue_id, 'artist_id': self.artist_id, 'start_time': 'next friday-ish'}
+        res = self.client().post('/shows/schedule', json={'shows': [proposal]})
+
+        self.assertEqual(res.status_code, 400)
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,282 @@
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#
+# Seeds a throwaway database with questions and measures endpoints by wall
+# time and by the number of SQL statements they issue. Defaults to an
+# in-memory SQLite database, point DATABASE_URL at a PostgreSQL database to
+# benchmark there.
+#
+#   python benchmark.py questions --sizes 10000 100000 1000000
+#   python benchmark.py writes --sizes 100000
+#   python benchmark.py quiz --sizes 1000000
+#   python benchmark.py search --sizes 100000
+#   python benchmark.py categories --sizes 100000
+#   python benchmark.py etag --sizes 100000
+#   python benchmark.py bulk --sizes 50000
+#----------------------------------------------------------------------------#
+
+import os
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import argparse
+import json
+import time
+from sqlalchemy import event
+
+from flaskr import create_app
+from models import db, Question, Category, question_count, question_search, category_map
+
+SEED_BATCH = 10000
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+class QueryCounter(object):
+  '''
+  counts the statements sent to the database while the context is active
+  '''
+  def __init__(self):
+    self.count = 0
+
+  def _count(self, *args, **kwargs):
+    self.count += 1
+
+  def __enter__(self):
+    event.listen(db.engine, 'before_cursor_execute', self._count)
+    return self
+
+  def __exit__(self, *exc):
+    event.remove(db.engine, 'before_cursor_execute', self._count)
+
+def reset_db():
+  db.session.remove()
+  db.drop_all()
+  db.create_all()
+  question_count.reset()
+  question_search.reset()
+  category_map.invalidate()
+
+def seed_questions(count, categories=6):
+  connection = db.session.connection()
+  connection.execute(Category.__table__.insert(), [
+    {'id': n, 'type': 'Category %d' % n} for n in range(1, categories + 1)
+  ])
+  for start in range(0, count, SEED_BATCH):
+    connection.execute(Question.__table__.insert(), [{
+      'id': n,
+      'question': 'Question %d?' % n,
+      'answer': 'Answer %d' % n,
+      'category': n % categories + 1,
+      'difficulty': n % 5 + 1
+    } for n in range(start + 1, min(start + SEED_BATCH, count) + 1)])
+  db.session.commit()
+
+def measure_call(fn, repeat=5):
+  timings = []
+  with QueryCounter() as counter:
+    for _ in range(repeat):
+      start = time.perf_counter()
+      fn()
+      timings.append(time.perf_counter() - start)
+
+  return {
+    'best_ms': min(timings) * 1000,
+    'queries': counter.count // repeat
+  }
+
+def measure(client, url, repeat=5):
+  def get():
+    response = client.get(url)
+    assert response.status_code == 200, response.status_code
+
+  return measure_call(get, repeat)
+
+def report(name, size, result):
+  print('{:<20} {:>10} {:>12.2f} {:>10}'.format(name, size, result['best_ms'], result['queries']))
+
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#----------------------------------------------------------------------------#
+
+def bench_categories(app, sizes):
+  # the routes that list or look up categories, once the category map is
+  # loaded, against reading the categories for the request
+  client = app.test_client()
+  for size in sizes:
+    reset_db()
+    seed_questions(size)
+
+    def read_categories():
+      return [category.format() for category in Category.query.order_by(Category.id)]
+
+    report('categories-query', size, measure_call(read_categories))
+    report('categories', size, measure(client, '/api/categories'))
+    report('categories-questions', size, measure(client, '/api/questions'))
+    report('category-questions', size, measure(client, '/api/categories/2/questions'))
+
+def bench_etag(app, sizes):
+  # the polled listings answered in full, and revalidated with the ETag of
+  # the previous answer
+  client = app.test_client()
+  for size in sizes:
+    reset_db()
+    seed_questions(size)
+
+    for name, url in (('categories', '/api/categories'), ('first', '/api/questions'),
+                      ('last', '/api/questions?page=%d' % ((size - 1) // 10 + 1)),
+                      ('category', '/api/categories/2/questions')):
+      etag = client.get(url).headers['ETag']
+      def revalidate():
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304, response.status_code
+
+      report('etag-' + name + '-200', size, measure(client, url))
+      report('etag-' + name + '-304', size, measure_call(revalidate))
+
+def bench_bulk(app, sizes, single=1000):
+  # importing a pack of questions as one NDJSON request, against posting
+  # `single` of them one by one, and exporting the table back as NDJSON
+  client = app.test_client()
+  for size in sizes:
+    reset_db()
+    seed_questions(0)
+    pack = '\n'.join(json.dumps({
+      'question': 'Imported %d?' % n,
+      'answer': 'Answer %d' % n,
+      'category': n % 6 + 1,
+      'difficulty': n % 5 + 1
+    }) for n in range(size))
+
+    def post_single():
+      for line in pack.splitlines()[:single]:
+        assert client.post('/api/questions', json=json.loads(line)).status_code == 200
+
+    def post_bulk():
+      response = client.post('/api/questions/bulk', data=pack, content_type='application/x-ndjson')
+      assert response.get_json()['imported'] == size
+
+    report('bulk-single-%d' % single, size, measure_call(post_single, repeat=1))
+    report('bulk-import', size, measure_call(post_bulk, repeat=1))
+
+    def export():
+      response = client.get('/api/questions/export')
+      assert response.data.count(b'\n') == size + single
+
+    report('bulk-export', size, measure_call(export, repeat=1))
+
+def bench_questions(app, sizes):
+  # the first and the last page of /api/questions, by offset and by keyset,
+  # against loading, formatting and slicing every question
+  client = app.test_client()
+  for size in sizes:
+    reset_db()
+    seed_questions(size)
+    last_page = (size - 1) // 10 + 1
+
+    def load_all():
+      questions = [question.format() for question in Question.query.order_by(Question.id).all()]
+      return questions[(last_page - 1) * 10:last_page * 10], len(questions)
+
+    report('questions-all', size, measure_call(load_all, repeat=1))
+    report('questions-first', size, measure(client, '/api/questions'))
+    report('questions-offset', size, measure(client, '/api/questions?page=%d' % last_page))
+    report('questions-keyset', size, measure(client, '/api/questions?after_id=%d' % ((last_page - 1) * 10)))
+
+def bench_writes(app, sizes):
+  # a create and a delete answered with the running total, and with the
+  # refreshed first page
+  client = app.test_client()
+  question = {'question': 'Benchmark?', 'answer': 'Yes', 'category': 1, 'difficulty': 1}
+  for size in sizes:
+    reset_db()
+    seed_questions(size)
+
+    for name, query in (('', ''), ('-page', '?include_page=1')):
+      def create_delete():
+        created = client.post('/api/questions' + query, json=question).get_json()
+        assert client.delete('/api/questions/%d%s' % (created['created'], query)).status_code == 200
+
+      report('create-delete' + name, size, measure_call(create_delete))
+
+def bench_quiz(app, sizes, previous=1000):
+  # the next quiz question of a category after `previous` answered ones,
+  # against listing the category without the previous ones
+  client = app.test_client()
+  for size in sizes:
+    reset_db()
+    seed_questions(size)
+    body = {
+      'previous_questions': [n * 6 + 1 for n in range(previous)],
+      'quiz_category': {'id': 2}
+    }
+
+    def list_category():
+      questions = Question.query.filter(Question.id.notin_(body['previous_questions'])).filter_by(category=2).all()
+      return [question.format() for question in questions]
+
+    report('quiz-list', size, measure_call(list_category, repeat=1))
+    client.post('/api/quizzes', json=body)
+    def play():
+      assert client.post('/api/quizzes', json=body).get_json()['foundQuestion']
+    report('quiz-sample', size, measure_call(play))
+
+    # the same round in a quiz session that has asked the previous ones
+    session_id = client.post('/api/quizzes/sessions', json={'quiz_category': {'id': 2}}).get_json()['session_id']
+    for _ in range(previous):
+      client.post('/api/quizzes/sessions/' + session_id)
+    def play_session():
+      response = client.post('/api/quizzes/sessions/' + session_id).get_json()
+      assert response['foundQuestion']
+    report('quiz-session', size, measure_call(play_session))
+
+def bench_search(app, sizes):
+  # a search for a rare and for a common term, the first page with the
+  # category facets, against scanning the questions with ILIKE and looking up
+  # the category of every match
+  client = app.test_client()
+  for size in sizes:
+    reset_db()
+    seed_questions(size)
+
+    for name, term in (('rare', 'question %d' % (size // 2)), ('common', 'question')):
+      def scan():
+        questions = Question.query.filter(Question.question.ilike('%' + term + '%')).all()
+        return [(question.format(), Category.query.get(question.category).format()) for question in questions]
+
+      report('search-scan-' + name, size, measure_call(scan, repeat=1))
+      client.post('/api/questions/search', json={'searchTerm': term})
+      def search():
+        response = client.post('/api/questions/search', json={'searchTerm': term})
+        assert response.get_json()['total_questions']
+      report('search-' + name, size, measure_call(search))
+
+BENCHMARKS = {
+  'bulk': bench_bulk,
+  'categories': bench_categories,
+  'etag': bench_etag,
+  'questions': bench_questions,
+  'writes': bench_writes,
+  'quiz': bench_quiz,
+  'search': bench_search,
+}
+
+#----------------------------------------------------------------------------#
+# Launch.
+#----------------------------------------------------------------------------#
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Trivia benchmarks')
+  parser.add_argument('benchmarks', nargs='*', help=', '.join(sorted(BENCHMARKS)))
+  parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000, 1000000])
+  args = parser.parse_args()
+
+  unknown = set(args.benchmarks) - set(BENCHMARKS)
+  if unknown:
+    parser.error('unknown benchmarks: ' + ', '.join(sorted(unknown)))
+
+  app = create_app()
+  print('{:<20} {:>10} {:>12} {:>10}'.format('benchmark', 'rows', 'best (ms)', 'queries'))
+  with app.app_context():
+    for name in args.benchmarks or sorted(BENCHMARKS):
+      BENCHMARKS[name](app, args.sizes)
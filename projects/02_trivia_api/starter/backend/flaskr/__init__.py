@@ -1,17 +1,26 @@
 # ------------------------------------- Imports ------------------------------------------------
 
+import json
 import traceback
-import random
+from bisect import bisect_right
+from functools import wraps
 
-from flask import Flask, request, abort, jsonify
+from flask import Flask, request, abort, jsonify, make_response, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.exceptions import ServiceUnavailable
-from models import setup_db, Question, Category
+from sqlalchemy import func
+from models import setup_db, database_path, db, Question, question_count, question_sampler, question_search, category_map, question_changes
+from quiz_sessions import QuizSessions, MemoryStore
 
 # ------------------------------------- Constants ------------------------------------------------
 
 CATEGORIES_PER_PAGE = 10
 QUESTIONS_PER_PAGE = 10
+QUIZ_SESSION_TTL = 30 * 60
+QUIZ_SESSION_MAX = 10000
+BULK_BATCH = 1000
+BULK_MAX_REJECTED = 100
+EXPORT_BATCH = 1000
 
 # ------------------------------------ App Init -------------------------------------------------
 
@@ -19,7 +28,16 @@ QUESTIONS_PER_PAGE = 10
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
-    setup_db(app)
+    if test_config:
+        app.config.from_mapping(test_config)
+    # a test_config with SQLALCHEMY_DATABASE_URI never touches the trivia database
+    setup_db(app, app.config.get('SQLALCHEMY_DATABASE_URI', database_path))
+
+    # the categories of every route come from the shared map, see models.CategoryMap
+    categories = category_map
+
+    # QUIZ_SESSION_STORE plugs another session store, see quiz_sessions.MemoryStore
+    quiz_sessions = QuizSessions(app.config.get('QUIZ_SESSION_STORE') or MemoryStore(QUIZ_SESSION_TTL, QUIZ_SESSION_MAX))
 
     CORS(app, resources={r"/api/*": {"origins": "*"}})
 
@@ -37,25 +55,124 @@ def create_app(test_config=None):
 
     # Helpers...
 
-    def paginate_categories(request, all_categories):
-        page = request.args.get('page', 1, type=int)
-        start = (page - 1) * CATEGORIES_PER_PAGE
-        end = start + CATEGORIES_PER_PAGE
+    def paginate(request, query, column, per_page, page=None):
+        """
+        Returns one page of `query` ordered by its unique `column`, formatted.
+        Only the rows of the page are fetched: `?page=` is a LIMIT/OFFSET,
+        `?after_id=` (the last id of the previous page) a keyset seek that
+        costs the same on any page. A `page` argument overrides both.
+        """
+        after_id = request.args.get('after_id', None, type=int) if page is None else None
+        query = query.order_by(column)
+
+        if after_id is not None:
+            query = query.filter(column > after_id)
+        else:
+            page = max(page or request.args.get('page', 1, type=int), 1)
+            query = query.offset((page - 1) * per_page)
+
+        return [row.format() for row in query.limit(per_page)]
+
+    def count(query, column):
+        # COUNT(*) of the query filters, without fetching or ordering rows
+        return query.order_by(None).with_entities(func.count(column)).scalar()
+
+    def paginate_categories(request):
+        # the same pages as paginate(), sliced out of the category map
+        rows = list(categories.get_all().values())
+        after_id = request.args.get('after_id', None, type=int)
+
+        if after_id is not None:
+            start = bisect_right([row['id'] for row in rows], after_id)
+        else:
+            start = (max(request.args.get('page', 1, type=int), 1) - 1) * CATEGORIES_PER_PAGE
+
+        return rows[start:start + CATEGORIES_PER_PAGE]
+
+    def paginate_questions(request, query, page=None):
+        return paginate(request, query, Question.id, QUESTIONS_PER_PAGE, page)
 
-        categories = [category.format() for category in all_categories]
-        paginated_categories = categories[start:end]
+    def read_question(record):
+        """
+        Returns one question of a bulk import as a row of the questions table,
+        raises ValueError with the reason when it cannot be imported.
+        """
+        if not isinstance(record, dict):
+            raise ValueError('expected an object')
+
+        question = record.get('question', None)
+        answer = record.get('answer', None)
+        category = record.get('category', None)
+        difficulty = record.get('difficulty', None)
+
+        if not question or not answer:
+            raise ValueError('question and answer are required')
+        # json numbers, 2.0 or true would pass a dict lookup and int() as 2 or 1
+        if type(category) is not int:
+            raise ValueError('category must be an integer')
+        if difficulty is not None and type(difficulty) is not int:
+            raise ValueError('difficulty must be an integer')
+        # the foreign key, checked against the category map
+        if categories.get(category) is None:
+            raise ValueError('unknown category {}'.format(category))
+
+        return {
+            'question': str(question),
+            'answer': str(answer),
+            'category': category,
+            'difficulty': difficulty
+        }
+
+    def conditional(view):
+        """
+        Gives the responses of the view a weak ETag made of the versions of
+        the questions and the categories (see models.ChangeCounter), and
+        answers a request whose If-None-Match has the current one with 304,
+        without running the view.
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = '{}-{}'.format(question_changes.tag(), categories.version)
 
-        return paginated_categories
+            if request.if_none_match.contains_weak(etag):
+                response = app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
 
-    def paginate_questions(request, all_questions):
-        page = request.args.get('page', 1, type=int)
-        start = (page - 1) * QUESTIONS_PER_PAGE
-        end = start + QUESTIONS_PER_PAGE
+            response.set_etag(etag, weak=True)
+            return response
 
-        questions = [question.format() for question in all_questions]
-        paginated_questions = questions[start:end]
+        return wrapper
+
+    def draw_question(category_id, exclude):
+        """
+        Returns a random question of the category (of any category for None)
+        that is not in `exclude`, or None.
+        """
+        question_id = question_sampler.sample(category_id, exclude)
+        while question_id is not None:
+            question = Question.query.get(question_id)
+            if question is not None:
+                return question
+            # deleted by another process since the ids were loaded
+            question_sampler.discard(question_id)
+            question_id = question_sampler.sample(category_id, exclude)
+
+        return None
+
+    def write_response(res_body):
+        # writes answer with the entity and the running total, the refreshed
+        # listing is only queried for clients asking for it
+        include_page = request.args.get('include_page', None, type=int)
+        if include_page is not None:
+            res_body['questions'] = paginate_questions(request, Question.query, page=include_page)
+
+        res_body['total_questions'] = question_count.get()
+        res_body['success'] = True
 
-        return paginated_questions
+        return jsonify(res_body)
 
 
 # -------------------------------------------------------------------------------------
@@ -63,11 +180,12 @@ def create_app(test_config=None):
     # Routes...
 
     @app.route('/api/categories')
+    @conditional
     def retrieve_categories():
         """
         GET '/categories'
         - Fetches a dictionary of categories in which the keys are the ids and the value is the corresponding string of the category
-        - Request Arguments: None
+        - Request Arguments: Optional query string page (LIMIT/OFFSET page number, default 1) or after_id (id of the last category of the previous page, pages by keyset instead)
         - Returns: An object with categories, that each contains an object of category id and category type, total number of categories and success boolean, as the follwoing sample:
         {
             "categories": {
@@ -101,10 +219,9 @@ def create_app(test_config=None):
         }
         """
         try:
-            all_categories = Category.query.order_by(Category.id).all()
-            paginated_categories = paginate_categories(request, all_categories)
+            paginated_categories = paginate_categories(request)
 
-            total_categories = len(all_categories)
+            total_categories = len(categories.get_all())
 
             res_body = {}
 
@@ -118,12 +235,13 @@ def create_app(test_config=None):
             abort(422)
 
     @app.route('/api/questions')
+    @conditional
     def retrieve_questions():
         """
         GET '/questions'
         - Fetches a dictionary of questions in which the keys are the ids and the values is the corresponding string of the question, string of the answer,
         integer of category and integer of difficulty
-        - Request Arguments: None
+        - Request Arguments: Optional query string page (LIMIT/OFFSET page number, default 1) or after_id (id of the last question of the previous page, pages by keyset instead)
         - Returns: An object with questions, that each contains an object of question id, question category id, question difficulty, question answer, and question text.
         total number of questions and success boolean, as the follwoing sample:
         {
@@ -154,15 +272,13 @@ def create_app(test_config=None):
         }
         """
         try:
-            all_questions = Question.query.order_by(Question.id).all()
-            paginated_questions = paginate_questions(request, all_questions)
-            categories = Category.query.all()
+            paginated_questions = paginate_questions(request, Question.query)
 
-            total_questions = len(all_questions)
+            total_questions = question_count.get()
 
             res_body = {}
 
-            res_body['categories'] = [category.format() for category in categories]
+            res_body['categories'] = list(categories.get_all().values())
             res_body['questions'] = paginated_questions
             res_body['total_questions'] = total_questions
             res_body['success'] = True
@@ -177,27 +293,18 @@ def create_app(test_config=None):
         """
         DELETE '/questions/<int:question_id>'
         - Delete a question item in which the key is the id of the question to be deleted.
-        - Request Arguments: int:question_id
-        - Returns: The deleted question id, An object with questions, that each contains an object of question id, question category id, question difficulty, question answer, and question text.
-        total number of questions and success boolean, as the follwoing sample:
+        - Request Arguments: int:question_id, optional query string include_page (a page number) to also get that page of the questions left
+        - Returns: The deleted question id, the deleted question, total number of questions and success boolean,
+        plus the questions of the page when include_page is given, as the follwoing sample:
         {
             "deleted": 3,
-            "questions": [
-                {
-                    "answer": "answer1",
-                    "category": 1,
-                    "difficulty": 1,
-                    "id": 1,
-                    "question": "question1"
-                },
-                {
-                    "answer": "answer2",
-                    "category": 4,
-                    "difficulty": 1,
-                    "id": 2,
-                    "question": "question2"
-                }
-            ],
+            "question": {
+                "answer": "answer3",
+                "category": 3,
+                "difficulty": 5,
+                "id": 3,
+                "question": "question3"
+            },
             "total_questions": 2,
             "success": true
         }
@@ -208,21 +315,15 @@ def create_app(test_config=None):
             if question is None:
                 abort(404)
 
+            deleted_question = question.format()
             question.delete()
 
-            all_questions = Question.query.order_by(Question.id).all()
-            paginated_questions = paginate_questions(request, all_questions)
-
-            total_questions = len(all_questions)
-
             res_body = {}
 
-            res_body['questions'] = paginated_questions
-            res_body['total_questions'] = total_questions
             res_body['deleted'] = question_id
-            res_body['success'] = True
+            res_body['question'] = deleted_question
 
-            return jsonify(res_body)
+            return write_response(res_body)
 
         except Exception:
             abort(422)
@@ -231,39 +332,25 @@ def create_app(test_config=None):
     def create_question():
         """
         POST '/questions'
-        - Fetches a dictionary of questions in which the keys are the ids and the values is the corresponding string of the question, string of the answer, integer of category and integer of difficulty
+        - Creates a question from the question string, answer string, category id and difficulty integer
         - Request Arguments: An object with a key, question, answer, category, difficulty, that contains a object of question: question_string key:value pairs, answer: answer_string key:value pairs, category: category_id key:value pairs, difficulty: difficulty_id key:value pairs.  
-        - Returns: An object with questions, that each contains an object of question id, question category id, question difficulty, question answer, and question text.
-        total number of questions and success boolean, as the follwoing sample:
+        Optional query string include_page (a page number) to also get that page of the questions. An unknown category id is rejected with 422.
+        - Returns: The created question id, the created question, total number of questions and success boolean,
+        plus the questions of the page when include_page is given, as the follwoing sample:
         {
-            "questions": [
-                {
-                    "answer": "answer1",
-                    "category": 1,
-                    "difficulty": 1,
-                    "id": 1,
-                    "question": "question1"
-                },
-                {
-                    "answer": "answer2",
-                    "category": 4,
-                    "difficulty": 1,
-                    "id": 2,
-                    "question": "question2"
-                },
-                {
-                    "answer": "answer4",
-                    "category": 4,
-                    "difficulty": 1,
-                    "id": 4,
-                    "question": "question4"
-                }
-            ],
+            "created": 4,
+            "question": {
+                "answer": "answer4",
+                "category": 4,
+                "difficulty": 1,
+                "id": 4,
+                "question": "question4"
+            },
             "total_questions": 3,
             "success": true
         }
         """
-        data = request.get_json()
+        data = request.get_json(silent=True)
         if data:
             question = data.get('question', None)
             answer = data.get('answer', None)
@@ -271,37 +358,145 @@ def create_app(test_config=None):
             difficulty = data.get('difficulty', None)
 
             try:
+                # the foreign key, checked without a query
+                if category is not None and categories.get(category) is None:
+                    abort(422)
+
                 questions = Question(question=question, answer=answer, category=category, difficulty=difficulty)
                 questions.insert()
 
-                all_questions = Question.query.order_by(Question.id).all()
-                paginated_questions = paginate_questions(request, all_questions)
-
-                total_questions = len(all_questions)
-
                 res_body = {}
 
-                res_body['questions'] = paginated_questions
-                res_body['total_questions'] = total_questions
-                res_body['success'] = True
+                res_body['created'] = questions.id
+                res_body['question'] = questions.format()
 
-                return jsonify(res_body)
+                return write_response(res_body)
 
             except Exception:
                 abort(422)
 
         abort(422)
 
+    @app.route('/api/questions/bulk', methods=['POST'])
+    def import_questions():
+        """
+        POST '/questions/bulk'
+        - Imports questions from newline delimited JSON (NDJSON) streamed in the request body, one question object per line. The body is read line by line and the questions are inserted in transactions of 1000, so packs of any size can be imported in one request.
+        - Request Arguments: A body of lines, each one an object with the keys question, answer, category, difficulty, as in POST '/questions'. Lines that cannot be imported (invalid JSON, missing question or answer, category or difficulty that is not an integer, unknown category) are skipped and reported.
+        Optional query string include_page (a page number) to also get that page of the questions.
+        - Returns: The number of imported questions, the first 100 rejected lines with their line number and reason, the number of rejected lines, total number of questions and success boolean,
+        plus the questions of the page when include_page is given, as the follwoing sample:
+        {
+            "imported": 2,
+            "rejected": [
+                {
+                    "line": 2,
+                    "message": "unknown category 1000"
+                }
+            ],
+            "total_rejected": 1,
+            "total_questions": 5,
+            "success": true
+        }
+        An error past the first transactions answers 422 with the questions already imported (kept) and the line the import stopped at, the questions read since the last transaction are not imported:
+        {
+            "imported": 1000,
+            "line": 1523,
+            "rejected": [],
+            "total_rejected": 0,
+            "error": 422,
+            "message": "Unprocessable Reuest",
+            "success": false
+        }
+        """
+        number = 0
+        imported = 0
+        rejected = []
+        total_rejected = 0
+        batch = []
+
+        try:
+            for number, line in enumerate(request.stream, 1):
+                if not line.strip():
+                    continue
+
+                try:
+                    batch.append(read_question(json.loads(line)))
+                except (ValueError, TypeError) as error:
+                    total_rejected += 1
+                    if len(rejected) < BULK_MAX_REJECTED:
+                        rejected.append({'line': number, 'message': str(error)})
+                    continue
+
+                if len(batch) == BULK_BATCH:
+                    Question.insert_many(batch)
+                    imported += len(batch)
+                    batch = []
+
+            if batch:
+                Question.insert_many(batch)
+                imported += len(batch)
+
+            res_body = {}
+
+            res_body['imported'] = imported
+            res_body['rejected'] = rejected
+            res_body['total_rejected'] = total_rejected
+
+            return write_response(res_body)
+
+        except Exception:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'error': 422,
+                'message': 'Unprocessable Reuest',
+                'imported': imported,
+                'line': number,
+                'rejected': rejected,
+                'total_rejected': total_rejected
+            }), 422
+
+    @app.route('/api/questions/export')
+    def export_questions():
+        """
+        GET '/questions/export'
+        - Streams every question as newline delimited JSON (NDJSON), one question object per line by id, in the format POST '/questions/bulk' imports. The rows are read from the database 1000 at a time while the response is sent.
+        - Request Arguments: Optional query string category (a category id) to only export the questions of that category.
+        - Returns: A body of lines, each one an object of question id, question category id, question difficulty, question answer, and question text, as the follwoing sample:
+        {"answer": "answer1", "category": 1, "difficulty": 1, "id": 1, "question": "question1"}
+        {"answer": "answer2", "category": 4, "difficulty": 1, "id": 2, "question": "question2"}
+        """
+        category_id = request.args.get('category', None, type=int)
+        query = Question.query.order_by(Question.id)
+
+        if category_id is not None:
+            if categories.get(category_id) is None:
+                abort(404)
+            query = query.filter_by(category=category_id)
+
+        def generate():
+            lines = []
+            for question in query.yield_per(EXPORT_BATCH):
+                lines.append(json.dumps(question.format(), sort_keys=True))
+                if len(lines) == EXPORT_BATCH:
+                    yield '\n'.join(lines) + '\n'
+                    lines = []
+            if lines:
+                yield '\n'.join(lines) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
     @app.route('/api/questions/search', methods=['POST'])
     def search_questions():
         """
         POST '/questions/search'
-        - Fetches a dictionary of questions in which the keys are the ids and the values is the corresponding string of the question search term and listing the current category of this questions listed.
-        - Request Arguments: An object with a key, question that contains a object of question: question_string key:value pairs.  
+        - Fetches the questions whose question or answer text contains every word of the search term (as a word prefix), best match first, 10 per page.
+        - Request Arguments: An object with a key, searchTerm that contains the search term, and an optional key category to only list the matches of one category id. The page is selected with the query string, e.g. '/questions/search?page=2'. An empty searchTerm lists every question.
         - Returns: 
-            Current category of fetched results with id and type values,
-            An object with questions of that category, that each contains an object of question id, question category id, question difficulty, question answer, and question text.
-            total number of questions and success boolean, as the follwoing sample:
+            Current category of the best match with id and type values,
+            An object with questions of the page, that each contains an object of question id, question category id, question difficulty, question answer, and question text.
+            total number of matching questions, the number of matches per category (ignoring the category argument) and success boolean, as the follwoing sample:
         {
             "current_category": {
                 "id": 1,
@@ -324,48 +519,56 @@ def create_app(test_config=None):
                 }
             ],
             "total_questions": 2,
+            "facets": [
+                {
+                    "count": 2,
+                    "id": 1,
+                    "type": "Science"
+                },
+                {
+                    "count": 1,
+                    "id": 4,
+                    "type": "History"
+                }
+            ],
             "success": true
         }
         """
-        total_questions = 0
+        data = request.get_json(silent=True)
+        if data is None:
+            abort(422)
 
         try:
-            data = request.get_json()
-            search_term = data.get('searchTerm', '')
-
-            search_result = Question.query.filter(Question.question.ilike('%{}%'.format(search_term))).order_by('id').all()
-            paginated_questions = paginate_questions(request, search_result)
+            search_term = data.get('searchTerm', '') or ''
+            category_filter = data.get('category', None)
+            page = max(request.args.get('page', 1, type=int), 1)
 
-            res_body = {}
-            total_questions = len(search_result)
+            total_questions, questions, facets = question_search.search(
+                search_term, page=page, per_page=QUESTIONS_PER_PAGE,
+                category=int(category_filter) if category_filter else None)
 
-            for question in search_result:
-                try:
-                    questions_categories = Category.query.filter_by(id=question.category).order_by('id').all()
-                    current_categories = paginate_categories(request, questions_categories)
+            current_category = None
+            if questions:
+                current_category = categories.get(questions[0]['category'])
 
-                    for category in current_categories:
-                        res_body['questions'] = paginated_questions
-                        res_body['total_questions'] = total_questions
-                        res_body['success'] = True
-                        res_body['current_category'] = category
+            res_body = {}
 
-                        return jsonify(res_body)
+            res_body['questions'] = questions
+            res_body['total_questions'] = total_questions
+            res_body['current_category'] = current_category
+            res_body['facets'] = [
+                dict(categories.get(category_id), count=facets[category_id])
+                for category_id in sorted(facets) if categories.get(category_id)
+            ]
+            res_body['success'] = True
 
-                except Exception:
-                    abort(422)
+            return jsonify(res_body)
 
         except Exception:
             abort(422)
 
-        res_body['questions'] = paginated_questions
-        res_body['total_questions'] = total_questions
-        res_body['success'] = True
-        res_body['current_category'] = None
-
-        return jsonify()
-
     @app.route('/api/categories/<int:category_id>/questions')
+    @conditional
     def get_category_questions(category_id):
         """
         GET '/categories/<int:category_id>/questions'
@@ -401,22 +604,22 @@ def create_app(test_config=None):
         }
         """
         try:
-            category = Category.query.get(category_id)
+            category = categories.get(category_id)
 
             if not category:
                 abort(404)
 
             try:
-                all_category_questions = Question.query.filter_by(category=category.id).order_by('id').all()
-                paginated_category_questions = paginate_questions(request, all_category_questions)
+                category_questions = Question.query.filter_by(category=category['id'])
+                paginated_category_questions = paginate_questions(request, category_questions)
 
-                total_category_questions = len(all_category_questions)
+                total_category_questions = count(category_questions, Question.id)
 
                 res_body = {}
                 res_body['questions'] = paginated_category_questions
                 res_body['total_questions'] = total_category_questions
                 res_body['success'] = True
-                res_body['current_category'] = category.format()
+                res_body['current_category'] = category
 
                 return jsonify(res_body)
 
@@ -430,7 +633,7 @@ def create_app(test_config=None):
     def play():
         """
         POST '/quizzes'
-        - Fetches a dictionary of questions based on take category and previous question parameters and return a random questions within the given category, if provided, and that is not one of the previous questions.
+        - Fetches a dictionary of questions based on take category and previous question parameters and return a random questions within the given category, if provided, and that is not one of the previous questions. The question is drawn uniformly from every eligible question of the category, or of all the categories for ALL (id 0) or an unknown category.
         - Request Arguments: An object with a key, category that contains id of the category of the questions to list: category_id key:value pairs and previous question parameter that contains key of the previous_question of the questions to list: previous_question_string key:value pairs.
         - Returns: 
             Previously selected questions,
@@ -454,22 +657,15 @@ def create_app(test_config=None):
             previous_questions = req.get('previous_questions', None)
             quiz_category = req.get('quiz_category', None)
 
-            category = Category.query.get(quiz_category.get('id', 0))
-
-            if not category:
-                category = random.choice(Category.query.all())
+            category = categories.get(quiz_category.get('id', 0))
 
             try:
-                all_category_questions = Question.query.filter(Question.id.notin_(previous_questions)).filter_by(category=category.id).order_by('id').all()
-                paginated_category_questions = paginate_questions(request, all_category_questions)
-
-                found_question = True
-                question = None
+                # questions of every category for ALL (id 0) or an unknown category
+                question = draw_question(category['id'] if category else None, previous_questions)
 
-                if len(paginated_category_questions) == 0:
-                    found_question = False
-                else:
-                    question = random.choice(paginated_category_questions)
+                found_question = question is not None
+                if found_question:
+                    question = question.format()
 
                 return jsonify({
                     'success': True,
@@ -484,6 +680,103 @@ def create_app(test_config=None):
         except Exception:
             abort(422)
 
+    @app.route("/api/quizzes/sessions", methods=["POST"])
+    def start_quiz_session():
+        """
+        POST '/quizzes/sessions'
+        - Starts a quiz played server-side: the questions already asked are remembered by the server, so rounds do not resend previous questions.
+        - Request Arguments: An optional object with a key, quiz_category that contains id of the category of the questions to play: category_id key:value pairs, 0 or none for all categories.
+        - Returns: The session id to play the rounds with, the category id and success boolean, as the follwoing sample:
+        {
+            "session_id": "Jx3Rx3F1v6mQf2n0w7hZpA",
+            "quiz_category": 1,
+            "success": true
+        }
+        """
+        req = request.get_json(silent=True) or {}
+        quiz_category = req.get('quiz_category') or {}
+
+        try:
+            category = categories.get(quiz_category.get('id', 0))
+            session = quiz_sessions.start(category['id'] if category else None)
+
+            return jsonify({
+                'success': True,
+                'session_id': session.id,
+                'quiz_category': session.category_id
+            })
+
+        except Exception:
+            abort(422)
+
+    @app.route("/api/quizzes/sessions/<session_id>", methods=["POST"])
+    def play_quiz_session(session_id):
+        """
+        POST '/quizzes/sessions/<session_id>'
+        - Plays one round of a quiz session: returns a random question of the session category that was not asked in the session yet, none past 1000 questions.
+        - Request Arguments: session_id
+        - Returns: 
+            Randomly selected question of the session category that contains question id, question category id, question difficulty, question answer, and question text,
+            the number of questions asked in the session, a boolean if question found and success boolean, as the follwoing sample:
+        {
+            "session_id": "Jx3Rx3F1v6mQf2n0w7hZpA",
+            "question": {
+                    "answer": "answer3",
+                    "category": 1,
+                    "difficulty": 1,
+                    "id": 4,
+                    "question": "question3"
+            },
+            "totalPlayed": 3,
+            "foundQuestion": true,
+            "success": true
+        }
+        """
+        session = quiz_sessions.get(session_id)
+
+        if session is None:
+            abort(404)
+
+        try:
+            # a session asks at most quiz_sessions.MAX_QUESTIONS questions
+            question = None if session.used.full else draw_question(session.category_id, session.used)
+
+            found_question = question is not None
+            if found_question:
+                quiz_sessions.mark_used(session, question.id)
+                question = question.format()
+
+            return jsonify({
+                'success': True,
+                'session_id': session.id,
+                'question': question,
+                'totalPlayed': len(session.used),
+                'foundQuestion': found_question
+            })
+
+        except Exception:
+            abort(422)
+
+    @app.route("/api/quizzes/sessions/<session_id>", methods=["DELETE"])
+    def end_quiz_session(session_id):
+        """
+        DELETE '/quizzes/sessions/<session_id>'
+        - Ends a quiz session, sessions also expire after 30 minutes without a round.
+        - Request Arguments: session_id
+        - Returns: The ended session id and success boolean, as the follwoing sample:
+        {
+            "deleted": "Jx3Rx3F1v6mQf2n0w7hZpA",
+            "success": true
+        }
+        """
+        if not quiz_sessions.end(session_id):
+            abort(404)
+
+        return jsonify({
+            'success': True,
+            'deleted': session_id
+        })
+
 
 # -------------------------------------------------------------------------------------
 
@@ -0,0 +1,12 @@
+#----------------------------------------------------------------------------#
+# Load test.
+#
+# Seeds a local database with a dataset of configurable size, drives every
+# route of the API through the Flask test client and through a real WSGI
+# server with concurrent clients, and reports latency percentiles,
+# throughput and SQL statements per request as JSON, to be kept and
+# compared across commits.
+#
+#   python -m loadtest --questions 1000000 --categories 50 --output before.json
+#   python -m loadtest --questions 1000000 --categories 50 --compare before.json
+#----------------------------------------------------------------------------#
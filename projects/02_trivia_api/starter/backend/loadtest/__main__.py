@@ -0,0 +1,103 @@
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from flaskr import create_app
+from models import db
+from benchmark import reset_db, seed_questions
+from loadtest.runner import Server, run_server, run_test_client
+from loadtest.scenarios import SCENARIOS, Dataset
+
+# a file, so that the threads of the server share one database
+DEFAULT_DATABASE_URL = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'trivia_loadtest.db')
+MODES = ('test-client', 'wsgi')
+
+def current_commit():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def compare(baseline, report, out=sys.stdout):
+  '''
+  prints the change of p50, p95 and throughput of every endpoint since the baseline report
+  '''
+  if baseline.get('latency') != report['latency']:
+    # older reports timed whole runs of the scenarios sending several requests
+    out.write('the baseline latencies are per {}, not per {}\n'.format(baseline.get('latency', 'run'), report['latency']))
+  before = {(result['endpoint'], result['mode']): result for result in baseline['results']}
+  out.write('{:<36} {:<12} {:>18} {:>18} {:>18}\n'.format('endpoint', 'mode', 'p50 (ms)', 'p95 (ms)', 'throughput (rps)'))
+  for result in report['results']:
+    old = before.get((result['endpoint'], result['mode']))
+    # no latencies when every run failed
+    if old is None or None in (old['p50_ms'], result['p50_ms']):
+      continue
+    columns = [
+      '{:>8.2f} -> {:<7.2f}'.format(old[key], result[key])
+      for key in ('p50_ms', 'p95_ms', 'throughput_rps')
+    ]
+    out.write('{:<36} {:<12} {}\n'.format(result['endpoint'], result['mode'], ' '.join(columns)))
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog='python -m loadtest', description='Trivia API load test')
+  parser.add_argument('--database', default=os.environ.get('LOADTEST_DATABASE_URL', DEFAULT_DATABASE_URL),
+                      help='database to seed and test, dropped and recreated unless --no-seed')
+  parser.add_argument('--questions', type=int, default=100000)
+  parser.add_argument('--categories', type=int, default=50)
+  parser.add_argument('--no-seed', action='store_true', help='test the data already in the database')
+  parser.add_argument('--runs', type=int, default=200, help='runs of every scenario per mode')
+  parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients of the WSGI server')
+  parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+  parser.add_argument('--endpoints', nargs='+', choices=sorted(SCENARIOS), metavar='ENDPOINT',
+                      help='a subset of: ' + ', '.join(sorted(SCENARIOS)))
+  parser.add_argument('--output', help='file to write the JSON report to, stdout by default')
+  parser.add_argument('--compare', help='JSON report of an earlier run to compare with')
+  args = parser.parse_args(argv)
+
+  app = create_app({'SQLALCHEMY_DATABASE_URI': args.database})
+  dataset = Dataset(args.questions, args.categories)
+  names = args.endpoints or list(SCENARIOS)
+
+  with app.app_context():
+    if not args.no_seed:
+      reset_db()
+      seed_questions(args.questions, args.categories)
+
+    results = []
+    if 'test-client' in args.modes:
+      for name in names:
+        results.append(run_test_client(app, dataset, name, args.runs))
+    if 'wsgi' in args.modes:
+      with Server(app) as server:
+        for name in names:
+          results.append(run_server(server, dataset, name, args.runs, args.concurrency))
+
+    database = db.engine.dialect.name
+
+  report = {
+    'commit': current_commit(),
+    'created_at': datetime.datetime.utcnow().isoformat() + 'Z',
+    'database': database,
+    'questions': args.questions,
+    'categories': args.categories,
+    'latency': 'request',
+    'results': results
+  }
+
+  text = json.dumps(report, indent=2)
+  if args.output:
+    with open(args.output, 'w') as output:
+      output.write(text + '\n')
+  else:
+    print(text)
+
+  if args.compare:
+    with open(args.compare) as baseline:
+      compare(json.load(baseline), report, sys.stderr if not args.output else sys.stdout)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,205 @@
+#----------------------------------------------------------------------------#
+# Runner.
+#
+# Runs the scenarios through the Flask test client, one after the other, and
+# through a threaded WSGI server on a local port, from concurrent clients
+# that each keep one HTTP/1.1 connection open.
+#----------------------------------------------------------------------------#
+
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from benchmark import QueryCounter
+from loadtest.scenarios import SCENARIOS
+
+#----------------------------------------------------------------------------#
+# Clients.
+#----------------------------------------------------------------------------#
+
+class TestClient(object):
+  def __init__(self, app):
+    self.client = app.test_client()
+
+  def request(self, method, path, body=None, headers=None):
+    response = self.client.open(path, method=method, json=body, headers=headers or {})
+    return response.status_code, response.headers, response.get_json(silent=True)
+
+  def reconnect(self):
+    pass
+
+  def close(self):
+    pass
+
+class HTTPClient(object):
+  def __init__(self, host, port):
+    self.connection = http.client.HTTPConnection(host, port, timeout=60)
+
+  def request(self, method, path, body=None, headers=None):
+    headers = dict(headers or {})
+    if body is not None:
+      body = json.dumps(body)
+      headers['Content-Type'] = 'application/json'
+
+    self.connection.request(method, path, body, headers)
+    response = self.connection.getresponse()
+    data = response.read()
+    if data and response.getheader('Content-Type', '').startswith('application/json'):
+      data = json.loads(data)
+    return response.status, response.headers, data
+
+  def reconnect(self):
+    # http.client opens a new connection on the next request
+    self.connection.close()
+
+  def close(self):
+    self.connection.close()
+
+class TimedClient(object):
+  '''
+  wraps a client to time every request it sends, the scenarios that send
+  several (a revalidation, a whole quiz) are measured per request
+  '''
+  def __init__(self, client):
+    self.client = client
+    self.timings = []
+
+  def request(self, *args, **kwargs):
+    start = time.perf_counter()
+    response = self.client.request(*args, **kwargs)
+    self.timings.append(time.perf_counter() - start)
+    return response
+
+class RequestHandler(WSGIRequestHandler):
+  # keep-alive connections, and no log line per request
+  protocol_version = 'HTTP/1.1'
+
+  def log_request(self, *args, **kwargs):
+    pass
+
+class Server(object):
+  '''
+  the app behind a threaded werkzeug server on a free local port, while the
+  context is active
+  '''
+  def __init__(self, app, host='127.0.0.1'):
+    self.server = make_server(host, 0, app, threaded=True, request_handler=RequestHandler)
+    self.host = host
+    self.port = self.server.server_port
+    self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+  def __enter__(self):
+    self.thread.start()
+    return self
+
+  def __exit__(self, *exc):
+    self.server.shutdown()
+    self.server.server_close()
+
+class ThreadQueryCounter(QueryCounter):
+  '''
+  QueryCounter for statements sent from the threads of the server
+  '''
+  def __init__(self):
+    super(ThreadQueryCounter, self).__init__()
+    self.lock = threading.Lock()
+
+  def _count(self, *args, **kwargs):
+    with self.lock:
+      self.count += 1
+
+#----------------------------------------------------------------------------#
+# Measures.
+#----------------------------------------------------------------------------#
+
+def percentile(timings, percent):
+  # nearest rank
+  index = max(int(round(percent / 100.0 * len(timings) + 0.5)) - 1, 0)
+  return timings[min(index, len(timings) - 1)]
+
+def summarize(name, mode, concurrency, runs, timings, errors, elapsed, queries):
+  # the latencies are per request, of the requests that got a response;
+  # none of them did when every run failed
+  timings = sorted(timings)
+  requests = len(timings)
+  in_ms = lambda seconds: seconds * 1000 if requests else None
+  return {
+    'endpoint': name,
+    'mode': mode,
+    'concurrency': concurrency,
+    'runs': runs,
+    'requests': requests,
+    'errors': errors,
+    'p50_ms': in_ms(requests and percentile(timings, 50)),
+    'p95_ms': in_ms(requests and percentile(timings, 95)),
+    'p99_ms': in_ms(requests and percentile(timings, 99)),
+    'mean_ms': in_ms(requests and sum(timings) / requests),
+    'throughput_rps': requests / elapsed,
+    'queries_per_request': queries / requests if requests else None
+  }
+
+def play(scenario, client, dataset, rng, runs):
+  '''
+  runs the scenario `runs` times, returns the time of every request and the
+  number of failed runs
+  '''
+  timed = TimedClient(client)
+  errors = 0
+  for _ in range(runs):
+    try:
+      scenario(timed, dataset, rng)
+    except (AssertionError, KeyError, TypeError, http.client.HTTPException, OSError):
+      # a wrong status, or a connection reset or timed out half way through
+      # a response: the run counts as an error and the next one reconnects
+      errors += 1
+      client.reconnect()
+  return timed.timings, errors
+
+def run_test_client(app, dataset, name, runs, seed=0):
+  '''
+  runs the scenario `runs` times through the test client, after one run to
+  warm the caches up. to be called in an app context.
+  '''
+  scenario = SCENARIOS[name]
+  client = TestClient(app)
+  rng = random.Random(seed)
+  play(scenario, client, dataset, rng, 1)
+
+  with QueryCounter() as counter:
+    start = time.perf_counter()
+    timings, errors = play(scenario, client, dataset, rng, runs)
+    elapsed = time.perf_counter() - start
+
+  return summarize(name, 'test-client', 1, runs, timings, errors, elapsed, counter.count)
+
+def run_server(server, dataset, name, runs, concurrency, seed=0):
+  '''
+  runs the scenario `runs` times against the server, split between
+  `concurrency` clients. to be called in an app context.
+  '''
+  scenario = SCENARIOS[name]
+  warm_up = HTTPClient(server.host, server.port)
+  play(scenario, warm_up, dataset, random.Random(seed), 1)
+  warm_up.close()
+
+  def client_runs(index):
+    client = HTTPClient(server.host, server.port)
+    try:
+      count = runs // concurrency + (1 if index < runs % concurrency else 0)
+      return play(scenario, client, dataset, random.Random(seed + index + 1), count)
+    finally:
+      client.close()
+
+  with ThreadQueryCounter() as counter:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+      results = list(pool.map(client_runs, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+  timings = [timing for client_timings, _ in results for timing in client_timings]
+  errors = sum(client_errors for _, client_errors in results)
+  return summarize(name, 'wsgi', concurrency, runs, timings, errors, elapsed, counter.count)
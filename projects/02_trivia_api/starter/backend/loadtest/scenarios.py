@@ -0,0 +1,87 @@
+#----------------------------------------------------------------------------#
+# Scenarios.
+#
+# One per route: a function of (client, dataset, rng) sending its requests
+# and checking their status. The client is any object with a
+# request(method, path, body=None, headers=None) -> (status, headers, data)
+# method, see runner.py.
+#----------------------------------------------------------------------------#
+
+class Dataset(object):
+  '''
+  the size of the seeded data, what the scenarios pick their ids from
+  '''
+  def __init__(self, questions, categories):
+    self.questions = questions
+    self.categories = categories
+
+  def question_id(self, rng):
+    return rng.randint(1, self.questions)
+
+  def category_id(self, rng):
+    return rng.randint(1, self.categories)
+
+  def page(self, rng):
+    return rng.randint(1, max((self.questions - 1) // 10 + 1, 1))
+
+def expect(response, *statuses):
+  status, _, data = response
+  if status not in statuses:
+    raise AssertionError('status %d: %s' % (status, data))
+  return data
+
+def categories(client, dataset, rng):
+  expect(client.request('GET', '/api/categories'), 200)
+
+def questions(client, dataset, rng):
+  expect(client.request('GET', '/api/questions?page=%d' % dataset.page(rng)), 200)
+
+def questions_keyset(client, dataset, rng):
+  expect(client.request('GET', '/api/questions?after_id=%d' % (dataset.page(rng) * 10 - 10)), 200)
+
+def questions_revalidate(client, dataset, rng):
+  # a polling client sending the ETag of the page it has
+  path = '/api/questions?page=%d' % dataset.page(rng)
+  _, headers, _ = client.request('GET', path)
+  expect(client.request('GET', path, headers={'If-None-Match': headers['ETag']}), 304)
+
+def search(client, dataset, rng):
+  body = {'searchTerm': 'question %d' % dataset.question_id(rng)}
+  expect(client.request('POST', '/api/questions/search', body), 200)
+
+def category_questions(client, dataset, rng):
+  expect(client.request('GET', '/api/categories/%d/questions' % dataset.category_id(rng)), 200)
+
+def quiz(client, dataset, rng):
+  body = {
+    'previous_questions': [dataset.question_id(rng) for _ in range(20)],
+    'quiz_category': {'id': dataset.category_id(rng)}
+  }
+  expect(client.request('POST', '/api/quizzes', body), 200)
+
+def quiz_session(client, dataset, rng):
+  # a whole quiz of five rounds
+  data = expect(client.request('POST', '/api/quizzes/sessions', {'quiz_category': {'id': dataset.category_id(rng)}}), 200)
+  path = '/api/quizzes/sessions/' + data['session_id']
+  for _ in range(5):
+    expect(client.request('POST', path), 200)
+  expect(client.request('DELETE', path), 200)
+
+def create_delete(client, dataset, rng):
+  body = {'question': 'Load test?', 'answer': 'Yes', 'category': dataset.category_id(rng), 'difficulty': 1}
+  data = expect(client.request('POST', '/api/questions', body), 200)
+  expect(client.request('DELETE', '/api/questions/%d' % data['created']), 200)
+
+# name -> scenario, the latencies of the ones sending several requests are
+# measured per request
+SCENARIOS = {
+  'GET /api/categories': categories,
+  'GET /api/questions': questions,
+  'GET /api/questions?after_id': questions_keyset,
+  'GET /api/questions 304': questions_revalidate,
+  'POST /api/questions/search': search,
+  'GET /api/categories/<id>/questions': category_questions,
+  'POST /api/quizzes': quiz,
+  'POST /api/quizzes/sessions': quiz_session,
+  'POST+DELETE /api/questions': create_delete,
+}
@@ -1,10 +1,17 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+import random
+import secrets
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from sqlalchemy import Column, String, Integer, ForeignKey, create_engine, event, func
 from flask_sqlalchemy import SQLAlchemy
 import json
+from search import QuestionSearch
 
 database_name = "trivia"
-database_path = "postgres://{}/{}".format('localhost:5432', database_name)
+database_path = os.environ.get('DATABASE_URL', "postgres://{}/{}".format('localhost:5432', database_name))
 
 db = SQLAlchemy()
 
@@ -18,6 +25,19 @@ def setup_db(app, database_path=database_path):
     db.app = app
     db.init_app(app)
     db.create_all()
+    reset_caches()
+
+'''
+reset_caches()
+    drops what the process keeps of the tables, for when they changed behind
+    its back: another database, a bulk load or a rolled back test
+'''
+def reset_caches():
+    question_count.reset()
+    question_sampler.reset()
+    question_search.reset()
+    category_map.invalidate()
+    question_changes.bump()
 
 '''
 Question
@@ -29,27 +49,51 @@ class Question(db.Model):
   id = Column(Integer, primary_key=True)
   question = Column(String)
   answer = Column(String)
-  category = Column(Integer)
+  category = Column(Integer, ForeignKey('categories.id', onupdate='CASCADE', ondelete='SET NULL'), index=True)
   difficulty = Column(Integer)
-  # category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
 
   def __init__(self, question, answer, category, difficulty):
     self.question = question
     self.answer = answer
     self.category = category
     self.difficulty = difficulty
-    # self.category_id = category.id
 
   def insert(self):
     db.session.add(self)
     db.session.commit()
+    question_changes.bump()
+    question_count.add(1)
+    question_sampler.add(self.id, self.category)
+    question_search.add(self)
+
+  @classmethod
+  def insert_many(cls, rows):
+    '''
+    inserts the question dicts in one transaction, the id arrays and the
+    search index are rebuilt on their next use
+    '''
+    db.session.execute(cls.__table__.insert(), rows)
+    db.session.commit()
+    question_changes.bump()
+    question_count.add(len(rows))
+    question_sampler.reset()
+    question_search.reset()
   
   def update(self):
     db.session.commit()
+    question_changes.bump()
+    # the category may have changed
+    question_sampler.reset()
+    question_search.add(self)
 
   def delete(self):
+    question_id = self.id
     db.session.delete(self)
     db.session.commit()
+    question_changes.bump()
+    question_count.add(-1)
+    question_sampler.discard(question_id)
+    question_search.discard(question_id)
 
   def format(self):
     return {
@@ -60,6 +104,180 @@ class Question(db.Model):
       'difficulty': self.difficulty
     }
 
+'''
+RowCount
+    number of rows of a model, counted once and then moved by the inserts
+    and deletes of this process. it is recounted after max_age seconds to
+    pick up the writes of other processes. every change moves the
+    generation, a count that ran while it moved may or may not hold the
+    change and is not kept.
+'''
+class RowCount:
+  def __init__(self, column, max_age=60):
+    self.column = column
+    self.max_age = max_age
+    self.value = None
+    self.counted_at = 0
+    self.generation = 0
+    self.lock = threading.Lock()
+
+  def get(self):
+    with self.lock:
+      if self.value is not None and time.monotonic() - self.counted_at < self.max_age:
+        return self.value
+      generation = self.generation
+
+    value = db.session.query(func.count(self.column)).scalar()
+    with self.lock:
+      if self.generation == generation:
+        self.value = value
+        self.counted_at = time.monotonic()
+    return value
+
+  def add(self, delta):
+    with self.lock:
+      self.generation += 1
+      if self.value is not None:
+        self.value += delta
+
+  def reset(self):
+    with self.lock:
+      self.generation += 1
+      self.value = None
+
+question_count = RowCount(Question.id)
+
+'''
+ChangeCounter
+    version of a table, bumped by every write of this process. tag() makes
+    the value of weak ETags of it: they carry a token of the process, so
+    processes never share tags, and the period of max_age seconds they were
+    made in, so that like the other caches they pick up the writes of other
+    processes. those can go unseen for up to max_age seconds, which is why
+    the tags are weak: a 304 stands for an equivalent listing, not for the
+    exact state of the database.
+'''
+class ChangeCounter:
+  def __init__(self, max_age=60):
+    self.max_age = max_age
+    self.token = secrets.token_hex(4)
+    self.version = 0
+    self.lock = threading.Lock()
+
+  def bump(self):
+    with self.lock:
+      self.version += 1
+
+  def tag(self):
+    period = int(time.monotonic() // self.max_age)
+    return '{}-{}-{}'.format(self.token, period, self.version)
+
+question_changes = ChangeCounter()
+
+'''
+QuestionSampler
+    picks a question id uniformly at random, from one category or from all,
+    out of the ids that are not excluded. the ids of every category are kept
+    in memory as arrays: loaded with one query, appended to by inserts, and
+    deleted ids are skipped until there are enough of them to compact.
+    reloaded after max_age seconds to pick up the writes of other processes.
+    the deleted ids are a frozenset replaced on every write, so that a draw
+    reads the one it took under the lock while deletes go on.
+'''
+class QuestionSampler:
+  def __init__(self, max_age=60, rand=random):
+    self.max_age = max_age
+    self.random = rand
+    self.ids = None
+    self.removed = frozenset()
+    self.loaded_at = 0
+    self.lock = threading.Lock()
+
+  def fill(self, rows):
+    '''
+    loads the (id, category) rows, the None category holds every id, questions
+    without a category are only under it
+    '''
+    ids = {None: array('q')}
+    for question_id, category in rows:
+      ids[None].append(question_id)
+      if category is not None:
+        ids.setdefault(category, array('q')).append(question_id)
+
+    with self.lock:
+      self.ids = ids
+      self.removed = frozenset()
+      self.loaded_at = time.monotonic()
+
+  def load(self):
+    with self.lock:
+      if self.ids is not None and time.monotonic() - self.loaded_at < self.max_age:
+        return
+    self.fill(db.session.query(Question.id, Question.category))
+
+  def reset(self):
+    with self.lock:
+      self.ids = None
+
+  def add(self, question_id, category):
+    # the keys are the ids sample() is called with, whatever the caller set
+    category = int(category) if category is not None else None
+    with self.lock:
+      if self.ids is not None:
+        self.ids[None].append(question_id)
+        if category is not None:
+          self.ids.setdefault(category, array('q')).append(question_id)
+        if question_id in self.removed:
+          self.removed = self.removed - {question_id}
+
+  def discard(self, question_id):
+    with self.lock:
+      if self.ids is None:
+        return
+      self.removed = self.removed | {question_id}
+      if len(self.removed) * 4 > len(self.ids[None]):
+        self.ids = {
+          category: array('q', (i for i in ids if i not in self.removed))
+          for category, ids in self.ids.items()
+        }
+        self.removed = frozenset()
+
+  def sample(self, category=None, exclude=()):
+    '''
+    returns a random id of `category` (any category for None) that is not
+    in `exclude`, or None when there is none left.
+    draws are rejected while they hit an excluded id, which takes a couple
+    of draws on average as long as at most half the ids are excluded, past
+    that the eligible ids are listed once and drawn from directly.
+    '''
+    self.load()
+    with self.lock:
+      ids = self.ids.get(category, ())
+      removed = self.removed
+
+    # lists are turned into a set once, sets and id sets are used as they are
+    if isinstance(exclude, (list, tuple)):
+      exclude = set(exclude)
+    if not ids:
+      return None
+
+    for _ in range(8):
+      question_id = ids[self.random.randrange(len(ids))]
+      if question_id not in exclude and question_id not in removed:
+        return question_id
+
+    eligible = [i for i in ids if i not in exclude and i not in removed]
+    return self.random.choice(eligible) if eligible else None
+
+question_sampler = QuestionSampler()
+
+'''
+question_search
+    relevance search over the question and answer text, see search.py
+'''
+question_search = QuestionSearch(db, Question)
+question_search.install()
+
 '''
 Category
 
@@ -69,7 +287,7 @@ class Category(db.Model):
 
   id = Column(Integer, primary_key=True)
   type = Column(String)
-  # questions = db.relationship("Question", backref="questions")
+  questions = db.relationship('Question', backref='category_record', lazy='dynamic')
 
   def __init__(self, type):
     self.type = type
@@ -78,4 +296,74 @@ class Category(db.Model):
     return {
       'id': self.id,
       'type': self.type
-    }
\ No newline at end of file
+    }
+
+'''
+CategoryMap
+    the formatted categories by id, read with one query and shared by every
+    request. the version moves whenever the categories change: on the commits
+    of this process that write a category, and when the reread after max_age
+    seconds finds the writes of another process.
+'''
+class CategoryMap:
+  def __init__(self, max_age=60):
+    self.max_age = max_age
+    self.categories = None
+    self.version = 0
+    self.loaded_at = 0
+    self.lock = threading.Lock()
+
+  def get_all(self):
+    '''
+    returns {id: formatted category}, by id
+    '''
+    with self.lock:
+      if self.categories is not None and time.monotonic() - self.loaded_at < self.max_age:
+        return self.categories
+      version = self.version
+      previous = self.categories
+
+    categories = OrderedDict((category.id, category.format()) for category in Category.query.order_by(Category.id))
+
+    with self.lock:
+      # a change committed while reading invalidates what was read
+      if self.version == version:
+        if previous is not None and previous != categories:
+          self.version += 1
+        self.categories = categories
+        self.loaded_at = time.monotonic()
+    return categories
+
+  def get(self, category_id):
+    try:
+      return self.get_all().get(int(category_id))
+    except (TypeError, ValueError):
+      return None
+
+  def invalidate(self):
+    with self.lock:
+      self.categories = None
+      self.version += 1
+
+  def watch(self, session):
+    '''
+    invalidates the map after the commits through `session` that write a category
+    '''
+    @event.listens_for(session, 'after_flush')
+    def collect_category_writes(session, flush_context):
+      for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Category):
+          session.info['categories_changed'] = True
+          return
+
+    @event.listens_for(session, 'after_commit')
+    def apply_category_writes(session):
+      if session.info.pop('categories_changed', False):
+        self.invalidate()
+
+    @event.listens_for(session, 'after_rollback')
+    def forget_category_writes(session):
+      session.info.pop('categories_changed', None)
+
+category_map = CategoryMap()
+category_map.watch(db.session)
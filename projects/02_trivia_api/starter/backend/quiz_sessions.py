@@ -0,0 +1,162 @@
+import base64
+import bisect
+import json
+import secrets
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+'''
+IdSet
+    set of question ids as a sorted array of 4 bytes each, so that a session
+    costs what it asked whatever the ids are. membership is O(log n),
+    insertion O(n) but the set holds at most `limit` ids; serialized as the
+    varint deltas between the ids, about 1-2 bytes each.
+'''
+class IdSet:
+  def __init__(self, data=b'', limit=1000):
+    self.ids = array('I')
+    self.limit = limit
+    value = shift = 0
+    for byte in data:
+      value |= (byte & 0x7f) << shift
+      shift += 7
+      if not byte & 0x80:
+        self.add((self.ids[-1] if self.ids else 0) + value)
+        value = shift = 0
+    if shift:
+      raise ValueError('truncated id set')
+
+  @property
+  def full(self):
+    return len(self.ids) >= self.limit
+
+  def add(self, value):
+    index = bisect.bisect_left(self.ids, value)
+    if index < len(self.ids) and self.ids[index] == value:
+      return
+    if self.full:
+      raise ValueError('id set is full')
+    self.ids.insert(index, value)
+
+  def __contains__(self, value):
+    index = bisect.bisect_left(self.ids, value)
+    return index < len(self.ids) and self.ids[index] == value
+
+  def __len__(self):
+    return len(self.ids)
+
+  def __iter__(self):
+    return iter(self.ids)
+
+  def __bytes__(self):
+    data = bytearray()
+    previous = 0
+    for value in self.ids:
+      delta, previous = value - previous, value
+      while delta >= 0x80:
+        data.append(delta & 0x7f | 0x80)
+        delta >>= 7
+      data.append(delta)
+    return bytes(data)
+
+'''
+QuizSession
+    one quiz being played: its category and the questions already asked, up
+    to MAX_QUESTIONS of them
+'''
+MAX_QUESTIONS = 1000
+
+class QuizSession:
+  def __init__(self, session_id, category_id=None, used=None):
+    self.id = session_id
+    self.category_id = category_id
+    self.used = used if used is not None else IdSet(limit=MAX_QUESTIONS)
+
+  def dumps(self):
+    # for stores that keep sessions outside the process
+    return json.dumps({
+      'id': self.id,
+      'category_id': self.category_id,
+      'used': base64.b64encode(bytes(self.used)).decode()
+    })
+
+  @classmethod
+  def loads(cls, data):
+    data = json.loads(data)
+    return cls(data['id'], data['category_id'], IdSet(base64.b64decode(data['used']), MAX_QUESTIONS))
+
+'''
+MemoryStore
+    in-process session store. sessions expire `ttl` seconds after their last
+    use and past `max_sessions` the least recently used one is evicted.
+    any object with the same get/set/delete methods can replace it, e.g. one
+    keeping QuizSession.dumps() in redis with the ttl as expiry.
+'''
+class MemoryStore:
+  def __init__(self, ttl=30 * 60, max_sessions=10000):
+    self.ttl = ttl
+    self.max_sessions = max_sessions
+    # session id -> (expiry, session), least recently used first
+    self.sessions = OrderedDict()
+    self.lock = threading.Lock()
+
+  def get(self, session_id):
+    now = time.monotonic()
+    with self.lock:
+      entry = self.sessions.get(session_id)
+      if entry is None:
+        return None
+      if entry[0] <= now:
+        del self.sessions[session_id]
+        return None
+      self.sessions[session_id] = (now + self.ttl, entry[1])
+      self.sessions.move_to_end(session_id)
+      return entry[1]
+
+  def set(self, session_id, session):
+    now = time.monotonic()
+    with self.lock:
+      self.sessions[session_id] = (now + self.ttl, session)
+      self.sessions.move_to_end(session_id)
+      self.evict(now)
+
+  def delete(self, session_id):
+    with self.lock:
+      return self.sessions.pop(session_id, None) is not None
+
+  def evict(self, now):
+    # expired sessions are the least recently used ones, so they sit in front
+    while self.sessions:
+      session_id, (expiry, _) = next(iter(self.sessions.items()))
+      if expiry > now and len(self.sessions) <= self.max_sessions:
+        break
+      del self.sessions[session_id]
+
+  def __len__(self):
+    return len(self.sessions)
+
+'''
+QuizSessions
+    quiz sessions kept in a store, see MemoryStore
+'''
+class QuizSessions:
+  def __init__(self, store=None):
+    self.store = store if store is not None else MemoryStore()
+
+  def start(self, category_id=None):
+    session = QuizSession(secrets.token_urlsafe(16), category_id)
+    self.store.set(session.id, session)
+    return session
+
+  def get(self, session_id):
+    return self.store.get(session_id)
+
+  def mark_used(self, session, question_id):
+    session.used.add(question_id)
+    # stores keeping copies need the change written back
+    self.store.set(session.id, session)
+
+  def end(self, session_id):
+    return self.store.delete(session_id)
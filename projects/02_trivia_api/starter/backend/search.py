@@ -0,0 +1,245 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import DDL, event, text
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# a match in the question text counts more than one in the answer
+QUESTION_WEIGHT = 2.0
+ANSWER_WEIGHT = 1.0
+
+def tokenize(value):
+  return [token.lower() for token in TOKEN.findall(value or '')]
+
+'''
+PostgreSQL
+    the question and answer text is matched through a GIN index on their
+    tsvector, every search token as a word prefix like the TokenIndex, with
+    the question words weighted above the answer words. one statement returns
+    the total, the page of the best matches and the number of matches per
+    category.
+'''
+DOCUMENT = (
+  "(setweight(to_tsvector('simple', coalesce(question, '')), 'A') || "
+  "setweight(to_tsvector('simple', coalesce(answer, '')), 'B'))"
+)
+
+# created with the table, trivia.psql has it for databases restored from it
+POSTGRES_INDEX = 'CREATE INDEX IF NOT EXISTS questions_document_idx ON %(table)s USING gin ({})'.format(DOCUMENT)
+
+POSTGRES_SEARCH = '''
+  WITH matches AS (
+    SELECT id, question, answer, category, difficulty, {rank} AS rank
+    FROM questions
+    WHERE {where}
+  ), filtered AS (
+    SELECT * FROM matches WHERE CAST(:category AS integer) IS NULL OR category = :category
+  )
+  SELECT
+    (SELECT count(*) FROM filtered) AS total,
+    (SELECT coalesce(json_agg(page), '[]') FROM (
+      SELECT id, question, answer, category, difficulty FROM filtered
+      ORDER BY rank DESC, id LIMIT :limit OFFSET :offset
+    ) page) AS questions,
+    (SELECT coalesce(json_object_agg(category, matches), '{{}}') FROM (
+      SELECT category, count(*) AS matches FROM matches WHERE category IS NOT NULL GROUP BY category
+    ) facets) AS facets
+'''
+
+POSTGRES_MATCH = {
+  'rank': "ts_rank({document}, to_tsquery('simple', :query))".format(document=DOCUMENT),
+  'where': "{document} @@ to_tsquery('simple', :query)".format(document=DOCUMENT),
+}
+
+# an empty search lists every question
+POSTGRES_ALL = {
+  'rank': '0',
+  'where': 'TRUE',
+}
+
+'''
+TokenIndex
+    in-process inverted index for SQLite/dev: token -> {question id: weight},
+    with the tokens kept sorted so that a search token matches every indexed
+    token it is a prefix of. ranked by weighted term frequency times idf.
+'''
+class TokenIndex:
+  def __init__(self):
+    self.postings = {}
+    self.vocabulary = []
+    self.categories = {}
+    self.tokens = {}
+
+  def add(self, question_id, question, answer, category):
+    self.discard(question_id)
+    weights = defaultdict(float)
+    for token in tokenize(question):
+      weights[token] += QUESTION_WEIGHT
+    for token in tokenize(answer):
+      weights[token] += ANSWER_WEIGHT
+
+    for token, weight in weights.items():
+      if token not in self.postings:
+        self.postings[token] = {}
+        bisect.insort(self.vocabulary, token)
+      self.postings[token][question_id] = weight
+    self.categories[question_id] = category
+    self.tokens[question_id] = list(weights)
+
+  def discard(self, question_id):
+    for token in self.tokens.pop(question_id, ()):
+      postings = self.postings[token]
+      postings.pop(question_id, None)
+      if not postings:
+        del self.postings[token]
+        del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+    self.categories.pop(question_id, None)
+
+  def expand(self, prefix):
+    start = bisect.bisect_left(self.vocabulary, prefix)
+    end = bisect.bisect_left(self.vocabulary, prefix + '\uffff')
+    return self.vocabulary[start:end]
+
+  def search(self, term):
+    '''
+    returns {question id: score} of the questions matching every token of
+    the term, or None for an empty term
+    '''
+    tokens = tokenize(term)
+    if not tokens:
+      return None
+
+    total = max(len(self.categories), 1)
+    # the rarest token first, the others only score its matches
+    matches = []
+    for prefix in tokens:
+      postings = [self.postings[token] for token in self.expand(prefix)]
+      matches.append((sum(len(entries) for entries in postings), postings))
+    matches.sort(key=lambda match: match[0])
+
+    scores = None
+    for _, postings in matches:
+      weighted = [(entries, math.log(total / len(entries)) + 1) for entries in postings]
+      if scores is None:
+        scores = defaultdict(float)
+        for entries, idf in weighted:
+          for question_id, weight in entries.items():
+            scores[question_id] += weight * idf
+      else:
+        scores = {
+          question_id: score + sum(entries[question_id] * idf for entries, idf in weighted if question_id in entries)
+          for question_id, score in scores.items()
+          if any(question_id in entries for entries, _ in weighted)
+        }
+      if not scores:
+        break
+
+    return dict(scores)
+
+'''
+QuestionSearch
+    search over the question and answer text of the questions, with
+    relevance ranking, pagination and category facets
+'''
+class QuestionSearch:
+  def __init__(self, db, model, max_age=60):
+    self.db = db
+    self.model = model
+    self.max_age = max_age
+    self.index = None
+    self.loaded_at = 0
+    self.lock = threading.Lock()
+
+  def search(self, term, page=1, per_page=10, category=None):
+    '''
+    returns the number of matches, the formatted questions of the page best
+    match first (by id for an empty term) and {category id: matches}. the
+    facets ignore the `category` filter, the total and the page follow it.
+    '''
+    connection = self.db.session.connection()
+    offset = (max(page, 1) - 1) * per_page
+
+    if connection.dialect.name == 'postgresql':
+      return self.search_postgres(connection, term, offset, per_page, category)
+    return self.search_tokens(term, offset, per_page, category)
+
+  def install(self):
+    '''
+    adds the search index to the table DDL on PostgreSQL
+    '''
+    event.listen(self.model.__table__, 'after_create', DDL(POSTGRES_INDEX).execute_if(dialect='postgresql'))
+
+  def search_postgres(self, connection, term, offset, per_page, category):
+    tokens = tokenize(term)
+    params = {
+      'category': category,
+      'limit': per_page,
+      'offset': offset,
+      'query': ' & '.join(token + ':*' for token in tokens)
+    }
+    statement = POSTGRES_SEARCH.format(**(POSTGRES_MATCH if tokens else POSTGRES_ALL))
+    row = connection.execute(text(statement), params).first()
+
+    facets = {int(category_id): matches for category_id, matches in row.facets.items()}
+    return row.total, row.questions, facets
+
+  def search_tokens(self, term, offset, per_page, category):
+    index = self.load()
+    with self.lock:
+      scores = index.search(term)
+      if scores is None:
+        scores = dict.fromkeys(index.categories, 0)
+      categories = {question_id: index.categories[question_id] for question_id in scores}
+
+    facets = defaultdict(int)
+    for category_id in categories.values():
+      if category_id is not None:
+        facets[category_id] += 1
+
+    if category is not None:
+      scores = {question_id: score for question_id, score in scores.items() if categories[question_id] == category}
+
+    # only the pages up to the requested one need ordering
+    key = lambda question_id: (-scores[question_id], question_id)
+    page = heapq.nsmallest(offset + per_page, scores, key=key)[offset:]
+
+    questions = {}
+    if page:
+      questions = {question.id: question for question in self.model.query.filter(self.model.id.in_(page))}
+    return len(scores), [questions[question_id].format() for question_id in page if question_id in questions], dict(facets)
+
+  # Token index...
+
+  def load(self):
+    with self.lock:
+      if self.index is not None and time.monotonic() - self.loaded_at < self.max_age:
+        return self.index
+
+    model = self.model
+    index = TokenIndex()
+    for row in self.db.session.query(model.id, model.question, model.answer, model.category):
+      index.add(*row)
+
+    with self.lock:
+      self.index = index
+      self.loaded_at = time.monotonic()
+    return index
+
+  def add(self, question):
+    with self.lock:
+      if self.index is not None:
+        self.index.add(question.id, question.question, question.answer, question.category)
+
+  def discard(self, question_id):
+    with self.lock:
+      if self.index is not None:
+        self.index.discard(question_id)
+
+  def reset(self):
+    with self.lock:
+      self.index = None
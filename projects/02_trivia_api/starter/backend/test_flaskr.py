@@ -1,22 +1,33 @@
 import os
 import unittest
 import json
-from flask_sqlalchemy import SQLAlchemy
+import random
+from sqlalchemy import event
 
-from flaskr import create_app
-from models import setup_db, Question, Category
+from models import db, Question, Category, QuestionSampler, ChangeCounter, RowCount, category_map
+from quiz_sessions import IdSet, QuizSession, QuizSessions, MemoryStore
+from search import TokenIndex
+from flaskr import BULK_BATCH
+from testing import database
+
+
+def tearDownModule():
+    database.stop()
 
 
 class TriviaTestCase(unittest.TestCase):
     """This class represents the trivia test case"""
 
+    @classmethod
+    def setUpClass(cls):
+        """Create the app and the test database, once per process."""
+        database.start()
+
     def setUp(self):
-        """Define test variables and initialize app."""
-        self.app = create_app()
+        """Define test variables and start the transaction of the test."""
+        self.app = database.app
         self.client = self.app.test_client
-        self.database_name = "trivia_test"
-        self.database_path = "postgres://{}/{}".format('localhost:5432', self.database_name)
-        setup_db(self.app, self.database_path)
+        database.begin()
 
         self.new_question = {
             'question': 'what is my name?',
@@ -25,16 +36,9 @@ class TriviaTestCase(unittest.TestCase):
             'difficulty': 2
         }
 
-        # binds the app to the current context
-        with self.app.app_context():
-            self.db = SQLAlchemy()
-            self.db.init_app(self.app)
-            # create all tables
-            self.db.create_all()
-    
     def tearDown(self):
-        """Executed after reach test"""
-        pass
+        """Executed after reach test, rolls back what it wrote"""
+        database.rollback()
 
     def test_get_paginated_categories(self):
         res = self.client().get('/api/categories')
@@ -72,6 +76,63 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['questions'], [])
         self.assertTrue(data['total_questions'])
 
+    def test_get_questions_after_id(self):
+        res = self.client().get('/api/questions?after_id=10')
+        data = json.loads(res.data)
+        ids = [question['id'] for question in data['questions']]
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(data['total_questions'])
+        self.assertTrue(len(ids) <= 10)
+        self.assertEqual(ids, sorted(ids))
+        self.assertTrue(all(question_id > 10 for question_id in ids))
+
+    def test_pages_by_offset_and_by_keyset_match(self):
+        first = json.loads(self.client().get('/api/questions?page=1').data)
+        second = json.loads(self.client().get('/api/questions?page=2').data)
+        last_id = first['questions'][-1]['id']
+        after = json.loads(self.client().get('/api/questions?after_id={}'.format(last_id)).data)
+
+        self.assertEqual(second['questions'], after['questions'])
+        self.assertEqual(second['total_questions'], first['total_questions'])
+
+    def test_listings_revalidate_with_etag(self):
+        res = self.client().get('/api/questions')
+        etag = res.headers['ETag']
+        # the writes of other processes show up within max_age, the tag is weak
+        self.assertTrue(etag.startswith('W/"'))
+
+        res = self.client().get('/api/questions', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
+        created = json.loads(self.client().post('/api/questions', json=self.new_question).data)
+        res = self.client().get('/api/questions', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
+        self.client().delete('/api/questions/{}'.format(created['created']))
+
+    def test_count_running_during_a_write_is_not_kept(self):
+        count = RowCount(Question.id)
+
+        def write_while_counting(*args):
+            count.add(1)
+
+        with self.app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', write_while_counting)
+            try:
+                total = count.get()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', write_while_counting)
+
+            # the count may or may not hold the write, the next get counts again
+            self.assertIsNone(count.value)
+            self.assertEqual(count.get(), total)
+            count.add(1)
+            self.assertEqual(count.get(), total + 1)
+
     def test_delete_question(self):
         res = self.client().delete('/api/questions/5')
         data = json.loads(res.data)
@@ -79,8 +140,9 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
         self.assertEqual(data['deleted'], 5)
+        self.assertEqual(data['question']['id'], 5)
         self.assertTrue(data['total_questions'])
-        self.assertTrue(len(data['questions']))
+        self.assertNotIn('questions', data)
 
     def test_404_if_question_does_not_exist(self):
         res = self.client().delete('/api/questions/1000')
@@ -96,9 +158,105 @@ class TriviaTestCase(unittest.TestCase):
 
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
+        self.assertTrue(data['created'])
+        self.assertEqual(data['question']['answer'], self.new_question['answer'])
         self.assertTrue(data['total_questions'])
+        self.assertNotIn('questions', data)
+
+    def test_create_new_question_with_page(self):
+        res = self.client().post('/api/questions?include_page=1', json=self.new_question)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
         self.assertTrue(len(data['questions']))
 
+    def test_total_questions_follows_create_and_delete(self):
+        total = json.loads(self.client().get('/api/questions').data)['total_questions']
+
+        created = json.loads(self.client().post('/api/questions', json=self.new_question).data)
+        self.assertEqual(created['total_questions'], total + 1)
+
+        deleted = json.loads(self.client().delete('/api/questions/{}'.format(created['created'])).data)
+        self.assertEqual(deleted['total_questions'], total)
+        self.assertEqual(json.loads(self.client().get('/api/questions').data)['total_questions'], total)
+
+    def test_create_new_question_with_unknown_category(self):
+        res = self.client().post('/api/questions', json=dict(self.new_question, category=1000))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data['success'], False)
+
+    def test_categories_follow_committed_changes(self):
+        version = category_map.version
+        self.client().get('/api/categories')
+
+        with self.app.app_context():
+            category = Category('Music')
+            db.session.add(category)
+            db.session.commit()
+            category_id = category.id
+
+            res = self.client().get('/api/categories?after_id={}'.format(category_id - 1))
+            data = json.loads(res.data)
+
+            self.assertGreater(category_map.version, version)
+            self.assertEqual(data['categories'], [{'id': category_id, 'type': 'Music'}])
+
+            db.session.delete(category)
+            db.session.commit()
+
+    def test_bulk_import_and_export(self):
+        lines = [
+            json.dumps(dict(self.new_question, question='bulk question 1')),
+            '{"question": "broken"',
+            json.dumps(dict(self.new_question, question='bulk question 2', category=1000)),
+            json.dumps(dict(self.new_question, question='bulk question 3'))
+        ]
+        res = self.client().post('/api/questions/bulk', data='\n'.join(lines), content_type='application/x-ndjson')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['imported'], 2)
+        self.assertEqual([rejected['line'] for rejected in data['rejected']], [2, 3])
+        self.assertEqual(data['total_rejected'], 2)
+
+        res = self.client().get('/api/questions/export?category=5')
+        exported = [json.loads(line) for line in res.data.decode().splitlines()]
+
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        self.assertEqual([question['question'] for question in exported[-2:]], ['bulk question 1', 'bulk question 3'])
+        for question in exported[-2:]:
+            self.client().delete('/api/questions/{}'.format(question['id']))
+
+    def test_bulk_import_rejects_non_integer_categories_and_difficulties(self):
+        lines = [
+            json.dumps(dict(self.new_question, category=5.0)),
+            json.dumps(dict(self.new_question, category=True)),
+            json.dumps(dict(self.new_question, difficulty=2.5)),
+            json.dumps(dict(self.new_question, difficulty='2'))
+        ]
+        data = self.client().post('/api/questions/bulk', data='\n'.join(lines)).get_json()
+
+        self.assertEqual(data['imported'], 0)
+        self.assertEqual([rejected['line'] for rejected in data['rejected']], [1, 2, 3, 4])
+
+    def test_bulk_import_failure_reports_what_was_imported(self):
+        # the first transaction goes through, the second cannot be written
+        lines = [json.dumps(dict(self.new_question, question='bulk question {}'.format(n))) for n in range(BULK_BATCH)]
+        lines.append(json.dumps(dict(self.new_question, difficulty=2 ** 70)))
+        total = json.loads(self.client().get('/api/questions').data)['total_questions']
+        res = self.client().post('/api/questions/bulk', data='\n'.join(lines))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['imported'], BULK_BATCH)
+        self.assertEqual(data['line'], BULK_BATCH + 1)
+        self.assertEqual(json.loads(self.client().get('/api/questions').data)['total_questions'], total + BULK_BATCH)
+
     def test_create_new_question_fail(self):
         res = self.client().post('/api/questions')
         data = json.loads(res.data)
@@ -117,6 +275,15 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['total_questions'])
         self.assertTrue(len(data['questions']))
 
+    def test_question_search_matches_word_prefixes_only(self):
+        # 'Whose autobiography is entitled ...' has 'title' inside a word only
+        prefix = self.client().post('/api/questions/search', json={'searchTerm': 'TIT'}).get_json()
+        inside = self.client().post('/api/questions/search', json={'searchTerm': 'itle'}).get_json()
+
+        self.assertTrue(all('title' in question['question'].lower().split() for question in prefix['questions']))
+        self.assertTrue(prefix['total_questions'])
+        self.assertEqual(inside['total_questions'], 0)
+
     def test_get_question_search_without_results(self):
         res = self.client().post('/api/questions/search', json={'search': ''})
         data = json.loads(res.data)
@@ -126,6 +293,16 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['total_questions'])
         self.assertTrue(len(data['questions']))
 
+    def test_question_search_with_category_and_facets(self):
+        res = self.client().post('/api/questions/search', json={'searchTerm': 'title', 'category': 4})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(all(question['category'] == 4 for question in data['questions']))
+        # the facets count the matches of every category
+        self.assertTrue(sum(facet['count'] for facet in data['facets']) >= data['total_questions'])
+
     def test_get_paginated_questions_with_categories(self):
         res = self.client().get('/api/categories/1/questions')
         data = json.loads(res.data)
@@ -163,6 +340,33 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['question'])
         self.assertTrue(data['previousQuestions'])
 
+    def test_quiz_session_never_repeats_a_question(self):
+        res = self.client().post('/api/quizzes/sessions', json={'quiz_category': {'id': 3}})
+        session_id = json.loads(res.data)['session_id']
+
+        asked = []
+        while True:
+            data = json.loads(self.client().post('/api/quizzes/sessions/{}'.format(session_id)).data)
+            if not data['foundQuestion']:
+                break
+            self.assertEqual(data['question']['category'], 3)
+            asked.append(data['question']['id'])
+
+        self.assertTrue(len(asked))
+        self.assertEqual(len(asked), len(set(asked)))
+        self.assertEqual(data['totalPlayed'], len(asked))
+
+    def test_404_if_quiz_session_does_not_exist(self):
+        session_id = json.loads(self.client().post('/api/quizzes/sessions').data)['session_id']
+        res = self.client().delete('/api/quizzes/sessions/{}'.format(session_id))
+
+        self.assertEqual(res.status_code, 200)
+        res = self.client().post('/api/quizzes/sessions/{}'.format(session_id))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+
     def test_get_quizzes_search_with_no_results(self):
         res = self.client().post('/api/quizzes')
         data = json.loads(res.data)
@@ -172,6 +376,160 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['message'])
         self.assertTrue(data['error'])
 
+class QuestionSamplerTestCase(unittest.TestCase):
+    """This class represents the quiz question sampler test case"""
+
+    def setUp(self):
+        self.sampler = QuestionSampler(rand=random.Random(1234))
+        # ids 1..60 in categories 1..3
+        self.sampler.fill([(question_id, question_id % 3 + 1) for question_id in range(1, 61)])
+
+    def chi_square(self, draws, ids):
+        expected = len(draws) / len(ids)
+        return sum((draws.count(question_id) - expected) ** 2 / expected for question_id in ids)
+
+    def test_sample_is_uniform_over_eligible_questions(self):
+        exclude = [3, 6, 9, 12]
+        eligible = [question_id for question_id in range(1, 61) if question_id % 3 + 1 == 1 and question_id not in exclude]
+        draws = [self.sampler.sample(1, exclude) for _ in range(20000)]
+
+        self.assertEqual(set(draws), set(eligible))
+        # 15 degrees of freedom, critical value at p = 0.001
+        self.assertLess(self.chi_square(draws, eligible), 37.70)
+
+    def test_sample_is_uniform_when_most_questions_are_excluded(self):
+        eligible = [5, 17, 44]
+        exclude = [question_id for question_id in range(1, 61) if question_id not in eligible]
+        draws = [self.sampler.sample(None, exclude) for _ in range(6000)]
+
+        self.assertEqual(set(draws), set(eligible))
+        # 2 degrees of freedom, critical value at p = 0.001
+        self.assertLess(self.chi_square(draws, eligible), 13.82)
+
+    def test_sample_follows_inserts_and_deletes(self):
+        self.sampler.discard(1)
+        self.sampler.add(61, 4)
+
+        self.assertNotIn(1, [self.sampler.sample(2) for _ in range(500)])
+        self.assertEqual(self.sampler.sample(4), 61)
+        self.assertIsNone(self.sampler.sample(4, [61]))
+        self.assertIsNone(self.sampler.sample(1000))
+
+    def test_added_categories_are_coerced_to_ids(self):
+        self.sampler.add(61, '4')
+
+        self.assertEqual(self.sampler.sample(4), 61)
+        self.assertNotIn('4', self.sampler.ids)
+
+    def test_questions_without_category_are_drawn_once(self):
+        self.sampler.fill([(1, None), (2, 1), (3, 1)])
+        self.sampler.add(4, None)
+        draws = [self.sampler.sample() for _ in range(8000)]
+
+        self.assertEqual(sorted(self.sampler.ids[None]), [1, 2, 3, 4])
+        # 3 degrees of freedom, critical value at p = 0.001
+        self.assertLess(self.chi_square(draws, [1, 2, 3, 4]), 16.27)
+
+class ChangeCounterTestCase(unittest.TestCase):
+    """This class represents the table change counter test case"""
+
+    def test_tag_moves_with_writes(self):
+        counter = ChangeCounter()
+        tag = counter.tag()
+
+        self.assertEqual(counter.tag(), tag)
+        counter.bump()
+        self.assertNotEqual(counter.tag(), tag)
+
+    def test_processes_do_not_share_tags(self):
+        self.assertNotEqual(ChangeCounter().tag(), ChangeCounter().tag())
+
+class QuizSessionsTestCase(unittest.TestCase):
+    """This class represents the quiz session store test case"""
+
+    def test_id_set(self):
+        used = IdSet()
+        for question_id in (8, 0, 1000000, 7, 8):
+            used.add(question_id)
+
+        self.assertEqual(len(used), 4)
+        self.assertIn(1000000, used)
+        self.assertNotIn(9, used)
+        self.assertNotIn(-1, used)
+        self.assertEqual(list(IdSet(bytes(used))), [0, 7, 8, 1000000])
+        # the size follows the ids asked, not their values
+        self.assertEqual(len(bytes(used)), 6)
+
+    def test_id_set_is_capped(self):
+        used = IdSet(limit=2)
+        used.add(1)
+        used.add(2)
+        used.add(2)
+
+        self.assertTrue(used.full)
+        with self.assertRaises(ValueError):
+            used.add(3)
+        with self.assertRaises(ValueError):
+            IdSet(bytes(IdSet(bytes([1, 1, 1]))), limit=2)
+        with self.assertRaises(ValueError):
+            IdSet(b'\x80')
+
+    def test_session_round_trips_through_dumps(self):
+        session = QuizSession('abc', 2)
+        session.used.add(42)
+        loaded = QuizSession.loads(session.dumps())
+
+        self.assertEqual((loaded.id, loaded.category_id, list(loaded.used)), ('abc', 2, [42]))
+
+    def test_sessions_expire(self):
+        sessions = QuizSessions(MemoryStore(ttl=0))
+        session = sessions.start()
+
+        self.assertIsNone(sessions.get(session.id))
+
+    def test_least_recently_used_sessions_are_evicted(self):
+        store = MemoryStore(max_sessions=2)
+        sessions = QuizSessions(store)
+        first, second = sessions.start(), sessions.start()
+        sessions.get(first.id)
+        sessions.start()
+
+        self.assertEqual(len(store), 2)
+        self.assertIsNotNone(sessions.get(first.id))
+        self.assertIsNone(sessions.get(second.id))
+
+class TokenIndexTestCase(unittest.TestCase):
+    """This class represents the in-process question search index test case"""
+
+    def setUp(self):
+        self.index = TokenIndex()
+        self.index.add(1, 'Whose autobiography is entitled I Know Why the Caged Bird Sings?', 'Maya Angelou', 4)
+        self.index.add(2, 'What movie earned Tom Hanks his third straight Oscar nomination, in 1996?', 'Apollo 13', 5)
+        self.index.add(3, 'What was the title of the 1990 fantasy directed by Tim Burton?', 'Edward Scissorhands', 5)
+        self.index.add(4, 'Which Dutch graphic artist was a creator of optical illusions?', 'Escher', 2)
+
+    def test_every_token_must_match_as_a_prefix(self):
+        self.assertEqual(set(self.index.search('th')), {1, 2, 3})
+        # 'entitled' does not start with 'tit'
+        self.assertEqual(set(self.index.search('tit')), {3})
+        self.assertEqual(set(self.index.search('title burton')), {3})
+        self.assertEqual(self.index.search('title oscar'), {})
+        self.assertIsNone(self.index.search('  ?'))
+
+    def test_question_matches_rank_above_answer_matches(self):
+        self.index.add(5, 'Who wrote about Escher?', 'Hofstadter', 2)
+        scores = self.index.search('escher')
+
+        self.assertGreater(scores[5], scores[4])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.index.add(3, 'What was the name of the 1990 fantasy directed by Tim Burton?', 'Edward Scissorhands', 5)
+        self.index.discard(1)
+
+        self.assertEqual(self.index.search('title'), {})
+        self.assertEqual(self.index.expand('tit'), [])
+        self.assertEqual(set(self.index.categories), {2, 3, 4})
+
 # Make the tests conveniently executable
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,183 @@
+#----------------------------------------------------------------------------#
+# Test database.
+#
+# One app and one database per test process. The tables are created and
+# seeded with the rows of trivia.psql once, then every test runs in a
+# transaction that is rolled back when it ends, so tests never see each
+# other's writes and nothing has to be cleaned up.
+#
+# TEST_DATABASE_URL picks the database: sqlite:// (the default) runs the suite
+# in memory without any server, PostgreSQL (e.g.
+# postgres://localhost:5432/trivia_test, with psycopg2 from requirements.txt)
+# gives every process a schema of its own, so that parallel workers (pytest
+# -n) share the database without sharing tables.
+#----------------------------------------------------------------------------#
+
+import os
+import re
+from sqlalchemy import create_engine, event, text
+
+from flaskr import create_app
+from models import db, Question, Category, reset_caches
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trivia.psql')
+
+COPY = re.compile(r'COPY public\.(\w+) \(([^)]*)\) FROM stdin;')
+
+def read_fixtures(path=FIXTURES):
+  '''
+  returns {table name: [row dicts]} of the COPY blocks of a pg_dump file
+  '''
+  tables = {}
+  rows = None
+  with open(path) as dump:
+    for line in dump:
+      line = line.rstrip('\n')
+      if rows is None:
+        match = COPY.match(line)
+        if match:
+          columns = [column.strip() for column in match.group(2).split(',')]
+          rows = tables.setdefault(match.group(1), [])
+      elif line == '\\.':
+        rows = None
+      else:
+        values = [None if value == '\\N' else value for value in line.split('\t')]
+        rows.append(dict(zip(columns, values)))
+  return tables
+
+class TestDatabase(object):
+  '''
+  start() once per process, then begin() and rollback() around every test
+  '''
+  def __init__(self, url=TEST_DATABASE_URL):
+    self.url = url
+    self.app = None
+    self.schema = None
+    self.connection = None
+    self.transaction = None
+    self.savepoint = None
+
+  @property
+  def is_postgres(self):
+    return self.url.startswith('postgres')
+
+  def start(self):
+    '''
+    creates the app, the tables and the fixture rows, does nothing when started
+    '''
+    if self.app is not None:
+      return
+
+    config = {'TESTING': True, 'SQLALCHEMY_DATABASE_URI': self.url}
+    if self.is_postgres:
+      # one schema per pytest-xdist worker, or per process without xdist
+      self.schema = 'test_{}'.format(os.environ.get('PYTEST_XDIST_WORKER', os.getpid()))
+      self.execute(
+        'DROP SCHEMA IF EXISTS {0} CASCADE'.format(self.schema),
+        'CREATE SCHEMA {0}'.format(self.schema)
+      )
+      config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'connect_args': {'options': '-csearch_path={},public'.format(self.schema)}
+      }
+    else:
+      # pysqlite opens transactions of its own, only before writes: without
+      # one the first SAVEPOINT would be the transaction and releasing it a
+      # commit. SQLAlchemy emits every BEGIN instead, see begin_sqlite
+      config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'isolation_level': None}}
+
+    self.app = create_app(config)
+    with self.app.app_context():
+      if not self.is_postgres:
+        event.listen(db.engine, 'begin', self.begin_sqlite)
+      self.seed()
+      # the connection every test transaction runs on, the sessions of the
+      # app are bound to it for the life of the process
+      db.session.remove()
+      self.connection = db.engine.connect()
+    db.session.session_factory.configure(bind=self.connection, binds={})
+    event.listen(db.session, 'after_commit', self.move_savepoint)
+    event.listen(db.session, 'after_transaction_end', self.restart_savepoint)
+
+  def seed(self):
+    connection = db.session.connection()
+    fixtures = read_fixtures()
+    for model in (Category, Question):
+      table = model.__table__
+      rows = [
+        {column: table.c[column].type.python_type(value) if value is not None else None for column, value in row.items()}
+        for row in fixtures[table.name]
+      ]
+      connection.execute(table.insert(), rows)
+      if self.is_postgres:
+        # the ids were given, the sequence has to follow them
+        connection.execute(text("SELECT setval(pg_get_serial_sequence('{0}', 'id'), max(id)) FROM {0}".format(table.name)))
+
+    db.session.commit()
+    reset_caches()
+
+  @staticmethod
+  def begin_sqlite(connection):
+    connection.execute(text('BEGIN'))
+
+  def stop(self):
+    if self.app is None:
+      return
+    with self.app.app_context():
+      db.session.remove()
+      for option in ('bind', 'binds'):
+        db.session.session_factory.kw.pop(option, None)
+      self.connection.close()
+      self.connection = None
+      db.engine.dispose()
+    if self.schema is not None:
+      self.execute('DROP SCHEMA IF EXISTS {0} CASCADE'.format(self.schema))
+    self.app = None
+
+  def execute(self, *statements):
+    # outside the app, for the schema itself
+    engine = create_engine(self.url)
+    with engine.begin() as connection:
+      for statement in statements:
+        connection.execute(text(statement))
+    engine.dispose()
+
+  # Tests...
+
+  def begin(self):
+    '''
+    starts the transaction of a test and a SAVEPOINT in it. the sessions of
+    the app join it: their commits move the SAVEPOINT forward and stay in the
+    transaction, their rollbacks go back to the last commit.
+    '''
+    self.transaction = self.connection.begin()
+    self.savepoint = self.connection.begin_nested()
+
+  def move_savepoint(self, session):
+    if self.savepoint is not None and self.savepoint.is_active:
+      self.savepoint.commit()
+      self.savepoint = self.connection.begin_nested()
+
+  def restart_savepoint(self, session, transaction):
+    if self.savepoint is not None and not self.savepoint.is_active and transaction.parent is None:
+      self.savepoint = self.connection.begin_nested()
+
+  def rollback(self):
+    '''
+    ends the transaction of a test, with everything it wrote
+    '''
+    # the sessions left open are bound to the test connection, closing them
+    # returns nothing to the pool
+    with self.app.app_context():
+      db.session.remove()
+
+    # innermost first: rolling back the transaction over an open SAVEPOINT
+    # leaves it the reset agent of the pooled connection
+    if self.savepoint.is_active:
+      self.savepoint.rollback()
+    self.transaction.rollback()
+    self.transaction = self.savepoint = None
+    # the caches may hold rows that were rolled back
+    reset_caches()
+
+database = TestDatabase()
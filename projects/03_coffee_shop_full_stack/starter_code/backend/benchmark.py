@@ -0,0 +1,214 @@
+'''
+Coffee shop benchmarks
+
+Measures the auth overhead of a request offline: an RSA key is generated
+locally, served as a JWKS by a stub server on a local port (with an
+optional delay standing in for the identity provider), and tokens are
+signed with it.
+
+  python benchmark.py auth --latency 0 50
+  python benchmark.py permissions --permissions 10 1000
+
+The drink benchmarks seed a throwaway in-memory SQLite database, point
+DATABASE_URL at another database to benchmark there.
+
+  python benchmark.py drinks --drinks 1000 100000
+'''
+
+import os
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import argparse
+import json
+import time
+from urllib.request import urlopen
+
+from flask import Flask, jsonify
+from jose import jwt
+from sqlalchemy import Text, cast
+
+from src.auth import auth
+from jwtauth import KeyStore, Principal, TokenCache, url_key_source
+from src.auth.auth import AuthError, requires_auth
+from src.auth.testing import JWKSServer, generate_key, make_token
+from src.database.models import db, Drink, short_recipe
+
+SEED_BATCH = 10000
+
+## Helpers
+
+'''
+fetch_verify_decode_jwt(url, token)
+    verify_decode_jwt as it was: the key set fetched for every token and
+    scanned for its kid
+'''
+def fetch_verify_decode_jwt(url, token):
+    jwks = json.loads(urlopen(url).read())
+    kid = jwt.get_unverified_header(token)['kid']
+    rsa_key = next(key for key in jwks['keys'] if key['kid'] == kid)
+    return jwt.decode(token, rsa_key, algorithms=auth.ALGORITHMS, audience=auth.API_AUDIENCE,
+                      issuer='https://' + auth.AUTH0_DOMAIN + '/')
+
+def measure_call(fn, repeat=200):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        'best_ms': timings[0] * 1000,
+        'median_ms': timings[len(timings) // 2] * 1000
+    }
+
+def report(name, setting, result):
+    print('{:<24} {:>10} {:>12.3f} {:>12.3f}'.format(name, setting, result['best_ms'], result['median_ms']))
+
+def seed_drinks(count):
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    for start in range(0, count, SEED_BATCH):
+        rows = []
+        for n in range(start + 1, min(start + SEED_BATCH, count) + 1):
+            recipe = [
+                {'name': 'Espresso', 'color': 'brown', 'parts': n % 3 + 1},
+                {'name': 'Milk', 'color': 'white', 'parts': n % 2 + 1},
+                {'name': 'Foam %d' % n, 'color': 'beige', 'parts': 1}
+            ]
+            rows.append({'id': n, 'title': 'Drink %d' % n, 'recipe': recipe, 'recipe_short': json.dumps(short_recipe(recipe))})
+        db.session.execute(Drink.__table__.insert(), rows)
+    db.session.commit()
+
+def use_key_store(store):
+    auth.token_auth.key_store.stop()
+    auth.token_auth.key_store = store
+
+def use_token_cache(cache):
+    auth.token_auth.token_cache = cache
+
+## Benchmarks
+
+'''
+bench_auth(args)
+    verifying a token with the key set fetched per token, as before, from
+    the key store, and from the verified-token cache, alone and as the auth
+    of a request
+'''
+def bench_auth(args):
+    private_key, jwk = generate_key('benchmark')
+    token = make_token(private_key, 'benchmark', ['get:drinks-detail'])
+
+    app = Flask(__name__)
+
+    @app.route('/protected')
+    @requires_auth('get:drinks-detail')
+    def protected():
+        return jsonify({'success': True})
+
+    @app.errorhandler(AuthError)
+    def auth_error(error):
+        return jsonify({'success': False}), error.status_code
+
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer ' + token}
+
+    for latency in args.latency:
+        setting = '%dms' % latency
+        with JWKSServer({'keys': [jwk]}, latency / 1000.0) as server:
+            repeat = args.repeat if latency == 0 else max(args.repeat // 10, 10)
+            report('decode-fetch', setting, measure_call(lambda: fetch_verify_decode_jwt(server.url, token), repeat))
+
+            use_key_store(KeyStore(url_key_source(server.url)))
+            use_token_cache(TokenCache(max_size=0))
+            auth.verify_decode_jwt(token)
+            report('decode-key-store', setting, measure_call(lambda: auth.verify_decode_jwt(token), args.repeat))
+
+            def request():
+                assert client.get('/protected', headers=headers).status_code == 200
+            report('request-key-store', setting, measure_call(request, args.repeat))
+
+            use_token_cache(TokenCache())
+            report('decode-token-cache', setting, measure_call(lambda: auth.verify_decode_jwt(token), args.repeat))
+            report('request-token-cache', setting, measure_call(request, args.repeat))
+            auth.token_auth.key_store.stop()
+
+'''
+bench_permissions(args)
+    checking the permissions of a view against the permissions list of the
+    payload, as before, and against the principal of the token
+'''
+def bench_permissions(args):
+    required = ['get:drinks-detail', 'patch:drinks', 'delete:drinks']
+    for count in args.permissions:
+        permissions = ['get:resource-%d' % n for n in range(count)] + required
+        payload = {'sub': 'auth0|benchmark', 'permissions': permissions}
+        principal = Principal.from_payload(payload)
+
+        def check_list():
+            for permission in required:
+                assert permission in payload['permissions']
+
+        def check_principal():
+            assert principal.has_all(required)
+
+        report('permissions-list', count, measure_call(check_list, args.repeat))
+        report('permissions-principal', count, measure_call(check_principal, args.repeat))
+        report('permissions-expand', count, measure_call(lambda: Principal.from_payload(payload), args.repeat))
+
+'''
+bench_drinks(args)
+    listing the drinks as before, the recipe text of every drink parsed and
+    the response serialized, as the model objects of the JSON column, and
+    from the stored JSON text of the recipes
+'''
+def bench_drinks(args):
+    from src.api import app
+
+    client = app.test_client()
+    with app.app_context():
+        for count in args.drinks:
+            seed_drinks(count)
+            repeat = max(min(args.repeat, 1000000 // count), 3)
+
+            def parse_short():
+                rows = db.session.query(Drink.id, Drink.title, cast(Drink.recipe, Text)).order_by(Drink.id)
+                drinks = [{'id': id, 'title': title, 'recipe': short_recipe(json.loads(recipe))} for id, title, recipe in rows]
+                return json.dumps({'success': True, 'drinks': drinks})
+
+            def objects_short():
+                return json.dumps({'success': True, 'drinks': [drink.short() for drink in Drink.query.order_by(Drink.id)]})
+
+            def get_drinks():
+                assert client.get('/api/drinks').status_code == 200
+
+            report('drinks-parse-short', count, measure_call(parse_short, repeat))
+            report('drinks-objects-short', count, measure_call(objects_short, repeat))
+            report('drinks-short-json', count, measure_call(Drink.short_json, repeat))
+            report('drinks-long-json', count, measure_call(Drink.long_json, repeat))
+            report('request-drinks', count, measure_call(get_drinks, repeat))
+
+BENCHMARKS = {
+    'auth': bench_auth,
+    'drinks': bench_drinks,
+    'permissions': bench_permissions,
+}
+
+## Launch
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Coffee shop benchmarks')
+    parser.add_argument('benchmarks', nargs='*', help=', '.join(sorted(BENCHMARKS)))
+    parser.add_argument('--latency', nargs='+', type=int, default=[0, 50], help='delay of the stub identity provider, in ms')
+    parser.add_argument('--permissions', nargs='+', type=int, default=[10, 1000], help='permissions in the token')
+    parser.add_argument('--drinks', nargs='+', type=int, default=[1000, 100000], help='drinks in the database')
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error('unknown benchmarks: ' + ', '.join(sorted(unknown)))
+
+    print('{:<24} {:>10} {:>12} {:>12}'.format('benchmark', 'setting', 'best (ms)', 'median (ms)'))
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        BENCHMARKS[name](args)
@@ -6,7 +6,7 @@ from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from .database.models import db, db_drop_and_create_all, setup_db, Drink
 from .auth.auth import AuthError, requires_auth
 
 # ------------------------------------- Init ------------------------------------------------
@@ -36,6 +36,14 @@ uncomment the following line to initialize the datbase
 
 # ------------------------------------- Helpers --------------------------------------------------
 
+'''
+drinks_response(drinks_json)
+    the {"success": True, "drinks": drinks} response of a JSON array of
+    drinks that is already text
+'''
+def drinks_response(drinks_json):
+    return app.response_class('{"drinks": ' + drinks_json + ', "success": true}\n', mimetype='application/json')
+
 # ------------------------------------- Routes ------------------------------------------------
 
 ## ROUTES
@@ -50,17 +58,7 @@ The endpoint
 @app.route('/api/drinks')
 def get_drinks():
 
-    all_drinks = Drink.query.order_by(Drink.id).all()
-
-    # if len(all_drinks) == 0:
-    #     abort(404)
-
-    drinks = [drink.short() for drink in all_drinks]
-
-    return jsonify({
-        'success': True,
-        'drinks': drinks,
-    }), 200
+    return drinks_response(Drink.short_json()), 200
 
 '''
 The endpoint
@@ -74,17 +72,7 @@ The endpoint
 @requires_auth('get:drinks-detail')
 def get_drinks_details():
 
-    all_drinks = Drink.query.all()
-
-    # if len(all_drinks) == 0:
-    #     abort(404)
-
-    drinks = [drink.long() for drink in all_drinks]
-
-    return jsonify({
-        'success': True,
-        'drinks': drinks,
-    }), 200
+    return drinks_response(Drink.long_json()), 200
 
 '''
 The endpoint
@@ -106,10 +94,12 @@ def create_drink():
     if body is None or new_title is None or new_recipe is None:
         abort(400)
 
-    new_recipe = json.dumps(new_recipe)
-
     drink = Drink(title=new_title, recipe=new_recipe)
-    drink.insert()
+    try:
+        drink.insert()
+    except (KeyError, TypeError):
+        db.session.rollback()
+        abort(422)
     new_drink = [drink.long()]
 
     return jsonify({
@@ -148,9 +138,13 @@ def update_drink(drink_id):
         drink.title = new_title
 
     if new_recipe is not None:
-        drink.recipe = json.dumps(new_recipe)
+        drink.recipe = new_recipe
 
-    drink.update()
+    try:
+        drink.update()
+    except (KeyError, TypeError):
+        db.session.rollback()
+        abort(422)
 
     new_drink = [drink.long()]
 
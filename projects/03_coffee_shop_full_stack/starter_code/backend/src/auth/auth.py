@@ -1,181 +1,54 @@
-import json
-from flask import request, _request_ctx_stack
-from functools import wraps
-from jose import jwt
-from urllib.request import urlopen
+import os
+from jwtauth import AuthError, TokenAuth, file_key_source, url_key_source
 
 
 AUTH0_DOMAIN = 'khogaeslam.eu.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'cofee_shop'
 
-## AuthError Exception
-'''
-AuthError Exception
-A standardized way to communicate auth failure modes
-'''
-class AuthError(Exception):
-    def __init__(self, error, status_code):
-        self.error = error
-        self.status_code = status_code
-
+# the signing keys come from JWKS_FILE when set (offline), from JWKS_URL otherwise
+JWKS_URL = os.environ.get('JWKS_URL', 'https://' + AUTH0_DOMAIN + '/.well-known/jwks.json')
+JWKS_FILE = os.environ.get('JWKS_FILE', None)
+
+# the roles of a user come in a namespaced claim (added by an Auth0 rule or
+# action), each one grants the permissions listed here
+ROLES_CLAIM = os.environ.get('ROLES_CLAIM', 'https://' + AUTH0_DOMAIN + '/roles')
+ROLES = {
+    'barista': ['get:drinks-detail'],
+    'manager': ['*'],
+}
+
+'''
+token_auth
+    the auth of the coffee shop API, from the shared jwtauth package: the
+    signing keys are kept in its key_store and refreshed in the background,
+    verified tokens are kept in its token_cache until they expire
+'''
+token_auth = TokenAuth(
+    AUTH0_DOMAIN,
+    API_AUDIENCE,
+    ALGORITHMS,
+    key_source=file_key_source(JWKS_FILE) if JWKS_FILE else url_key_source(JWKS_URL),
+    roles=ROLES,
+    roles_claim=ROLES_CLAIM
+)
 
 ## Auth Header
 
-'''
-The get_token_auth_header() method
-    it should attempt to get the header from the request
-        it should raise an AuthError if no header is present
-    it should attempt to split bearer and the token
-        it should raise an AuthError if the header is malformed
-    return the token part of the header
-'''
-def get_token_auth_header():
-
-    auth = request.headers.get('Authorization', None)
-
-    if not auth:
-        raise AuthError({
-            'code': 'authorization_header_missing',
-            'description': 'No Authorization Header'
-        }, 401)
-
-    auth_parts = auth.split()
-    if len(auth_parts) == 0:
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization Header Is Not Valid'
-        }, 401)
+get_token_auth_header = token_auth.get_token_auth_header
+check_permissions = token_auth.check_permissions
 
-    if auth_parts[0].lower() != 'bearer':
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization Header Must Start With Bearer'
-        }, 401)
+## Tokens
 
-    if len(auth_parts) == 1 or len(auth_parts) > 2 or auth_parts[1] == '':
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization Header Does Not Contain Token'
-        }, 401)
-
-    token = auth_parts[1]
-
-    return token
+verify_token = token_auth.verify_token
+verify_decode_jwt = token_auth.verify_decode_jwt
 
 '''
-The check_permissions(permission, payload) method
+The @requires_auth(*permissions) decorator method
     @INPUTS
-        permission: string permission (i.e. 'post:drink')
-        payload: decoded jwt payload
-
-    it should raise an AuthError if permissions are not included in the payload
-        !!NOTE check your RBAC settings in Auth0
-    it should raise an AuthError if the requested permission string is not in the payload permissions array
-    return true otherwise
-'''
-def check_permissions(permission, payload):
-
-    if 'permissions' not in payload:
-        raise AuthError({
-            'code': 'invalid_claims',
-            'description': 'Permissions not included in JWT.'
-        }, 400)
-
-    if permission not in payload['permissions']:
-        raise AuthError({
-            'code': 'unauthorized',
-            'description': 'Permission not found.'
-        }, 401)
-    return True
+        permissions: string permissions (i.e. 'post:drink'), all of them required
 
+    the Principal of the token (subject, roles, permissions, payload) is
+    g.principal in the decorated method
 '''
-The verify_decode_jwt(token) method
-    @INPUTS
-        token: a json web token (string)
-
-    it should be an Auth0 token with key id (kid)
-    it should verify the token using Auth0 /.well-known/jwks.json
-    it should decode the payload from the token
-    it should validate the claims
-    return the decoded payload
-
-    !!NOTE urlopen has a common certificate error described here: https://stackoverflow.com/questions/50236117/scraping-ssl-certificate-verify-failed-error-for-http-en-wikipedia-org
-'''
-def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://'+AUTH0_DOMAIN+'/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
-    unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
-    if 'kid' not in unverified_header:
-            raise AuthError({
-                'code': 'invalid_header',
-                'description': 'Authorization malformed.'
-            }, 401)
-
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
-    if rsa_key:
-        try:
-            payload = jwt.decode(
-                token,
-                rsa_key,
-                algorithms=ALGORITHMS,
-                audience=API_AUDIENCE,
-                issuer='https://' + AUTH0_DOMAIN + '/'
-            )
-
-            return payload
-
-        except jwt.ExpiredSignatureError:
-            raise AuthError({
-                'code': 'token_expired',
-                'description': 'Token expired.'
-            }, 401)
-
-        except jwt.JWTClaimsError:
-            raise AuthError({
-                'code': 'invalid_claims',
-                'description': 'Incorrect claims. Please, check the audience and issuer.'
-            }, 401)
-        except Exception:
-            raise AuthError({
-                'code': 'invalid_header',
-                'description': 'Unable to parse authentication token.'
-            }, 400)
-    raise AuthError({
-        'code': 'invalid_header',
-                'description': 'Unable to find the appropriate key.'
-    }, 400)
-
-'''
-The @requires_auth(permission) decorator method
-    @INPUTS
-        permission: string permission (i.e. 'post:drink')
-
-    it should use the get_token_auth_header method to get the token
-    it should use the verify_decode_jwt method to decode the jwt
-    it should use the check_permissions method validate claims and check the requested permission
-    return the decorator which passes the decoded payload to the decorated method
-'''
-def requires_auth(permission=''):
-    def requires_auth_decorator(f):
-        @wraps(f)
-        def wrapper(*args, **kwargs):
-            token = get_token_auth_header()
-
-            payload = verify_decode_jwt(token)
-
-            check_permissions(permission, payload)
-
-            return f(*args, **kwargs)
-
-        return wrapper
-    return requires_auth_decorator
\ No newline at end of file
+requires_auth = token_auth.requires_auth
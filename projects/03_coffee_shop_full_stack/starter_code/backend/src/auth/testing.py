@@ -0,0 +1,12 @@
+from jwtauth.testing import JWKSServer, b64_int, generate_key
+from jwtauth.testing import make_token as make_api_token
+
+from .auth import AUTH0_DOMAIN, API_AUDIENCE
+
+'''
+The make_token(private_key, kid) method
+    returns an RS256 token for the coffee shop API signed with the key,
+    claims override or add to the default ones
+'''
+def make_token(private_key, kid, permissions=(), expires_in=3600, **claims):
+    return make_api_token(private_key, kid, 'https://' + AUTH0_DOMAIN + '/', API_AUDIENCE, permissions, expires_in, **claims)
@@ -1,11 +1,12 @@
 import os
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, Text, JSON, cast, inspect, or_, select, text
+from sqlalchemy.dialects.postgresql import JSONB
 from flask_sqlalchemy import SQLAlchemy
 import json
 
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
-database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
+database_path = os.environ.get('DATABASE_URL', "sqlite:///{}".format(os.path.join(project_dir, database_filename)))
 
 db = SQLAlchemy()
 
@@ -18,6 +19,7 @@ def setup_db(app):
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     db.app = app
     db.init_app(app)
+    db_upgrade()
 
 '''
 db_drop_and_create_all()
@@ -29,6 +31,49 @@ def db_drop_and_create_all():
     db.drop_all()
     db.create_all()
 
+'''
+db_upgrade()
+    brings a drink table created before the JSON recipes up to the model:
+    adds recipe_short and fills it from the stored recipe text, for every
+    drink that has none, and makes the recipe JSONB on PostgreSQL.
+    does nothing on an up to date database or one without the table.
+'''
+def db_upgrade():
+    inspector = inspect(db.engine)
+    if Drink.__tablename__ not in inspector.get_table_names():
+        return
+    columns = {column['name']: column for column in inspector.get_columns(Drink.__tablename__)}
+    table = Drink.__table__
+
+    with db.engine.begin() as connection:
+        if 'recipe_short' not in columns:
+            # nullable in the table, a NOT NULL column cannot be added without a default
+            connection.execute(text('ALTER TABLE drink ADD COLUMN recipe_short TEXT'))
+        if connection.dialect.name == 'postgresql' and not isinstance(columns['recipe']['type'], JSONB):
+            connection.execute(text('ALTER TABLE drink ALTER COLUMN recipe TYPE jsonb USING recipe::jsonb'))
+
+        rows = connection.execute(
+            select([table.c.id, cast(table.c.recipe, Text)])
+            .where(or_(table.c.recipe_short.is_(None), table.c.recipe_short == ''))
+        ).fetchall()
+        for drink_id, recipe in rows:
+            drink = Drink(recipe=json.loads(recipe))
+            drink.prepare()
+            connection.execute(
+                table.update().where(table.c.id == drink_id),
+                {'recipe': drink.recipe, 'recipe_short': drink.recipe_short}
+            )
+
+'''
+short_recipe(recipe)
+    the colors and parts of the ingredients of a recipe, without their names
+'''
+def short_recipe(recipe):
+    return [{'color': r['color'], 'parts': r['parts']} for r in recipe]
+
+# one drink of a JSON array built from stored JSON text, see Drink.json_array()
+DRINK_JSON = '{{"id": {0}, "title": {1}, "recipe": {2}}}'
+
 '''
 Drink
 a persistent drink entity, extends the base SQLAlchemy Model
@@ -38,23 +83,21 @@ class Drink(db.Model):
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
+    # the ingredients - a native JSON column (JSONB on PostgreSQL, JSON text on SQLite)
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
-    recipe =  Column(String(180), nullable=False)
+    recipe = Column(JSON().with_variant(JSONB(), 'postgresql'), nullable=False)
+    # the JSON text of short_recipe(recipe), written by insert() and update()
+    recipe_short = Column(Text, nullable=False)
 
     '''
     short()
         short form representation of the Drink model
     '''
     def short(self):
-        drink_recipe = json.loads(self.recipe)
-
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in drink_recipe]
-
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': short_recipe
+            'recipe': short_recipe(self.recipe)
         }
 
     '''
@@ -65,9 +108,41 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': self.recipe
         }
 
+    '''
+    short_json() and long_json()
+        the short or long form representations of every drink by id, as the
+        text of a JSON array
+        the recipes are copied from their stored JSON text, the list
+        endpoints do not parse or serialize them per drink
+    '''
+    @classmethod
+    def short_json(cls):
+        return cls.json_array(cls.recipe_short)
+
+    @classmethod
+    def long_json(cls):
+        return cls.json_array(cast(cls.recipe, Text))
+
+    @classmethod
+    def json_array(cls, recipe):
+        rows = db.session.query(cls.id, cls.title, recipe).order_by(cls.id)
+        return '[' + ', '.join(DRINK_JSON.format(id, json.dumps(title), recipe) for id, title, recipe in rows) + ']'
+
+    '''
+    prepare()
+        normalizes the recipe, a single ingredient becomes a list of one,
+        and precomputes its short form
+        raises KeyError or TypeError for a recipe that is not a list of
+        ingredients
+    '''
+    def prepare(self):
+        if isinstance(self.recipe, dict):
+            self.recipe = [self.recipe]
+        self.recipe_short = json.dumps(short_recipe(self.recipe))
+
     '''
     insert()
         inserts a new model into a database
@@ -78,6 +153,7 @@ class Drink(db.Model):
             drink.insert()
     '''
     def insert(self):
+        self.prepare()
         db.session.add(self)
         db.session.commit()
 
@@ -103,7 +179,8 @@ class Drink(db.Model):
             drink.update()
     '''
     def update(self):
+        self.prepare()
         db.session.commit()
 
     def __repr__(self):
-        return json.dumps(self.short())
\ No newline at end of file
+        return DRINK_JSON.format(self.id, json.dumps(self.title), self.recipe_short or json.dumps(short_recipe(self.recipe)))
\ No newline at end of file
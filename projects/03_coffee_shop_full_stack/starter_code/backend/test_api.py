@@ -0,0 +1,116 @@
+import json
+import os
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import unittest
+
+from jwtauth import KeyStore, TokenCache, memory_key_source
+
+from src.api import app
+from src.auth import auth
+from src.database.models import db, db_drop_and_create_all, db_upgrade, Drink
+from src.auth.testing import generate_key, make_token
+
+
+class DrinksTestCase(unittest.TestCase):
+    """This class represents the coffee shop drinks test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Generate the signing key once, RSA keys are slow to make."""
+        private_key, jwk = generate_key('test')
+        cls.headers = {'Authorization': 'Bearer ' + make_token(private_key, 'test', ['*'])}
+        cls.key_store = auth.token_auth.key_store
+        cls.token_cache = auth.token_auth.token_cache
+        auth.token_auth.key_store = KeyStore(memory_key_source({'keys': [jwk]}))
+        auth.token_auth.token_cache = TokenCache()
+
+    @classmethod
+    def tearDownClass(cls):
+        auth.token_auth.key_store.stop()
+        auth.token_auth.key_store = cls.key_store
+        auth.token_auth.token_cache = cls.token_cache
+
+    def setUp(self):
+        """Start every test with an empty database."""
+        self.client = app.test_client()
+        self.context = app.app_context()
+        self.context.push()
+        db_drop_and_create_all()
+
+        self.recipe = [
+            {'name': 'Espresso', 'color': 'brown', 'parts': 1},
+            {'name': 'Milk', 'color': 'white', 'parts': 3}
+        ]
+        Drink(title='Latte', recipe=self.recipe).insert()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def test_get_drinks(self):
+        res = self.client.get('/api/drinks')
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['success'])
+        self.assertEqual(data['drinks'], [{
+            'id': 1,
+            'title': 'Latte',
+            'recipe': [{'color': 'brown', 'parts': 1}, {'color': 'white', 'parts': 3}]
+        }])
+        self.assertEqual(data['drinks'], [drink.short() for drink in Drink.query])
+
+    def test_get_drinks_detail(self):
+        res = self.client.get('/api/drinks-detail', headers=self.headers)
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['drinks'], [{'id': 1, 'title': 'Latte', 'recipe': self.recipe}])
+
+    def test_create_drink(self):
+        # a single ingredient is a recipe of one
+        water = {'name': 'Water', 'color': 'blue', 'parts': 1}
+        res = self.client.post('/api/drinks', json={'title': 'Water "Still"', 'recipe': water}, headers=self.headers)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['drinks'][0]['recipe'], [water])
+        drinks = self.client.get('/api/drinks').get_json()['drinks']
+        self.assertEqual(drinks[1], {'id': 2, 'title': 'Water "Still"', 'recipe': [{'color': 'blue', 'parts': 1}]})
+
+    def test_create_drink_invalid_recipe(self):
+        res = self.client.post('/api/drinks', json={'title': 'Nothing', 'recipe': ['water']}, headers=self.headers)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(Drink.query.count(), 1)
+
+    def test_update_drink(self):
+        recipe = [{'name': 'Espresso', 'color': 'brown', 'parts': 2}]
+        res = self.client.patch('/api/drinks/1', json={'recipe': recipe}, headers=self.headers)
+
+        self.assertEqual(res.status_code, 200)
+        drinks = self.client.get('/api/drinks').get_json()['drinks']
+        self.assertEqual(drinks, [{'id': 1, 'title': 'Latte', 'recipe': [{'color': 'brown', 'parts': 2}]}])
+
+    def test_upgrade_old_database(self):
+        db.drop_all()
+        db.session.execute(
+            'CREATE TABLE drink (id INTEGER NOT NULL, title VARCHAR(80), '
+            'recipe VARCHAR(180) NOT NULL, PRIMARY KEY (id), UNIQUE (title))'
+        )
+        db.session.execute(
+            'INSERT INTO drink (id, title, recipe) VALUES (1, :title, :recipe)',
+            {'title': 'Water', 'recipe': json.dumps({'name': 'Water', 'color': 'blue', 'parts': 1})}
+        )
+        db.session.commit()
+
+        db_upgrade()
+
+        drinks = self.client.get('/api/drinks').get_json()['drinks']
+        self.assertEqual(drinks, [{'id': 1, 'title': 'Water', 'recipe': [{'color': 'blue', 'parts': 1}]}])
+        db_upgrade()
+        self.assertEqual(Drink.query.one().recipe, [{'name': 'Water', 'color': 'blue', 'parts': 1}])
+
+
+if __name__ == "__main__":
+    unittest.main()
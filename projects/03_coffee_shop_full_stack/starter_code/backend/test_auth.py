@@ -0,0 +1,99 @@
+import unittest
+
+from flask import Flask, g, jsonify
+from jwtauth import KeyStore, TokenCache, memory_key_source
+
+from src.auth import auth
+from src.auth.auth import AuthError, ROLES_CLAIM, check_permissions, requires_auth
+from src.auth.testing import generate_key, make_token
+
+
+class AuthTestCase(unittest.TestCase):
+    """This class represents the coffee shop auth test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Generate the signing key once, RSA keys are slow to make."""
+        cls.private_key, cls.jwk = generate_key('test')
+
+    def setUp(self):
+        """Verify with the local key and an empty token cache."""
+        self.key_store = auth.token_auth.key_store
+        self.token_cache = auth.token_auth.token_cache
+        auth.token_auth.key_store = KeyStore(memory_key_source({'keys': [self.jwk]}))
+        auth.token_auth.token_cache = TokenCache()
+
+    def tearDown(self):
+        auth.token_auth.key_store.stop()
+        auth.token_auth.key_store = self.key_store
+        auth.token_auth.token_cache = self.token_cache
+
+    def token(self, permissions=(), **claims):
+        return make_token(self.private_key, 'test', permissions, **claims)
+
+    def assertAuthError(self, code, token):
+        with self.assertRaises(AuthError) as context:
+            auth.verify_decode_jwt(token)
+        self.assertEqual(context.exception.error['code'], code)
+
+    def test_verify_decode_jwt(self):
+        payload = auth.verify_decode_jwt(self.token(['get:drinks-detail']))
+
+        self.assertEqual(payload['permissions'], ['get:drinks-detail'])
+        self.assertEqual(payload['aud'], auth.API_AUDIENCE)
+
+    def test_repeated_token_verified_once(self):
+        token = self.token()
+        principal = auth.verify_token(token)
+
+        self.assertIs(auth.verify_token(token), principal)
+        self.assertEqual((auth.token_auth.token_cache.hits, auth.token_auth.token_cache.misses), (1, 1))
+
+    def test_wrong_audience(self):
+        self.assertAuthError('invalid_claims', self.token(aud='another_api'))
+
+    def test_roles(self):
+        barista = auth.verify_token(self.token(**{ROLES_CLAIM: ['Barista']}))
+        manager = auth.verify_token(self.token(**{ROLES_CLAIM: ['Manager']}))
+
+        self.assertTrue(check_permissions('get:drinks-detail', barista))
+        self.assertFalse(barista.has('post:drinks'))
+        self.assertTrue(manager.has_all(['get:drinks-detail', 'post:drinks', 'patch:drinks', 'delete:drinks']))
+
+    def test_requires_auth(self):
+        app = Flask(__name__)
+
+        @app.route('/drinks-detail')
+        @requires_auth('get:drinks-detail')
+        def drinks_detail():
+            return jsonify({'success': True, 'subject': g.principal.subject})
+
+        @app.route('/drinks', methods=['POST'])
+        @requires_auth('post:drinks', 'get:drinks-detail')
+        def create_drink():
+            return jsonify({'success': True})
+
+        @app.errorhandler(AuthError)
+        def auth_error(error):
+            return jsonify(error.error), error.status_code
+
+        client = app.test_client()
+        headers = lambda token: {'Authorization': 'Bearer ' + token}
+
+        self.assertEqual(client.get('/drinks-detail').status_code, 401)
+        res = client.get('/drinks-detail', headers=headers(self.token()))
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(res.get_json()['code'], 'unauthorized')
+        for _ in range(2):
+            res = client.get('/drinks-detail', headers=headers(self.token(['get:drinks-detail'])))
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.get_json()['subject'], 'auth0|offline')
+
+        res = client.post('/drinks', headers=headers(self.token(['post:drinks'])))
+        self.assertEqual(res.status_code, 401)
+        res = client.post('/drinks', headers=headers(self.token([], **{ROLES_CLAIM: ['manager']})))
+        self.assertEqual(res.status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()